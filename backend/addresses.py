@@ -0,0 +1,67 @@
+import hashlib
+import re
+
+ADDRESS_FIELDS = ['fullName', 'phone', 'house', 'landmark', 'street', 'city', 'state', 'pincode']
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_address(address):
+    """Trim and collapse whitespace in every address field"""
+    normalized = {}
+    for field in ADDRESS_FIELDS:
+        value = address.get(field) or ''
+        normalized[field] = _WHITESPACE.sub(' ', str(value)).strip()
+    normalized['phone'] = re.sub(r'[^\d+]', '', normalized['phone'])
+    normalized['pincode'] = normalized['pincode'].replace(' ', '')
+    return normalized
+
+def address_hash(normalized):
+    """Content hash of a normalised address, case-insensitive"""
+    key = '\x1f'.join(normalized[field].lower() for field in ADDRESS_FIELDS)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def upsert_address(cursor, user_id, address):
+    """Return the id of the user's matching address, inserting it only if it is new"""
+    normalized = normalize_address(address)
+    digest = address_hash(normalized)
+    # A no-op update rather than DO NOTHING: RETURNING then yields the id even when a
+    # concurrent transaction committed the same address after this statement's snapshot
+    cursor.execute('''
+        INSERT INTO addresses (user_id, full_name, phone, house, landmark, street, city, state, pincode, address_hash)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        ON CONFLICT (user_id, address_hash) DO UPDATE SET address_hash = EXCLUDED.address_hash
+        RETURNING id
+    ''', (
+        user_id, normalized['fullName'], normalized['phone'], normalized['house'],
+        normalized['landmark'] or None, normalized['street'] or None, normalized['city'] or None,
+        normalized['state'] or None, normalized['pincode'] or None, digest
+    ))
+    return cursor.fetchone()['id']
+
+def owned_address_id(cursor, user_id, address_id):
+    """Return address_id if it belongs to the user, otherwise None"""
+    cursor.execute('''
+        SELECT id FROM addresses WHERE id = %s AND user_id = %s
+    ''', (address_id, user_id))
+    row = cursor.fetchone()
+    return row['id'] if row else None
+
+def list_addresses(cursor, user_id):
+    """Return the user's saved addresses, most recent first"""
+    cursor.execute('''
+        SELECT id, full_name, phone, house, landmark, street, city, state, pincode
+        FROM addresses
+        WHERE user_id = %s AND address_hash IS NOT NULL
+        ORDER BY created_at DESC
+    ''', (user_id,))
+    return [{
+        'id': row['id'],
+        'fullName': row['full_name'],
+        'phone': row['phone'],
+        'house': row['house'],
+        'landmark': row['landmark'],
+        'street': row['street'],
+        'city': row['city'],
+        'state': row['state'],
+        'pincode': row['pincode']
+    } for row in cursor.fetchall()]
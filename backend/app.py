@@ -1,49 +1,92 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, send_from_directory
 from flask_cors import CORS
 import os
 import random
 import redis
-import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
 import hashlib
 import uuid
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from config import Config
+from resilience import CircuitBreaker, CircuitOpenError, ResilientRedis
+from db import postgres_breaker, get_db_connection, is_replica, reset_request_routing, start_replica_monitor, replica_status, pool_status
+from statements import (
+    USER_BY_IDENTIFIER, USER_BY_SESSION, INSERT_SESSION, INSERT_ORDER_ITEM, execute, statement_metrics
+)
+from serializer import FastJSONProvider, parse_fields, project
+from bulk_quotes import stream_quote
+from order_export import parse_date_range, stream_export
+from addresses import upsert_address, owned_address_id, list_addresses
+from stock import (
+    RedisStockStore, LocalStockStore, cart_quantities, load_stock_levels,
+    seed_stock_table, start_stock_maintenance
+)
+from singleflight import SingleFlight
+from batch import validate_batch, run_batch
+from search_index import SuggestIndex
+from catalog import CatalogStore, DEMO_CATEGORIES, demo_products, write_snapshot, upgrade_snapshot
+from supplier_feed import load_feed, seed_products
+from trending import TRENDING_WINDOWS, TrendingRanking, start_trending_rollups
+from analytics import parse_group_by, sales_report, start_analytics_rollups
+from related import RelatedIndex, start_related_refresh
+from cart import RedisCartStore, LocalCartStore, new_cart_id, parse_ops, order_items
+from reorder import clone_order
+from partitions import create_order_tables, start_partition_maintenance
+from order_history import history_range, list_orders
+from images import ImageVariants
+from notifications import (
+    RedisSmsQueue, ResilientSmsQueue, Fast2SmsSender, ConsoleSender, enqueue_otp, start_sms_workers,
+    notification_metrics, OTP_TTL_SECONDS
+)
+from order_queue import (
+    RedisOrderQueue, LocalLogOrderQueue, new_provisional_id, enqueue_order,
+    start_order_workers, queue_metrics
+)
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
+@app.errorhandler(CircuitOpenError)
+def backend_unavailable(e):
+    """Fail fast while a backend's circuit breaker is open"""
+    response = jsonify({'error': 'Service temporarily unavailable', 'backend': e.name})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.errorhandler(redis.ConnectionError)
+@app.errorhandler(redis.TimeoutError)
+def redis_unavailable(e):
+    """Redis-only subsystems (stock counters, order stream) cannot degrade locally"""
+    print(f"Redis error: {e}")
+    return jsonify({'error': 'Service temporarily unavailable', 'backend': 'redis'}), 503
+
+@app.before_request
+def route_reads_per_request():
+    """Reads may use replicas again until this request takes a primary connection"""
+    reset_request_routing()
+
 # Redis connection for storing OTPs and session data
+redis_breaker = CircuitBreaker('redis', Config.REDIS_BREAKER_THRESHOLD, Config.REDIS_BREAKER_RESET_SECONDS)
+redis_client = redis.Redis.from_url(
+    Config.REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=Config.REDIS_TIMEOUT,
+    socket_timeout=Config.REDIS_TIMEOUT
+)
 try:
-    redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
     # Test the connection
     redis_client.ping()
-except:
-    # Fallback to in-memory storage if Redis is not available
-    redis_client = None
-    otp_storage = {}
-    session_storage = {}
+    redis_available = True
+except redis.RedisError:
+    # OTP and session keys use in-memory storage until Redis answers a breaker probe
+    redis_breaker.trip()
+    redis_available = False
 
-# Database setup
-def get_db_connection():
-    """Get PostgreSQL database connection"""
-    try:
-        conn = psycopg2.connect(
-            host=Config.DB_HOST,
-            port=Config.DB_PORT,
-            database=Config.DB_NAME,
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD,
-            cursor_factory=RealDictCursor
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Database connection error: {e}")
-        print(f"Please check your PostgreSQL password in config.py")
-        print(f"Current password attempt: '{Config.DB_PASSWORD}'")
-        return None
+kv_store = ResilientRedis(redis_client, redis_breaker)
 
+# Database setup
 def init_database():
     """Initialize PostgreSQL database with user, orders, order_items, and addresses tables"""
     conn = get_db_connection()
@@ -111,30 +154,99 @@ def init_database():
             )
         ''')
 
-        # Orders table
+        # Content hash of the normalised address, used to reuse rows across orders
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
-                address_id INTEGER REFERENCES addresses (id),
-                payment_method VARCHAR(20) NOT NULL,
-                total_amount NUMERIC(10,2) NOT NULL,
-                status VARCHAR(20) DEFAULT 'PLACED',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            ALTER TABLE addresses ADD COLUMN IF NOT EXISTS address_hash VARCHAR(64)
         ''')
 
-        # Order items table
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_items (
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_addresses_user_hash ON addresses (user_id, address_hash)
+        ''')
+
+        # Orders and order items, range-partitioned by month (see partitions.py)
+        create_order_tables(cursor)
+
+        # Durable stock levels; hot-path reservations run against Redis counters
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS product_stock (
+                product_id INTEGER PRIMARY KEY,
+                quantity INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Catalog of record for supplier feeds; served to requests through catalog snapshots
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS products (
                 id SERIAL PRIMARY KEY,
-                order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
-                product_id INTEGER,
+                sku VARCHAR(64) UNIQUE NOT NULL,
                 name VARCHAR(255) NOT NULL,
-                image TEXT,
-                variant VARCHAR(120),
-                unit_price NUMERIC(10,2) NOT NULL,
-                quantity INTEGER NOT NULL
+                category_slug VARCHAR(100) NOT NULL,
+                brand VARCHAR(100) NOT NULL,
+                gsm_options INTEGER[] NOT NULL DEFAULT '{}',
+                sheet_size VARCHAR(4),
+                price_per_unit DECIMAL(10,2) NOT NULL,
+                price_per_ream DECIMAL(10,2),
+                price_per_carton DECIMAL(10,2),
+                min_order_qty INTEGER NOT NULL DEFAULT 1,
+                stock_qty INTEGER NOT NULL DEFAULT 0,
+                image_url TEXT,
+                supplier VARCHAR(100),
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # High-water marks for incremental rollups over append-only tables
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                name VARCHAR(50) PRIMARY KEY,
+                last_id BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Units sold per product per hour (kept for a week) and per day
+        for table in ('product_sales_hourly', 'product_sales_daily'):
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket TIMESTAMP NOT NULL,
+                    product_id INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    revenue NUMERIC(12,2) NOT NULL,
+                    orders INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, product_id)
+                )
+            ''')
+        
+        # Daily sales by category and payment method, and coupon usage, for admin analytics
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sales_daily (
+                day DATE NOT NULL,
+                category_slug VARCHAR(100) NOT NULL,
+                payment_method VARCHAR(20) NOT NULL,
+                orders INTEGER NOT NULL,
+                units INTEGER NOT NULL,
+                revenue NUMERIC(14,2) NOT NULL,
+                PRIMARY KEY (day, category_slug, payment_method)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS orders_daily (
+                day DATE NOT NULL,
+                payment_method VARCHAR(20) NOT NULL,
+                orders INTEGER NOT NULL,
+                PRIMARY KEY (day, payment_method)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS coupon_usage_daily (
+                day DATE NOT NULL,
+                coupon_code VARCHAR(20) NOT NULL,
+                payment_method VARCHAR(20) NOT NULL,
+                orders INTEGER NOT NULL,
+                discount NUMERIC(14,2) NOT NULL,
+                revenue NUMERIC(14,2) NOT NULL,
+                PRIMARY KEY (day, coupon_code, payment_method)
             )
         ''')
         
@@ -161,40 +273,55 @@ def verify_password(password, hashed):
     except:
         return False
 
-def get_user_by_identifier(identifier):
-    """Get user by email or phone number"""
-    conn = get_db_connection()
+def user_record(row):
+    """API shape of a USER_BY_IDENTIFIER row"""
+    return {
+        'id': row['id'],
+        'fullName': row['full_name'],
+        'phoneNumber': row['phone_number'],
+        'email': row['email'],
+        'passwordHash': row['password_hash'],
+        'isVerified': row['is_verified']
+    }
+
+def session_user(row):
+    """API shape of a USER_BY_SESSION row"""
+    return {
+        'id': row['id'],
+        'fullName': row['full_name'],
+        'phoneNumber': row['phone_number'],
+        'email': row['email']
+    }
+
+def _lookup_user(identifier, readonly):
+    """Look up a user by email or phone number; returns (user, served by replica)"""
+    conn = get_db_connection(readonly=readonly)
     if not conn:
-        return None
+        return None, False
+    from_replica = is_replica(conn)
     
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            SELECT id, full_name, phone_number, email, password_hash, is_verified 
-            FROM users 
-            WHERE phone_number = %s OR email = %s
-        ''', (identifier, identifier))
+        execute(cursor, USER_BY_IDENTIFIER, (identifier, identifier))
         
         user = cursor.fetchone()
-        
-        if user:
-            return {
-                'id': user['id'],
-                'fullName': user['full_name'],
-                'phoneNumber': user['phone_number'],
-                'email': user['email'],
-                'passwordHash': user['password_hash'],
-                'isVerified': user['is_verified']
-            }
-        return None
+        return (user_record(user) if user else None), from_replica
     except psycopg2.Error as e:
         print(f"Error fetching user: {e}")
-        return None
+        return None, from_replica
     finally:
         cursor.close()
         conn.close()
 
+def get_user_by_identifier(identifier):
+    """Get user by email or phone number"""
+    user, from_replica = _lookup_user(identifier, readonly=True)
+    if user is None and from_replica:
+        # A user created moments ago may not have reached the replica yet
+        user, _ = _lookup_user(identifier, readonly=False)
+    return user
+
 def create_user(full_name, phone_number, email, password):
     """Create new user"""
     conn = get_db_connection()
@@ -225,6 +352,8 @@ def create_user(full_name, phone_number, email, password):
         cursor.close()
         conn.close()
 
+SESSION_LIFETIME = timedelta(days=30)
+
 def create_session(user_id):
     """Create session for user"""
     conn = get_db_connection()
@@ -233,13 +362,10 @@ def create_session(user_id):
     
     cursor = conn.cursor()
     session_token = str(uuid.uuid4())
-    expires_at = datetime.now() + timedelta(days=30)
+    expires_at = datetime.now() + SESSION_LIFETIME
     
     try:
-        cursor.execute('''
-            INSERT INTO sessions (user_id, session_token, expires_at)
-            VALUES (%s, %s, %s)
-        ''', (user_id, session_token, expires_at))
+        execute(cursor, INSERT_SESSION, (user_id, session_token, expires_at))
         
         conn.commit()
         return session_token
@@ -251,41 +377,65 @@ def create_session(user_id):
         cursor.close()
         conn.close()
 
-def verify_session(session_token):
-    """Verify session token"""
-    conn = get_db_connection()
+def _lookup_session(session_token, readonly):
+    """Look up the user for a live session token; returns (user, served by replica)"""
+    conn = get_db_connection(readonly=readonly)
     if not conn:
-        return None
+        return None, False
+    from_replica = is_replica(conn)
     
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            SELECT u.id, u.full_name, u.phone_number, u.email 
-            FROM users u 
-            JOIN sessions s ON u.id = s.user_id 
-            WHERE s.session_token = %s AND s.expires_at > NOW()
-        ''', (session_token,))
+        execute(cursor, USER_BY_SESSION, (session_token,))
         
         user = cursor.fetchone()
-        
-        if user:
-            return {
-                'id': user['id'],
-                'fullName': user['full_name'],
-                'phoneNumber': user['phone_number'],
-                'email': user['email']
-            }
-        return None
+        return (session_user(user) if user else None), from_replica
     except psycopg2.Error as e:
         print(f"Session verification error: {e}")
-        return None
+        return None, from_replica
     finally:
         cursor.close()
         conn.close()
 
+# Sessions already resolved for the current batch request, shared by its sub-requests
+_resolved_sessions = ContextVar('resolved_sessions', default=None)
+
+def verify_session(session_token):
+    """Verify session token"""
+    resolved = _resolved_sessions.get()
+    if resolved is not None and session_token in resolved:
+        return resolved[session_token]
+    user, from_replica = _lookup_session(session_token, readonly=True)
+    if user is None and from_replica:
+        # The session may have been created on the primary after the replica's last replay
+        user, _ = _lookup_session(session_token, readonly=False)
+    if resolved is not None:
+        resolved[session_token] = user
+    return user
+
 # Initialize database
 init_database()
+start_replica_monitor()
+
+# Asynchronous order ingestion (ORDER_QUEUE_MODE=async)
+order_queue = None
+if Config.ORDER_QUEUE_MODE == 'async':
+    if redis_available:
+        order_queue = RedisOrderQueue(redis_client)
+    else:
+        order_queue = LocalLogOrderQueue(Config.ORDER_QUEUE_LOG)
+
+# Outbound SMS: requests only enqueue, background workers send in batches.
+# Like kv_store, the queue falls back to process memory while the Redis breaker is open.
+sms_queue = ResilientSmsQueue(RedisSmsQueue(redis_client), redis_breaker)
+
+def sms_sender():
+    if not Config.FAST2SMS_API_KEY:
+        return ConsoleSender()
+    return Fast2SmsSender(Config.FAST2SMS_API_KEY, Config.SMS_API_URL, Config.SMS_TIMEOUT)
+
+start_sms_workers(sms_queue, sms_sender, Config.SMS_WORKERS, Config.SMS_BATCH_SIZE)
 
 # Coupon codes as per requirements
 COUPON_CODES = {
@@ -301,26 +451,18 @@ def generate_otp():
     """Generate a 6-digit OTP"""
     return str(random.randint(100000, 999999))
 
+LEGACY_SESSION_TTL_SECONDS = 86400
+
 def store_otp(phone, otp):
     """Store OTP with 5-minute expiration"""
-    if redis_client:
-        redis_client.setex(f"otp:{phone}", 300, otp)  # 5 minutes
-    else:
-        otp_storage[phone] = {'otp': otp, 'timestamp': time.time()}
+    kv_store.setex(f"otp:{phone}", OTP_TTL_SECONDS, otp)
 
 def verify_otp(phone, otp):
     """Verify OTP"""
-    if redis_client:
-        stored_otp = redis_client.get(f"otp:{phone}")
-        if stored_otp and stored_otp == otp:
-            redis_client.delete(f"otp:{phone}")
-            return True
-    else:
-        if phone in otp_storage:
-            stored_data = otp_storage[phone]
-            if stored_data['otp'] == otp and (time.time() - stored_data['timestamp']) < 300:
-                del otp_storage[phone]
-                return True
+    stored_otp = kv_store.get(f"otp:{phone}")
+    if stored_otp and stored_otp == otp:
+        kv_store.delete(f"otp:{phone}")
+        return True
     return False
 
 @app.route('/api/send-otp', methods=['POST'])
@@ -336,9 +478,7 @@ def send_otp():
     otp = generate_otp()
     store_otp(phone, otp)
     
-    # In a real implementation, you would send SMS here
-    # For development, we'll just return the OTP
-    print(f"OTP for {phone}: {otp}")  # For development only
+    enqueue_otp(sms_queue, phone, otp)
     
     return jsonify({
         'message': 'OTP sent successfully',
@@ -359,10 +499,7 @@ def verify_otp_endpoint():
         # Create session token (simplified)
         session_token = str(random.randint(100000000, 999999999))
         
-        if redis_client:
-            redis_client.setex(f"session:{session_token}", 86400, phone)  # 24 hours
-        else:
-            session_storage[session_token] = {'phone': phone, 'timestamp': time.time()}
+        kv_store.setex(f"session:{session_token}", LEGACY_SESSION_TTL_SECONDS, phone)  # 24 hours
         
         return jsonify({
             'message': 'OTP verified successfully',
@@ -406,13 +543,9 @@ def signup():
         'password': password
     }
     
-    if redis_client:
-        redis_client.setex(f"signup_data:{phone_number}", 600, str(signup_data))  # 10 minutes
-    else:
-        otp_storage[f"signup_data:{phone_number}"] = {'data': signup_data, 'timestamp': time.time()}
+    kv_store.setex(f"signup_data:{phone_number}", 600, str(signup_data))  # 10 minutes
     
-    # TODO: Send OTP via Fast2SMS (bypassed for now)
-    print(f"Signup OTP for {phone_number}: {otp}")  # For development only
+    enqueue_otp(sms_queue, phone_number, otp)
     
     return jsonify({
         'message': 'OTP sent for signup verification',
@@ -430,14 +563,8 @@ def verify_signup_otp():
         return jsonify({'error': 'Phone number and OTP are required'}), 400
     
     # Verify OTP
-    if redis_client:
-        stored_otp = redis_client.get(f"otp:signup:{phone_number}")
-        signup_data_str = redis_client.get(f"signup_data:{phone_number}")
-    else:
-        otp_key = f"signup:{phone_number}"
-        data_key = f"signup_data:{phone_number}"
-        stored_otp = otp_storage.get(otp_key, {}).get('otp')
-        signup_data_str = otp_storage.get(data_key, {}).get('data')
+    stored_otp = kv_store.get(f"otp:signup:{phone_number}")
+    signup_data_str = kv_store.get(f"signup_data:{phone_number}")
     
     if not stored_otp or stored_otp != otp:
         return jsonify({'error': 'Invalid or expired OTP'}), 400
@@ -467,12 +594,7 @@ def verify_signup_otp():
     session_token = create_session(user_id)
     
     # Clean up temporary data
-    if redis_client:
-        redis_client.delete(f"otp:signup:{phone_number}")
-        redis_client.delete(f"signup_data:{phone_number}")
-    else:
-        otp_storage.pop(f"signup:{phone_number}", None)
-        otp_storage.pop(f"signup_data:{phone_number}", None)
+    kv_store.delete(f"otp:signup:{phone_number}", f"signup_data:{phone_number}")
     
     return jsonify({
         'message': 'User created successfully',
@@ -534,8 +656,8 @@ def send_login_otp():
     otp = generate_otp()
     store_otp(f"login:{identifier}", otp)
     
-    # TODO: Send OTP via Fast2SMS (bypassed for now)
-    print(f"Login OTP for {identifier}: {otp}")  # For development only
+    # Email logins still get the code on the account's phone
+    enqueue_otp(sms_queue, user['phoneNumber'], otp)
     
     return jsonify({
         'message': 'OTP sent for login',
@@ -553,11 +675,7 @@ def verify_login_otp():
         return jsonify({'error': 'Email/phone and OTP are required'}), 400
     
     # Verify OTP
-    if redis_client:
-        stored_otp = redis_client.get(f"otp:login:{identifier}")
-    else:
-        otp_key = f"login:{identifier}"
-        stored_otp = otp_storage.get(otp_key, {}).get('otp')
+    stored_otp = kv_store.get(f"otp:login:{identifier}")
     
     if not stored_otp or stored_otp != otp:
         return jsonify({'error': 'Invalid or expired OTP'}), 400
@@ -571,10 +689,7 @@ def verify_login_otp():
     session_token = create_session(user['id'])
     
     # Clean up OTP
-    if redis_client:
-        redis_client.delete(f"otp:login:{identifier}")
-    else:
-        otp_storage.pop(f"login:{identifier}", None)
+    kv_store.delete(f"otp:login:{identifier}")
     
     return jsonify({
         'message': 'Login successful',
@@ -604,8 +719,7 @@ def forgot_password():
     otp = generate_otp()
     store_otp(f"reset:{identifier}", otp)
     
-    # TODO: Send OTP via Fast2SMS (bypassed for now)
-    print(f"Password reset OTP for {identifier}: {otp}")  # For development only
+    enqueue_otp(sms_queue, user['phoneNumber'], otp)
     
     return jsonify({
         'message': 'Password reset OTP sent',
@@ -624,11 +738,7 @@ def reset_password():
         return jsonify({'error': 'All fields are required'}), 400
     
     # Verify OTP
-    if redis_client:
-        stored_otp = redis_client.get(f"otp:reset:{identifier}")
-    else:
-        otp_key = f"reset:{identifier}"
-        stored_otp = otp_storage.get(otp_key, {}).get('otp')
+    stored_otp = kv_store.get(f"otp:reset:{identifier}")
     
     if not stored_otp or stored_otp != otp:
         return jsonify({'error': 'Invalid or expired OTP'}), 400
@@ -661,35 +771,22 @@ def reset_password():
         conn.close()
     
     # Clean up OTP
-    if redis_client:
-        redis_client.delete(f"otp:reset:{identifier}")
-    else:
-        otp_storage.pop(f"reset:{identifier}", None)
+    kv_store.delete(f"otp:reset:{identifier}")
     
     return jsonify({
         'message': 'Password reset successfully'
     })
 
-@app.route('/api/validate-coupon', methods=['POST'])
-def validate_coupon():
-    """Validate coupon code"""
-    data = request.get_json()
-    coupon_code = data.get('coupon_code', '').upper()
-    cart_value = data.get('cart_value', 0)
-    
-    if not coupon_code:
-        return jsonify({'error': 'Coupon code is required'}), 400
-    
+def coupon_discount(coupon_code, cart_value):
+    """Return (discount amount, discount type, error message) for a coupon and cart value"""
     if coupon_code not in COUPON_CODES:
-        return jsonify({'error': 'Invalid coupon code'}), 400
+        return 0, None, 'Invalid coupon code'
     
     coupon = COUPON_CODES[coupon_code]
     
     # Check minimum order value
     if cart_value < coupon['min_order']:
-        return jsonify({
-            'error': f'Minimum order value of ₹{coupon["min_order"]} required for this coupon'
-        }), 400
+        return 0, None, f'Minimum order value of ₹{coupon["min_order"]} required for this coupon'
     
     # Calculate discount
     discount_amount = 0
@@ -704,6 +801,29 @@ def validate_coupon():
     elif discount_type == 'freeship':
         discount_amount = 0  # Free shipping would be handled separately
     
+    return discount_amount, discount_type, None
+
+@app.route('/api/validate-coupon', methods=['POST'])
+def validate_coupon():
+    """Validate coupon code"""
+    data = request.get_json()
+    coupon_code = data.get('coupon_code', '').upper()
+    cart_value = data.get('cart_value', 0)
+    
+    if not coupon_code:
+        return jsonify({'error': 'Coupon code is required'}), 400
+
+    # A server-side cart supplies its own subtotal
+    if data.get('cart_id'):
+        cart = cart_store.get(data['cart_id'])
+        if cart is None:
+            return jsonify({'error': 'Cart not found'}), 404
+        cart_value = cart['subtotal']
+    
+    discount_amount, discount_type, error = coupon_discount(coupon_code, cart_value)
+    if error:
+        return jsonify({'error': error}), 400
+    
     return jsonify({
         'valid': True,
         'discount_amount': discount_amount,
@@ -713,74 +833,155 @@ def validate_coupon():
     })
 
 # --- Category and product datasets for category pages ---
-CATEGORIES = [
-    {"id": 1, "name": "A1 Paper Sheets", "slug": "a1-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a3-bundle.jpg", "description": "Premium quality, A1 Sheets."},
-    {"id": 2, "name": "A2 Paper Sheets", "slug": "a2-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a2-bundle.jpg", "description": "Premium quality, A2 Sheets."},
-    {"id": 3, "name": "A3 Paper Sheets", "slug": "a3-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a3-bundle.jpg", "description": "Premium quality, A3 Sheets."},
-    {"id": 4, "name": "A4 Paper Sheets", "slug": "a4-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a4-bundle.jpg", "description": "Premium quality, A4 Sheets."},
-    {"id": 5, "name": "Passport Size Photos", "slug": "passport-size-photos", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/passport-photo.jpg", "description": "Premium photo sheets."},
-]
-
-# Simple pool of brands and gsm options
-_BRANDS = ["B2B", "Global Paper Co.", "Acme Papers", "FinePrint", "PaperWorks", "Premium Pulp", "BrightLeaf", "Metro Paper"]
-_GSMS = [70, 75, 80, 90]
-
-# Build 8 demo products per category
-_DEMO_PRODUCTS_BY_SLUG = {}
-_pid = 100
-for cat in CATEGORIES:
-    items = []
-    for i in range(8):
-        brand = _BRANDS[i % len(_BRANDS)]
-        base_price = 3.0 + (i % 5) * 0.2
-        items.append({
-            "id": _pid,
-            "name": cat["name"],
-            "categorySlug": cat["slug"],
-            "brand": brand,
-            "imageUrl": cat["heroImageUrl"],
-            "gsmOptions": _GSMS,
-            "pricePerUnit": round(base_price, 2),
-            "minOrderQty": 10,
-            "inStock": True if i % 7 != 0 else False
-        })
-        _pid += 1
-    _DEMO_PRODUCTS_BY_SLUG[cat["slug"]] = items
+# The catalog is served from a memory-mapped snapshot file that is swapped in when it changes
+if not os.path.exists(Config.CATALOG_SNAPSHOT):
+    write_snapshot(Config.CATALOG_SNAPSHOT, DEMO_CATEGORIES, demo_products())
+elif upgrade_snapshot(Config.CATALOG_SNAPSHOT):
+    print(f"Converted {Config.CATALOG_SNAPSHOT} to the columnar snapshot format")
+catalog = CatalogStore(Config.CATALOG_SNAPSHOT)
+
+# Stock counters, seeded from Postgres when available and from the catalog otherwise
+stock_store = RedisStockStore(redis_client) if redis_available else LocalStockStore()
+
+def seed_stock(levels):
+    """Create stock rows and counters for products that have none yet"""
+    try:
+        conn = get_db_connection()
+    except CircuitOpenError:
+        conn = None  # counters start from the catalog levels; the next start creates missing stock rows
+    if conn:
+        try:
+            seed_stock_table(conn, levels)
+            levels = dict(levels)
+            levels.update((pid, qty) for pid, qty in load_stock_levels(conn).items() if pid in levels)
+        except psycopg2.Error as e:
+            print(f"Stock initialization error: {e}")
+        finally:
+            conn.close()
+    stock_store.seed(levels)
+
+# Typeahead index over every category's products
+suggest_index = SuggestIndex()
+
+# Precomputed related-product lists (category, brand, GSM and co-purchases)
+related_index = RelatedIndex()
+
+@catalog.on_reload
+def refresh_catalog_indexes(snapshot, previous):
+    """Bring derived indexes and stock counters in line with a newly loaded snapshot"""
+    products = list(snapshot)
+    related_index.rebuild(products)
+    if previous is None:
+        suggest_index.build(products)
+        seed_stock({p['id']: p['stockQty'] for p in products})
+    else:
+        suggest_index.sync(products)
+        added = {p['id']: p['stockQty'] for p in products if p['id'] not in previous}
+        if added:
+            seed_stock(added)
+
+def seed_products_table():
+    """Mirror the catalog into an empty products table so rollups can resolve categories"""
+    conn = get_db_connection()
+    if not conn:
+        return
+    cur = conn.cursor()
+    try:
+        seed_products(cur, catalog.current())
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f"Products table seed error: {e}")
+        conn.rollback()
+    finally:
+        cur.close()
+        conn.close()
+
+catalog.load()
+catalog.start_watcher()
+seed_products_table()
+start_stock_maintenance(stock_store, get_db_connection)
+# Order workers need the stock counters to give back stock of orders they cannot persist
+if order_queue:
+    start_order_workers(order_queue, get_db_connection, stock_store, Config.ORDER_QUEUE_WORKERS,
+                        Config.ORDER_QUEUE_BATCH_SIZE)
+start_analytics_rollups(get_db_connection, Config.ANALYTICS_REFRESH_INTERVAL)
+start_related_refresh(related_index, get_db_connection, lambda: list(catalog.current()), Config.RELATED_REFRESH_INTERVAL)
+start_partition_maintenance(
+    get_db_connection, Config.ORDER_ARCHIVE_DIR, Config.ORDER_ARCHIVE_AFTER_MONTHS, Config.PARTITION_MAINTENANCE_INTERVAL
+)
+
+# Coalesces identical in-flight catalog reads
+catalog_flight = SingleFlight()
+
+# Responsive variants built by `python images.py build`; picked up again when the manifest changes
+image_variants = ImageVariants(Config.IMAGE_VARIANT_DIR, Config.IMAGE_BASE_URL)
+image_variants.reload_if_changed()
+image_variants.start_watcher()
+
+# Best sellers, ranked from incrementally maintained sales rollups
+trending = TrendingRanking()
+
+def with_availability(products):
+    """Copy products with stock fields read from the live counters"""
+    levels = stock_store.availability(p['id'] for p in products)
+    return [
+        dict(image_variants.rewrite(p, 'imageUrl', 'imageSet'), stockQty=levels[p['id']], inStock=levels[p['id']] > 0)
+        for p in products
+    ]
+
+def resolve_products(product_ids):
+    """Resolve a batch of product ids against the catalog"""
+    return catalog.current().products(product_ids)
+
+start_trending_rollups(trending, get_db_connection, resolve_products, Config.TRENDING_REFRESH_INTERVAL)
 
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """Return list of categories for homepage navigation."""
-    return jsonify(CATEGORIES)
+    categories = [image_variants.rewrite(c, 'heroImageUrl', 'heroImageSet') for c in catalog.current().categories]
+    return jsonify(project(categories, parse_fields(request.args.get('fields'))))
+
+def category_listing(snapshot, slug, q, page, pageSize):
+    """Build the category listing payload and status for normalised query parameters"""
+    size = snapshot.category_size(slug)
+    if size is None:
+        return {"items": [], "total": 0, "page": 1, "pageSize": 12}, 404
+
+    # Simple pagination; a q filter scans the brand and name columns and decodes only the page
+    start = (page - 1) * pageSize
+    end = start + pageSize
+    if q:
+        total, page_items = snapshot.category_search(slug, q, start, end)
+    else:
+        total = size
+        page_items = snapshot.category_products(slug, start, end)
+
+    return {
+        "items": with_availability(page_items),
+        "total": total,
+        "page": page,
+        "pageSize": pageSize,
+        "facets": snapshot.facets(slug)
+    }, 200
 
 @app.route('/api/categories/<slug>/products', methods=['GET'])
 def get_products_by_category(slug):
     """Return demo products for a given category slug. Supports optional q filter and pagination inputs but returns a small set by default."""
-    items = _DEMO_PRODUCTS_BY_SLUG.get(slug)
-    if items is None:
-        return jsonify({"items": [], "total": 0, "page": 1, "pageSize": 12}), 404
-
     # Optional query params (kept for compatibility, but we do simple filtering only by q)
     q = (request.args.get('q') or '').strip().lower()
     page = int(request.args.get('page', 1))
     pageSize = int(request.args.get('pageSize', 12))
 
-    filtered = items
-    if q:
-        filtered = [p for p in items if q in (p['brand'].lower() + ' ' + p['name'].lower())]
-
-    total = len(filtered)
-    # Simple pagination over the small set
-    start = (page - 1) * pageSize
-    end = start + pageSize
-    page_items = filtered[start:end]
-
-    return jsonify({
-        "items": page_items,
-        "total": total,
-        "page": page,
-        "pageSize": pageSize,
-        "facets": {"brands": sorted(list({p['brand'] for p in items})), "gsms": _GSMS}
-    })
+    # Identical concurrent requests against the same snapshot share one computation
+    snapshot = catalog.current()
+    payload, status = catalog_flight.do(
+        ('category', snapshot.version, slug, q, page, pageSize),
+        lambda: category_listing(snapshot, slug, q, page, pageSize)
+    )
+    fields = parse_fields(request.args.get('fields'))
+    if fields and status == 200:
+        payload = dict(payload, items=project(payload['items'], fields))
+    return jsonify(payload), status
 
 @app.route('/api/products', methods=['GET'])
 def get_products():
@@ -886,28 +1087,113 @@ def get_products():
         }
     ]
     
-    return jsonify(products)
+    products = [image_variants.rewrite(p, 'image', 'imageSet') for p in products]
+    return jsonify(project(products, parse_fields(request.args.get('fields'))))
+
+@app.route('/api/products/trending', methods=['GET'])
+def get_trending_products():
+    """Best-selling products for a window (day, week, month), optionally within one category"""
+    window = request.args.get('window', 'week')
+    if window not in TRENDING_WINDOWS:
+        return jsonify({'error': f"window must be one of {', '.join(TRENDING_WINDOWS)}"}), 400
+    category = request.args.get('category') or None
+    limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+
+    snapshot = catalog.current()
+    ranked = trending.top(window, category, limit)
+    products = snapshot.products(pid for pid, _ in ranked)
+    items = [dict(products[pid], unitsSold=units) for pid, units in ranked if pid in products]
+    source = 'sales'
+    if not items:
+        # No sales yet: fall back to catalog order so the carousel is never empty
+        source = 'catalog'
+        if category:
+            items = snapshot.category_products(category, 0, limit) or []
+        else:
+            items = [p for _, p in zip(range(limit), snapshot)]
+    return jsonify({
+        'window': window,
+        'category': category,
+        'source': source,
+        'items': project(with_availability(items), parse_fields(request.args.get('fields')))
+    })
+
+def product_detail(snapshot, pid):
+    """Build the enriched product payload, or None if the id is unknown"""
+    p = snapshot.product(pid)
+    if not p:
+        return None
+    # augment with optional longDescription/gallery/highlights
+    enriched = with_availability([p])[0]
+    enriched['longDescription'] = (
+        'Pack of premium sheets offering excellent print quality, ' \
+        'smooth surface, and consistent performance for daily printing tasks.'
+    )
+    # Additional images beyond imageUrl; demo products have none, so the hero is not repeated
+    enriched['gallery'] = []
+    enriched['highlights'] = [
+        'Suitable for all printer types',
+        'Smooth surface for crisp prints',
+        'Balanced opacity and brightness'
+    ]
+    return enriched
+
+def related_products(snapshot, pid, limit):
+    """Neighbours of a product from the precomputed lists, each tagged with why it is related"""
+    neighbours = related_index.related(pid, limit)
+    products = snapshot.products(other for other, _ in neighbours)
+    items = [dict(products[other], reason=reason) for other, reason in neighbours if other in products]
+    return with_availability(items)
+
+@app.route('/img/<path:name>', methods=['GET'])
+def image_variant(name):
+    """Serve a built image variant; names carry a content hash, so they never change"""
+    response = send_from_directory(Config.IMAGE_VARIANT_DIR, name, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/api/products/<int:pid>', methods=['GET'])
 def get_product_by_id(pid):
-    """Return a single product by id from the demo catalog."""
-    for items in _DEMO_PRODUCTS_BY_SLUG.values():
-        for p in items:
-            if p['id'] == pid:
-                # augment with optional longDescription/gallery/highlights
-                enriched = dict(p)
-                enriched['longDescription'] = (
-                    'Pack of premium sheets offering excellent print quality, ' \
-                    'smooth surface, and consistent performance for daily printing tasks.'
-                )
-                enriched['gallery'] = [p['imageUrl'], p['imageUrl'], p['imageUrl']]
-                enriched['highlights'] = [
-                    'Suitable for all printer types',
-                    'Smooth surface for crisp prints',
-                    'Balanced opacity and brightness'
-                ]
-                return jsonify(enriched)
-    return jsonify({'error': 'Not found'}), 404
+    """Return a single product by id from the demo catalog; include=related embeds its neighbours."""
+    snapshot = catalog.current()
+    enriched = catalog_flight.do(('product', snapshot.version, pid), lambda: product_detail(snapshot, pid))
+    if not enriched:
+        return jsonify({'error': 'Not found'}), 404
+    payload = project([enriched], parse_fields(request.args.get('fields')))[0]
+    if 'related' in (request.args.get('include') or '').split(','):
+        related_fields = parse_fields(request.args.get('relatedFields'))
+        payload = dict(payload, related=project(related_products(snapshot, pid, 4), related_fields))
+    return jsonify(payload)
+
+@app.route('/api/products/<int:pid>/related', methods=['GET'])
+def get_related_products(pid):
+    """Related products: same category, same brand, adjacent GSM and frequently bought together"""
+    snapshot = catalog.current()
+    if pid not in snapshot:
+        return jsonify({'error': 'Not found'}), 404
+    limit = min(max(int(request.args.get('limit', 4)), 1), 8)
+    items = related_products(snapshot, pid, limit)
+    return jsonify({'productId': pid, 'items': project(items, parse_fields(request.args.get('fields')))})
+
+@app.route('/api/search/suggest', methods=['GET'])
+def search_suggest():
+    """Typeahead suggestions across names, brands, GSM values, sizes and SKUs"""
+    q = request.args.get('q') or ''
+    # The index only ranks and caches its top k per prefix
+    k = min(max(int(request.args.get('k', 8)), 1), suggest_index.k)
+    return jsonify({'q': q, 'suggestions': suggest_index.suggest(q, k)})
+
+@app.route('/api/quotes/bulk', methods=['POST'])
+def bulk_quote():
+    """Stream a bulk quote for a raw CSV or NDJSON request body, one priced line at a time"""
+    fmt = request.args.get('format')
+    if fmt not in ('csv', 'ndjson'):
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+
+    return Response(
+        stream_with_context(stream_quote(request.stream, fmt, resolve_products, stock_store.availability)),
+        mimetype='application/x-ndjson'
+    )
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -925,7 +1211,141 @@ def get_me():
         return jsonify({'error': 'Invalid session'}), 401
     return jsonify({'user': user})
 
+@app.route('/api/orders/status/<provisional_id>', methods=['GET'])
+def order_status(provisional_id):
+    """Poll the persistence status of a queued order"""
+    if not order_queue:
+        return jsonify({'error': 'Order queue is disabled'}), 404
+    status = order_queue.get_status(provisional_id)
+    if not status:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(dict(status, provisionalId=provisional_id))
+
+# --- Address book ---
+@app.route('/api/addresses', methods=['GET', 'POST'])
+def addresses():
+    """List the user's saved addresses or save a new one"""
+    token = request.headers.get('X-Session-Token')
+    if not token:
+        return jsonify({'error': 'Missing session'}), 401
+    user = verify_session(token)
+    if not user:
+        return jsonify({'error': 'Invalid session'}), 401
+
+    if request.method == 'POST':
+        address = request.get_json() or {}
+        if not address.get('fullName') or not address.get('phone') or not address.get('house'):
+            return jsonify({'error': 'Full name, phone and house are required'}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    cur = conn.cursor()
+    try:
+        if request.method == 'POST':
+            address_id = upsert_address(cur, user['id'], address)
+            conn.commit()
+            return jsonify({'message': 'Address saved', 'addressId': address_id})
+        return jsonify({'addresses': list_addresses(cur, user['id'])})
+    except psycopg2.Error as e:
+        print('Address error:', e)
+        conn.rollback()
+        return jsonify({'error': 'Failed to load addresses'}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+def is_admin_request():
+    """Check the X-Admin-Token header against the configured admin token"""
+    token = request.headers.get('X-Admin-Token')
+    return bool(Config.ADMIN_TOKEN) and token == Config.ADMIN_TOKEN
+
+# --- Batch ---
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Run several GET sub-requests in one round trip and return all results"""
+    data = request.get_json() or {}
+    specs = data.get('requests')
+    error = validate_batch(specs)
+    if error:
+        return jsonify({'error': error}), 400
+
+    # Resolve the session once; sub-requests reuse it instead of querying again.
+    # Reset afterwards: the worker thread keeps its context for later requests.
+    resolved = _resolved_sessions.set({})
+    try:
+        token = request.headers.get('X-Session-Token')
+        if token:
+            verify_session(token)
+        responses = run_batch(app, specs, request.headers)
+    finally:
+        _resolved_sessions.reset(resolved)
+    return jsonify({'responses': responses})
+
+# --- Cart ---
+# Guest and signed-in carts live server-side under an unguessable id the client keeps
+cart_store = RedisCartStore(redis_client) if redis_available else LocalCartStore()
+
+@app.route('/api/cart', methods=['POST'])
+def create_cart():
+    cart_id = new_cart_id()
+    cart_store.create(cart_id)
+    return jsonify({'cartId': cart_id, 'count': 0, 'subtotal': 0, 'items': []}), 201
+
+@app.route('/api/cart/<cart_id>', methods=['GET'])
+def get_cart(cart_id):
+    cart = cart_store.get(cart_id)
+    if cart is None:
+        return jsonify({'error': 'Cart not found'}), 404
+    return jsonify(dict(cart, cartId=cart_id))
+
+@app.route('/api/cart/<cart_id>', methods=['PATCH'])
+def update_cart(cart_id):
+    """Apply add/set/remove deltas; responds with the new totals and only the lines that changed"""
+    data = request.get_json() or {}
+    try:
+        ops = parse_ops(data.get('ops'), resolve_products)
+        result = cart_store.apply(cart_id, ops)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if result is None:
+        return jsonify({'error': 'Cart not found'}), 404
+    return jsonify(dict(result, cartId=cart_id))
+
+@app.route('/api/cart/<cart_id>', methods=['DELETE'])
+def delete_cart(cart_id):
+    cart_store.delete(cart_id)
+    return jsonify({'message': 'Cart deleted'})
+
 # --- Orders ---
+@app.route('/api/orders', methods=['GET'])
+def order_history():
+    """The signed-in user's orders in a date range (default: the last six months)"""
+    token = request.headers.get('X-Session-Token')
+    if not token:
+        return jsonify({'error': 'Missing session'}), 401
+    user = verify_session(token)
+    if not user:
+        return jsonify({'error': 'Invalid session'}), 401
+    try:
+        start_at, end_at = history_range(*parse_date_range(request.args.get('from'), request.args.get('to')))
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    conn = get_db_connection(readonly=True)
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    cur = conn.cursor()
+    try:
+        orders = list_orders(cur, user['id'], start_at, end_at)
+    except psycopg2.Error as e:
+        print(f"Order history error: {e}")
+        return jsonify({'error': 'Failed to load orders'}), 500
+    finally:
+        cur.close()
+        conn.close()
+    return jsonify({'orders': orders})
+
 @app.route('/api/orders', methods=['POST'])
 def create_order():
     data = request.get_json() or {}
@@ -936,54 +1356,270 @@ def create_order():
     if not user:
         return jsonify({'error': 'Invalid session'}), 401
 
-    items = data.get('items') or []
+    # Items come from the server-side cart when one is given
+    cart_id = data.get('cartId')
+    if cart_id:
+        cart = cart_store.get(cart_id)
+        if cart is None:
+            return jsonify({'error': 'Cart not found'}), 404
+        items = order_items(cart)
+    else:
+        items = data.get('items') or []
     address = data.get('address') or {}
+    address_id = data.get('addressId')
     payment_method = data.get('paymentMethod') or 'cod'
     if not items:
         return jsonify({'error': 'No items provided'}), 400
 
     total_amount = sum(float(i.get('unitPrice', 0)) * int(i.get('quantity', 0)) for i in items)
 
+    # Coupons are re-validated against the server-side cart value and recorded on the order
+    coupon_code = (data.get('couponCode') or '').strip().upper() or None
+    discount_amount = 0
+    if coupon_code:
+        discount_amount, _, error = coupon_discount(coupon_code, total_amount)
+        if error:
+            return jsonify({'error': error}), 400
+        total_amount = max(0, total_amount - discount_amount)
+
+    # Reserve stock for the whole cart atomically; products outside the catalog are not stock-tracked
+    snapshot = catalog.current()
+    quantities = {pid: qty for pid, qty in cart_quantities(items).items() if pid in snapshot}
+
+    if order_queue:
+        reservation_id, short_product = stock_store.reserve(quantities)
+        if short_product is not None:
+            return jsonify({'error': 'Insufficient stock', 'productId': short_product}), 409
+        provisional_id = new_provisional_id()
+        try:
+            enqueue_order(order_queue, {
+                'provisionalId': provisional_id,
+                'userId': user['id'],
+                'items': items,
+                'address': address,
+                'addressId': address_id,
+                'paymentMethod': payment_method,
+                'totalAmount': total_amount,
+                'couponCode': coupon_code,
+                'discountAmount': discount_amount,
+                # Committed below; the order worker gives it back if the order fails
+                'stockQuantities': quantities
+            })
+        except Exception:
+            stock_store.release(reservation_id)
+            raise
+        # The queued order is durable, so its stock is taken now
+        stock_store.commit(reservation_id)
+        if cart_id:
+            cart_store.delete(cart_id)
+        return jsonify({'message': 'Order queued', 'provisionalId': provisional_id, 'status': 'QUEUED'}), 202
+
+    # Connect before reserving, so an unreachable database cannot strand a reservation
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     cur = conn.cursor()
+    reservation_id = None
     try:
-        # Insert or reuse address (for simplicity always insert a record)
-        cur.execute('''
-            INSERT INTO addresses (user_id, full_name, phone, house, landmark, street, city, state, pincode)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id
-        ''', (
-            user['id'], address.get('fullName',''), address.get('phone',''), address.get('house',''),
-            address.get('landmark'), address.get('street'), address.get('city'), address.get('state'), address.get('pincode')
-        ))
-        address_id = cur.fetchone()['id']
+        reservation_id, short_product = stock_store.reserve(quantities)
+        if short_product is not None:
+            return jsonify({'error': 'Insufficient stock', 'productId': short_product}), 409
+
+        # Reuse a saved address by id, or upsert by content hash
+        if address_id:
+            address_id = owned_address_id(cur, user['id'], address_id)
+            if not address_id:
+                conn.rollback()
+                stock_store.release(reservation_id)
+                return jsonify({'error': 'Address not found'}), 400
+        else:
+            address_id = upsert_address(cur, user['id'], address)
 
         # Insert order
         cur.execute('''
-            INSERT INTO orders (user_id, address_id, payment_method, total_amount)
-            VALUES (%s,%s,%s,%s) RETURNING id
-        ''', (user['id'], address_id, payment_method, total_amount))
-        order_id = cur.fetchone()['id']
+            INSERT INTO orders (user_id, address_id, payment_method, total_amount, coupon_code, discount_amount)
+            VALUES (%s,%s,%s,%s,%s,%s) RETURNING id, created_at
+        ''', (user['id'], address_id, payment_method, total_amount, coupon_code, discount_amount))
+        order = cur.fetchone()
+        order_id = order['id']
 
-        # Insert items
+        # Insert items into the order's partition month
         for i in items:
-            cur.execute('''
-                INSERT INTO order_items (order_id, product_id, name, image, variant, unit_price, quantity)
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
-            ''', (
-                order_id, i.get('productId'), i.get('name'), i.get('image'), i.get('variant'),
+            execute(cur, INSERT_ORDER_ITEM, (
+                order_id, order['created_at'], i.get('productId'), i.get('name'), i.get('image'), i.get('variant'),
                 float(i.get('unitPrice',0)), int(i.get('quantity',0))
             ))
         conn.commit()
-        return jsonify({'message': 'Order placed', 'orderId': order_id})
+        stock_store.commit(reservation_id)
     except psycopg2.Error as e:
         print('Order error:', e)
         conn.rollback()
+        stock_store.release(reservation_id)
+        return jsonify({'error': 'Failed to place order'}), 500
+    except Exception:
+        # Anything else (a Redis error, a malformed line) must not hold the stock until the reservation expires
+        conn.rollback()
+        if reservation_id:
+            stock_store.release(reservation_id)
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    if cart_id:
+        cart_store.delete(cart_id)
+    return jsonify({'message': 'Order placed', 'orderId': order_id})
+
+@app.route('/api/orders/<int:order_id>/reorder', methods=['POST'])
+def reorder(order_id):
+    """Place a copy of a previous order at current catalog prices"""
+    token = request.headers.get('X-Session-Token')
+    if not token:
+        return jsonify({'error': 'Missing session'}), 401
+    user = verify_session(token)
+    if not user:
+        return jsonify({'error': 'Invalid session'}), 401
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    cur = conn.cursor()
+    reservation_id = None
+    try:
+        order = clone_order(cur, user['id'], order_id, resolve_products)
+        if order is None:
+            conn.rollback()
+            return jsonify({'error': 'Order not found'}), 404
+
+        # Stock is reserved before the copy commits, so a short line rolls the whole copy back
+        snapshot = catalog.current()
+        quantities = {pid: qty for pid, qty in cart_quantities(order['items']).items() if pid in snapshot}
+        reservation_id, short_product = stock_store.reserve(quantities)
+        if short_product is not None:
+            conn.rollback()
+            return jsonify({'error': 'Insufficient stock', 'productId': short_product}), 409
+
+        conn.commit()
+        stock_store.commit(reservation_id)
+        return jsonify(dict(order, message='Order placed')), 201
+    except psycopg2.Error as e:
+        print('Reorder error:', e)
+        conn.rollback()
+        if reservation_id:
+            stock_store.release(reservation_id)
         return jsonify({'error': 'Failed to place order'}), 500
+    except Exception:
+        conn.rollback()
+        if reservation_id:
+            stock_store.release(reservation_id)
+        raise
     finally:
         cur.close()
         conn.close()
 
+# --- Admin ---
+@app.route('/api/admin/orders/export', methods=['GET'])
+def export_orders():
+    """Stream orders joined with items and addresses as CSV or NDJSON"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+    try:
+        start_at, end_at = parse_date_range(request.args.get('from'), request.args.get('to'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    conn = get_db_connection(readonly=True)
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(stream_export(conn, start_at, end_at, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=orders.{fmt}'}
+    )
+
+@app.route('/api/admin/catalog/feeds', methods=['POST'])
+def import_supplier_feed():
+    """Load a supplier CSV price list (raw request body) and publish the updated catalog"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    supplier = (request.args.get('supplier') or '').strip()
+    if not supplier:
+        return jsonify({'error': 'supplier is required'}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        report = load_feed(conn, request.stream, supplier, Config.CATALOG_SNAPSHOT)
+    except ValueError as e:
+        # Not UTF-8 or not CSV; nothing was merged
+        return jsonify({'error': f'Feed rejected: {e}'}), 400
+    except psycopg2.Error as e:
+        print(f"Supplier feed error: {e}")
+        return jsonify({'error': 'Feed could not be loaded'}), 500
+    finally:
+        conn.close()
+    # Swap here right away; other workers follow on their next poll
+    catalog.reload_if_changed()
+    return jsonify(report)
+
+@app.route('/api/admin/analytics', methods=['GET'])
+def admin_analytics():
+    """Revenue, units and orders per day, category and payment method, plus coupon usage, from daily rollups"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        start_at, end_at = parse_date_range(request.args.get('from'), request.args.get('to'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    try:
+        group_by = parse_group_by(request.args.get('groupBy'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection(readonly=True)
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        report = sales_report(conn, start_at, end_at, group_by)
+    except psycopg2.Error as e:
+        print(f"Analytics query error: {e}")
+        return jsonify({'error': 'Failed to load analytics'}), 500
+    finally:
+        conn.close()
+    return jsonify(dict(report, groupBy=group_by, **{'from': request.args.get('from'), 'to': request.args.get('to')}))
+
+# Further metric sections from other entry points (asgi.py): name -> callable
+METRIC_SOURCES = {}
+
+@app.route('/api/admin/metrics', methods=['GET'])
+def admin_metrics():
+    """Operational counters for the background subsystems"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    metrics = {
+        'replicas': replica_status(),
+        'breakers': {'postgres': postgres_breaker.snapshot(), 'redis': redis_breaker.snapshot()}
+    }
+    metrics['catalog'] = catalog.status()
+    metrics['catalogSingleFlight'] = catalog_flight.snapshot()
+    metrics['trending'] = trending.snapshot()
+    metrics['related'] = related_index.snapshot()
+    metrics['notifications'] = notification_metrics(sms_queue)
+    metrics['images'] = image_variants.status()
+    metrics['dbPool'] = pool_status()
+    metrics['statements'] = statement_metrics()
+    if order_queue:
+        metrics['orderQueue'] = queue_metrics(order_queue)
+    for name, source in METRIC_SOURCES.items():
+        metrics[name] = source()
+    return jsonify(metrics)
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
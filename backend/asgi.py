@@ -0,0 +1,299 @@
+"""ASGI entry point: OTP, login, session and order-history routes on asyncio.
+
+    uvicorn asgi:app --workers 4 --port 5000
+
+Those routes wait on Postgres and Redis through async pools, so one worker
+keeps thousands of them in flight on a single thread. Every other route is the
+Flask app itself, run on a thread pool behind a WSGI bridge. Both modes share
+the Flask app's stores, background workers and response encoding, and answer
+with the same request/response contracts. `gunicorn app:app` remains the sync
+mode.
+"""
+import json
+import random
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+import redis
+import redis.asyncio as aioredis
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import BadRequest, HTTPException, InternalServerError, UnsupportedMediaType
+import app as wsgi
+from async_db import QUERY_ERRORS, AsyncDatabase, execute, fetch, fetchrow
+from config import Config
+from notifications import AsyncRedisSmsQueue, AsyncResilientSmsQueue, enqueue_otp_async
+from order_history import HISTORY_QUERY, MAX_HISTORY_ORDERS, history_range, order_record
+from order_export import parse_date_range
+from resilience import AsyncResilientRedis, CircuitOpenError
+from statements import USER_BY_IDENTIFIER, USER_BY_SESSION, INSERT_SESSION
+
+database = AsyncDatabase(Config.ASYNC_DB_POOL_SIZE)
+
+# Waits for a free connection instead of failing when all are busy
+redis_client = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool.from_url(
+    Config.REDIS_URL,
+    max_connections=Config.ASYNC_REDIS_POOL_SIZE,
+    decode_responses=True,
+    socket_connect_timeout=Config.REDIS_TIMEOUT,
+    socket_timeout=Config.REDIS_TIMEOUT
+))
+# Same breaker and in-process fallback as the Flask routes, so an OTP stored by one mode verifies in the other
+kv_store = AsyncResilientRedis(redis_client, wsgi.kv_store.breaker, wsgi.kv_store.fallback)
+sms_queue = AsyncResilientSmsQueue(AsyncRedisSmsQueue(redis_client), wsgi.redis_breaker, wsgi.sms_queue.fallback)
+
+wsgi.METRIC_SOURCES['asyncDbPool'] = database.status
+
+# --- Responses, matching Flask's encoding, CORS headers and error pages ---
+def _cors(request, response):
+    # As Flask-CORS does with its defaults
+    origin = request.headers.get('origin')
+    if origin:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Vary'] = 'Origin'
+    else:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+def respond(request, payload, status=200, headers=None):
+    return _cors(request, Response(wsgi.app.json.dumps(payload), status_code=status, media_type='application/json',
+                                   headers=headers))
+
+async def json_body(request):
+    """The request's JSON body, failing like Flask's request.get_json()"""
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if not (mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))):
+        raise UnsupportedMediaType(
+            "Did not attempt to load JSON data because the request Content-Type was not 'application/json'."
+        )
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        raise BadRequest()
+
+async def http_error(request, exc):
+    return _cors(request, Response(exc.get_body(), status_code=exc.code, media_type='text/html; charset=utf-8'))
+
+async def internal_error(request, exc):
+    return await http_error(request, InternalServerError())
+
+async def backend_unavailable(request, exc):
+    """Fail fast while a backend's circuit breaker is open"""
+    return respond(request, {'error': 'Service temporarily unavailable', 'backend': exc.name}, 503,
+                   headers={'Retry-After': str(exc.retry_after)})
+
+async def redis_unavailable(request, exc):
+    """Redis-only subsystems cannot degrade locally"""
+    print(f"Redis error: {exc}")
+    return respond(request, {'error': 'Service temporarily unavailable', 'backend': 'redis'}, 503)
+
+# --- Users and sessions ---
+async def _lookup_user(identifier, readonly):
+    """Look up a user by email or phone number; returns (user, served by replica)"""
+    async with database.connection(readonly=readonly) as (conn, from_replica):
+        if conn is None:
+            return None, False
+        try:
+            user = await fetchrow(conn, USER_BY_IDENTIFIER.sql, (identifier, identifier))
+        except QUERY_ERRORS as e:
+            print(f"Error fetching user: {e}")
+            return None, from_replica
+        return (wsgi.user_record(user) if user else None), from_replica
+
+async def get_user_by_identifier(identifier):
+    user, from_replica = await _lookup_user(identifier, readonly=True)
+    if user is None and from_replica:
+        # A user created moments ago may not have reached the replica yet
+        user, _ = await _lookup_user(identifier, readonly=False)
+    return user
+
+async def create_session(user_id):
+    session_token = str(uuid.uuid4())
+    expires_at = datetime.now() + wsgi.SESSION_LIFETIME
+    async with database.connection() as (conn, _):
+        if conn is None:
+            return None
+        try:
+            await execute(conn, INSERT_SESSION.sql, (user_id, session_token, expires_at))
+        except QUERY_ERRORS as e:
+            print(f"Session creation error: {e}")
+            return None
+    return session_token
+
+async def _lookup_session(session_token, readonly):
+    """Look up the user for a live session token; returns (user, served by replica)"""
+    async with database.connection(readonly=readonly) as (conn, from_replica):
+        if conn is None:
+            return None, False
+        try:
+            user = await fetchrow(conn, USER_BY_SESSION.sql, (session_token,))
+        except QUERY_ERRORS as e:
+            print(f"Session verification error: {e}")
+            return None, from_replica
+        return (wsgi.session_user(user) if user else None), from_replica
+
+async def verify_session(session_token):
+    user, from_replica = await _lookup_session(session_token, readonly=True)
+    if user is None and from_replica:
+        # The session may have been created on the primary after the replica's last replay
+        user, _ = await _lookup_session(session_token, readonly=False)
+    return user
+
+def _login_payload(session_token, user):
+    return {
+        'message': 'Login successful',
+        'session_token': session_token,
+        'user': {
+            'fullName': user['fullName'],
+            'phoneNumber': user['phoneNumber'],
+            'email': user['email']
+        }
+    }
+
+# --- Routes; each mirrors the Flask view of the same path in app.py ---
+async def send_otp(request):
+    data = await json_body(request)
+    phone = data.get('phone')
+    if not phone:
+        return respond(request, {'error': 'Phone number is required'}, 400)
+
+    otp = wsgi.generate_otp()
+    await kv_store.setex(f"otp:{phone}", wsgi.OTP_TTL_SECONDS, otp)
+    await enqueue_otp_async(sms_queue, phone, otp)
+    return respond(request, {
+        'message': 'OTP sent successfully',
+        'otp': otp  # Remove this in production
+    })
+
+async def verify_otp(request):
+    data = await json_body(request)
+    phone = data.get('phone')
+    otp = data.get('otp')
+    if not phone or not otp:
+        return respond(request, {'error': 'Phone and OTP are required'}, 400)
+
+    stored_otp = await kv_store.get(f"otp:{phone}")
+    if not stored_otp or stored_otp != otp:
+        return respond(request, {'error': 'Invalid or expired OTP'}, 400)
+    await kv_store.delete(f"otp:{phone}")
+    session_token = str(random.randint(100000000, 999999999))
+    await kv_store.setex(f"session:{session_token}", wsgi.LEGACY_SESSION_TTL_SECONDS, phone)
+    return respond(request, {
+        'message': 'OTP verified successfully',
+        'session_token': session_token,
+        'phone': phone
+    })
+
+async def login(request):
+    data = await json_body(request)
+    identifier = data.get('identifier')
+    password = data.get('password')
+    if not identifier or not password:
+        return respond(request, {'error': 'Email/phone and password are required'}, 400)
+
+    user = await get_user_by_identifier(identifier)
+    if not user:
+        return respond(request, {'error': 'User not found'}, 404)
+    if not wsgi.verify_password(password, user['passwordHash']):
+        return respond(request, {'error': 'Invalid password'}, 401)
+    session_token = await create_session(user['id'])
+    return respond(request, _login_payload(session_token, user))
+
+async def send_login_otp(request):
+    data = await json_body(request)
+    identifier = data.get('identifier')
+    if not identifier:
+        return respond(request, {'error': 'Email or phone number is required'}, 400)
+
+    user = await get_user_by_identifier(identifier)
+    if not user:
+        return respond(request, {'error': 'User not found'}, 404)
+    otp = wsgi.generate_otp()
+    await kv_store.setex(f"otp:login:{identifier}", wsgi.OTP_TTL_SECONDS, otp)
+    # Email logins still get the code on the account's phone
+    await enqueue_otp_async(sms_queue, user['phoneNumber'], otp)
+    return respond(request, {
+        'message': 'OTP sent for login',
+        'otp': otp  # Remove this in production
+    })
+
+async def verify_login_otp(request):
+    data = await json_body(request)
+    identifier = data.get('identifier')
+    otp = data.get('otp')
+    if not identifier or not otp:
+        return respond(request, {'error': 'Email/phone and OTP are required'}, 400)
+
+    stored_otp = await kv_store.get(f"otp:login:{identifier}")
+    if not stored_otp or stored_otp != otp:
+        return respond(request, {'error': 'Invalid or expired OTP'}, 400)
+    user = await get_user_by_identifier(identifier)
+    if not user:
+        return respond(request, {'error': 'User not found'}, 404)
+    session_token = await create_session(user['id'])
+    await kv_store.delete(f"otp:login:{identifier}")
+    return respond(request, _login_payload(session_token, user))
+
+async def get_me(request):
+    token = request.headers.get('X-Session-Token') or request.query_params.get('session_token')
+    if not token:
+        return respond(request, {'error': 'No session'}, 401)
+    user = await verify_session(token)
+    if not user:
+        return respond(request, {'error': 'Invalid session'}, 401)
+    return respond(request, {'user': user})
+
+async def order_history(request):
+    token = request.headers.get('X-Session-Token')
+    if not token:
+        return respond(request, {'error': 'Missing session'}, 401)
+    user = await verify_session(token)
+    if not user:
+        return respond(request, {'error': 'Invalid session'}, 401)
+    try:
+        start_at, end_at = history_range(*parse_date_range(request.query_params.get('from'),
+                                                           request.query_params.get('to')))
+    except ValueError:
+        return respond(request, {'error': 'Dates must be YYYY-MM-DD'}, 400)
+
+    async with database.connection(readonly=True) as (conn, _):
+        if conn is None:
+            return respond(request, {'error': 'Database connection failed'}, 500)
+        try:
+            rows = await fetch(conn, HISTORY_QUERY, {
+                'user_id': user['id'], 'start': start_at, 'end': end_at, 'limit': MAX_HISTORY_ORDERS
+            })
+        except QUERY_ERRORS as e:
+            print(f"Order history error: {e}")
+            return respond(request, {'error': 'Failed to load orders'}, 500)
+    return respond(request, {'orders': [order_record(row) for row in rows]})
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await database.close()
+    await redis_client.aclose()
+
+app = Starlette(
+    routes=[
+        Route('/api/send-otp', send_otp, methods=['POST']),
+        Route('/api/verify-otp', verify_otp, methods=['POST']),
+        Route('/api/login', login, methods=['POST']),
+        Route('/api/send-login-otp', send_login_otp, methods=['POST']),
+        Route('/api/verify-login-otp', verify_login_otp, methods=['POST']),
+        Route('/api/me', get_me, methods=['GET']),
+        Route('/api/orders', order_history, methods=['GET']),
+        # Everything else, including OPTIONS preflights and POST /api/orders, is served by Flask
+        Mount('/', app=WSGIMiddleware(wsgi.app, workers=Config.ASGI_WSGI_THREADS)),
+    ],
+    exception_handlers={
+        HTTPException: http_error,
+        CircuitOpenError: backend_unavailable,
+        redis.ConnectionError: redis_unavailable,
+        redis.TimeoutError: redis_unavailable,
+        Exception: internal_error,
+    },
+    lifespan=lifespan
+)
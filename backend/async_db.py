@@ -0,0 +1,146 @@
+"""asyncpg pools for the ASGI app, routed like db.get_db_connection.
+
+Reads go to a replica that passes db.py's lag checks until the request has used
+the primary, and the primary shares db.py's circuit breaker. asyncpg prepares
+each statement on first use and caches it per connection, so the hot queries
+are parsed and planned once per pooled connection, as statements.py does for
+the threaded app.
+"""
+import asyncio
+import functools
+import itertools
+import json
+import re
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncpg
+from config import Config
+from db import healthy_replicas, postgres_breaker
+from resilience import CircuitOpenError
+
+# Raised while connecting to a server that is down, refusing connections or too slow to answer
+CONNECT_ERRORS = (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError)
+# Raised by a query, including on a pooled connection the server has dropped; the
+# counterpart of psycopg2.Error in the threaded handlers
+QUERY_ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError)
+
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s')
+
+@functools.lru_cache(maxsize=256)
+def _numbered(sql):
+    names = []
+    def number(match):
+        name = match.group(1)
+        if name is not None and name in names:
+            return f"${names.index(name) + 1}"
+        names.append(name)
+        return f"${len(names)}"
+    return _PLACEHOLDER.sub(number, sql), tuple(names)
+
+def positional(sql, params=()):
+    """(sql with $n placeholders, argument list) for psycopg2-style sql and a params tuple or dict"""
+    text, names = _numbered(sql)
+    if isinstance(params, dict):
+        return text, [params[name] for name in names]
+    return text, list(params)
+
+async def fetchrow(conn, sql, params=()):
+    text, args = positional(sql, params)
+    return await conn.fetchrow(text, *args)
+
+async def fetch(conn, sql, params=()):
+    text, args = positional(sql, params)
+    return await conn.fetch(text, *args)
+
+async def execute(conn, sql, params=()):
+    text, args = positional(sql, params)
+    return await conn.execute(text, *args)
+
+# Set once the current request has used the primary, so later reads see its writes
+_used_primary = ContextVar('async_used_primary', default=False)
+
+async def _init_connection(conn):
+    # Decode json columns as psycopg2 does, so rows serialise the same in both modes
+    await conn.set_type_codec('json', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+class AsyncDatabase:
+    """One asyncpg pool per database server, created on first use inside the running event loop"""
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self.pools = {}
+        self.lock = asyncio.Lock()
+        self.round_robin = itertools.count()
+
+    async def _pool(self, key, user, password):
+        pool = self.pools.get(key)
+        if pool is not None:
+            return pool
+        async with self.lock:
+            if key not in self.pools:
+                _, host, port = key
+                self.pools[key] = await asyncpg.create_pool(
+                    host=host, port=int(port), database=Config.DB_NAME, user=user, password=password,
+                    min_size=1, max_size=self.pool_size, timeout=Config.DB_CONNECT_TIMEOUT,
+                    max_inactive_connection_lifetime=Config.DB_POOL_MAX_IDLE_SECONDS,
+                    server_settings={'statement_timeout': str(Config.DB_STATEMENT_TIMEOUT_MS)},
+                    init=_init_connection
+                )
+            return self.pools[key]
+
+    async def _acquire_replica(self):
+        replicas = healthy_replicas()
+        start = next(self.round_robin)
+        for offset in range(len(replicas)):
+            host, port = replicas[(start + offset) % len(replicas)]
+            try:
+                pool = await self._pool(('replica', host, port), Config.DB_REPLICA_USER, Config.DB_REPLICA_PASSWORD)
+                return pool, await pool.acquire()
+            except CONNECT_ERRORS as e:
+                print(f"Replica connection error ({host}): {e}")
+        return None, None
+
+    @asynccontextmanager
+    async def connection(self, readonly=False):
+        """Yields (connection, from_replica); the connection is None when the primary cannot be reached.
+
+        Raises CircuitOpenError without connecting while the primary is failing.
+        """
+        if readonly and not _used_primary.get():
+            pool, conn = await self._acquire_replica()
+            if conn is not None:
+                try:
+                    yield conn, True
+                finally:
+                    await pool.release(conn)
+                return
+        else:
+            _used_primary.set(True)
+
+        if not postgres_breaker.allow():
+            raise CircuitOpenError('postgres', postgres_breaker.retry_after())
+        try:
+            # Waits for a free connection when all pool_size are busy
+            pool = await self._pool(('primary', Config.DB_HOST, Config.DB_PORT), Config.DB_USER, Config.DB_PASSWORD)
+            conn = await pool.acquire()
+            postgres_breaker.record_success()
+        except CONNECT_ERRORS as e:
+            postgres_breaker.record_failure()
+            print(f"Database connection error: {e}")
+            yield None, False
+            return
+        try:
+            yield conn, False
+        finally:
+            await pool.release(conn)
+
+    def status(self):
+        return {
+            f"{role}:{host}:{port}": {'size': pool.get_size(), 'idle': pool.get_idle_size(), 'max': self.pool_size}
+            for (role, host, port), pool in list(self.pools.items())
+        }
+
+    async def close(self):
+        for pool in self.pools.values():
+            await pool.close()
+        self.pools = {}
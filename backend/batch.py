@@ -0,0 +1,51 @@
+import contextvars
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+MAX_SUB_REQUESTS = 20
+FORWARDED_HEADERS = ('X-Session-Token', 'X-Admin-Token')
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='batch')
+
+def validate_batch(specs):
+    """Return an error message for a malformed batch, or None"""
+    if not isinstance(specs, list) or not specs:
+        return 'requests must be a non-empty list'
+    if len(specs) > MAX_SUB_REQUESTS:
+        return f'At most {MAX_SUB_REQUESTS} sub-requests are allowed'
+    for spec in specs:
+        if not isinstance(spec, dict) or not str(spec.get('path', '')).startswith('/api/'):
+            return 'Each sub-request needs an /api/ path'
+        if (spec.get('method') or 'GET').upper() != 'GET':
+            return 'Only GET sub-requests are supported'
+        if spec['path'].split('?')[0].rstrip('/') == '/api/batch':
+            return 'Batches cannot be nested'
+    return None
+
+def _run_one(app, spec, headers):
+    path, _, query_string = spec['path'].partition('?')
+    query = spec.get('query')
+    if isinstance(query, dict) and query:
+        query_string = '&'.join(filter(None, [query_string, urlencode(query, doseq=True)]))
+    with app.test_request_context(path, method='GET', query_string=query_string, headers=headers):
+        try:
+            response = app.full_dispatch_request()
+        except Exception:
+            # An unhandled error fails only its own sub-request, not the whole batch
+            app.log_exception(sys.exc_info())
+            return {'id': spec.get('id'), 'status': 500, 'body': {'error': 'Internal server error'}}
+        return {
+            'id': spec.get('id'),
+            'status': response.status_code,
+            'body': response.get_json(silent=True)
+        }
+
+def run_batch(app, specs, headers):
+    """Dispatch sub-requests concurrently through the app's own routing and handlers"""
+    forwarded = {name: headers[name] for name in FORWARDED_HEADERS if headers.get(name)}
+    futures = [
+        _executor.submit(contextvars.copy_context().run, _run_one, app, spec, forwarded)
+        for spec in specs
+    ]
+    return [future.result() for future in futures]
@@ -0,0 +1,192 @@
+"""Compare the threaded (gunicorn) and async (uvicorn) servers under concurrent load.
+
+Usage: python bench_async.py [--concurrency 50,200,1000] [--duration 20] [--workers 2]
+                             [--threads 32] [--wsgi-url URL] [--asgi-url URL]
+
+Starts `gunicorn app:app` and `uvicorn asgi:app` with the same worker count on
+local ports (or uses the servers at --wsgi-url/--asgi-url) and drives each with
+N simulated clients for --duration seconds per level. Every client repeats a
+mixed session against one synthetic user: password login, /api/me, order
+history, then a login OTP sent and verified. Load synthetic users first
+(synthetic_data.py), at least as many as the highest concurrency. Each client
+keeps one keep-alive connection. Reports requests/s, p50 and p99 latency and
+failed requests per level; run it on a machine with cores to spare, or the
+client competes with the servers for CPU.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+from bench_scaling import samples
+from synthetic_data import SYNTHETIC_PASSWORD, connect
+
+class Client:
+    """A minimal HTTP/1.1 client over one keep-alive connection"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None, headers=None):
+        """(status, decoded JSON body or None)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b''
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        if payload is not None:
+            lines.append('Content-Type: application/json')
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        try:
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+            status_line = await self.reader.readuntil(b'\r\n')
+            length, close = 0, False
+            while (line := await self.reader.readuntil(b'\r\n')) != b'\r\n':
+                name, _, value = line.decode('latin-1').partition(':')
+                name = name.strip().lower()
+                if name == 'content-length':
+                    length = int(value)
+                elif name == 'connection' and value.strip().lower() == 'close':
+                    close = True
+            data = await self.reader.readexactly(length)
+        except (OSError, asyncio.IncompleteReadError):
+            await self.close()
+            raise
+        if close:
+            await self.close()
+        status = int(status_line.split()[1])
+        return status, (json.loads(data) if data.startswith((b'{', b'[')) else None)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+async def session(client, user):
+    """One user's mixed workload; yields each step's (status, body) after it completes"""
+    yield await client.request('POST', '/api/login', {'identifier': user['email'], 'password': SYNTHETIC_PASSWORD})
+    headers = {'X-Session-Token': user['session_token']}
+    yield await client.request('GET', '/api/me', headers=headers)
+    yield await client.request('GET', '/api/orders', headers=headers)
+    status, body = await client.request('POST', '/api/send-login-otp', {'identifier': user['phone_number']})
+    yield status, body
+    if status == 200:
+        yield await client.request('POST', '/api/verify-login-otp',
+                                   {'identifier': user['phone_number'], 'otp': body['otp']})
+
+async def simulate(url, user, deadline, timings, failures):
+    client = Client(url)
+    try:
+        while time.perf_counter() < deadline:
+            steps = session(client, user)
+            while True:
+                start = time.perf_counter()
+                try:
+                    status, _ = await anext(steps)
+                except StopAsyncIteration:
+                    break
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    failures.append(None)
+                    await asyncio.sleep(0.1)  # refused or reset; back off before reconnecting
+                    break
+                timings.append(time.perf_counter() - start)
+                if status >= 300:
+                    failures.append(status)
+    finally:
+        await client.close()
+
+async def run_level(url, users, concurrency, duration):
+    timings, failures = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(url, users[i % len(users)], deadline, timings, failures)
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50': round(timings[len(timings) // 2] * 1e3, 2) if timings else None,
+        'p99': round(timings[int(len(timings) * 0.99)] * 1e3, 2) if timings else None,
+        'failed': len(failures)
+    }
+
+def start_server(command, url):
+    """Start a server and wait until it answers /api/health"""
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env={**os.environ, 'PYTHONPATH': os.path.dirname(os.path.abspath(__file__))})
+    async def healthy():
+        client = Client(url)
+        try:
+            status, _ = await client.request('GET', '/api/health')
+            return status == 200
+        except OSError:
+            return False
+        finally:
+            await client.close()
+    for _ in range(120):
+        if process.poll() is not None:
+            sys.exit(f"{command[0]} exited with status {process.returncode}")
+        if asyncio.run(healthy()):
+            return process
+        time.sleep(0.5)
+    process.terminate()
+    sys.exit(f"{command[0]} did not become healthy at {url}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='50,200,1000', help='simulated clients per level')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per level')
+    parser.add_argument('--warmup', type=float, default=5, help='untimed seconds of load before the first level')
+    parser.add_argument('--workers', type=int, default=2, help='worker processes per server')
+    parser.add_argument('--threads', type=int, default=32, help='threads per gunicorn worker')
+    parser.add_argument('--users', type=int, default=2000, help='synthetic users to sample')
+    parser.add_argument('--wsgi-url', help='use a running threaded server instead of starting one')
+    parser.add_argument('--asgi-url', help='use a running async server instead of starting one')
+    parser.add_argument('--output', help='write results as JSON')
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    conn = connect()
+    try:
+        # One session per user: clients sharing a user would overwrite each other's login OTPs
+        users = list({row['user_id']: row for row in samples(conn.cursor(), args.users)}.values())
+    finally:
+        conn.close()
+
+    servers = [
+        ('wsgi', args.wsgi_url or 'http://127.0.0.1:5201',
+         ['gunicorn', 'app:app', '-b', '127.0.0.1:5201', '-w', str(args.workers), '--threads', str(args.threads)]),
+        ('asgi', args.asgi_url or 'http://127.0.0.1:5202',
+         ['uvicorn', 'asgi:app', '--port', '5202', '--workers', str(args.workers), '--log-level', 'warning']),
+    ]
+    results = {}
+    for mode, url, command in servers:
+        process = None if (args.wsgi_url if mode == 'wsgi' else args.asgi_url) else start_server(command, url)
+        try:
+            results[mode] = []
+            # Fill the connection pools and prepared statement caches before timing
+            asyncio.run(run_level(url, users, levels[0], args.warmup))
+            print(f"\n{mode} ({url})")
+            print(f"{'clients':>8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}")
+            for concurrency in levels:
+                level = asyncio.run(run_level(url, users, concurrency, args.duration))
+                results[mode].append(level)
+                print(f"{level['concurrency']:>8}{level['requests']:>10}{level['rps']:>10.1f}"
+                      f"{level['p50'] or 0:>10.2f}{level['p99'] or 0:>10.2f}{level['failed']:>8}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
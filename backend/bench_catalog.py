@@ -0,0 +1,89 @@
+"""Measure catalog memory per SKU and listing latency for the columnar snapshot.
+
+Usage: python bench_catalog.py [--products 500000] [--requests 2000]
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from catalog import CatalogSnapshot, DEMO_CATEGORIES, _dumps, write_snapshot
+from synthetic_data import synthetic_products
+
+PAGE_SIZE = 24
+
+def allocated(build):
+    """(result, bytes allocated by build that are still live)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def timed(fn, calls):
+    timings = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6, timings[int(len(timings) * 0.99)] * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=500000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    count = args.products
+
+    dicts, dict_bytes = allocated(lambda: list(synthetic_products(count)))
+    json_bytes = sum(len(_dumps(p)) for p in dicts) + 24 * count
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.snap')
+        start = time.perf_counter()
+        write_snapshot(path, DEMO_CATEGORIES, dicts)
+        build_seconds = time.perf_counter() - start
+        # The mapping stays valid after the directory is removed
+        snapshot, heap_bytes = allocated(lambda: CatalogSnapshot(path))
+    assert snapshot.product(dicts[-1]['id']) == dicts[-1]
+
+    print(f"{count} SKUs; snapshot written in {build_seconds:.1f}s")
+    print(f"{'representation':<34}{'bytes/SKU':>12}")
+    print(f"{'python dicts (per worker)':<34}{dict_bytes / count:>12.0f}")
+    print(f"{'JSON records (previous snapshot)':<34}{json_bytes / count:>12.0f}")
+    print(f"{'columnar file (shared page cache)':<34}{snapshot.size_bytes() / count:>12.0f}")
+    print(f"{'columnar heap (per worker)':<34}{heap_bytes / count:>12.1f}")
+    print('column kinds: ' + ', '.join(f"{name}={spec['kind']}" for name, spec in snapshot.columns.items()))
+
+    rng = random.Random(1)
+    slugs = [c['slug'] for c in DEMO_CATEGORIES]
+    pages = []
+    for _ in range(args.requests):
+        slug = rng.choice(slugs)
+        offset = rng.randrange(0, snapshot.category_size(slug) - PAGE_SIZE)
+        pages.append((slug, offset, offset + PAGE_SIZE))
+    by_slug = {}
+    for product in dicts:
+        by_slug.setdefault(product['categorySlug'], []).append(product)
+
+    print(f"{'operation':<34}{'p50 us':>10}{'p99 us':>10}")
+    results = [
+        ('listing page, python dicts', timed(lambda s, a, b: [dict(p) for p in by_slug[s][a:b]], pages)),
+        ('listing page, columnar', timed(snapshot.category_products, pages)),
+        ('product by id, columnar', timed(snapshot.product, [(rng.choice(dicts)['id'],) for _ in range(args.requests)])),
+        ('q filter + page, python dicts', timed(
+            lambda s, q: [dict(p) for p in by_slug[s] if q in (p['brand'].lower() + ' ' + p['name'].lower())][:PAGE_SIZE],
+            [(s, 'acme') for s, _, _ in pages[:20]])),
+        ('q filter + page, columnar', timed(snapshot.category_search, [(s, 'acme', 0, PAGE_SIZE) for s, _, _ in pages[:20]])),
+    ]
+    for label, (p50, p99) in results:
+        print(f"{label:<34}{p50:>10.1f}{p99:>10.1f}")
+
+if __name__ == '__main__':
+    main()
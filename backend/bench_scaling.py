@@ -0,0 +1,221 @@
+"""Measure key endpoint latencies and query plans as synthetic data grows.
+
+Usage: python bench_scaling.py [--steps 10000,100000,1000000] [--products 100000]
+                               [--requests 300] [--settle 15] [--output scaling.json]
+                               [--baseline scaling.json]
+
+At each step synthetic_data tops the synthetic users up to the step size, then
+the app's routes are timed in-process through the Flask test client and the hot
+queries are EXPLAINed. Exits non-zero when a hot query plans a sequential scan
+over a large table, or a p99 exceeds --tolerance times the baseline's for the
+same step, so index and query regressions fail a pre-deploy run. Point it at a
+benchmark database: loaded data stays, and login and order requests add rows.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from psycopg2.extensions import cursor as PlainCursor
+from config import Config
+from order_history import HISTORY_QUERY, history_range
+from statements import USER_BY_IDENTIFIER, USER_BY_SESSION
+from synthetic_data import COLUMNS, DEFAULT_SEED, PHONE_PREFIX, SYNTHETIC_PASSWORD, connect, load_products, load_users
+
+# Sequential scans of tables this large mean a missing or unusable index
+SEQ_SCAN_ROWS = 10000
+# Latency differences below this are noise, whatever the ratio
+MIN_REGRESSION_MS = 1.0
+
+SAMPLE_QUERY = '''
+    SELECT s.session_token, s.user_id, u.email, u.phone_number
+    FROM sessions s
+    JOIN users u ON u.id = s.user_id
+    WHERE s.expires_at > NOW() AND u.phone_number LIKE %s
+    ORDER BY random()
+    LIMIT %s
+'''
+
+def synthetic_users(cursor):
+    cursor.execute('SELECT COUNT(*) AS n FROM users WHERE phone_number LIKE %s', (PHONE_PREFIX + '%',))
+    return cursor.fetchone()['n']
+
+def row_counts(cursor):
+    counts = {}
+    for table in COLUMNS:
+        cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+        counts[table] = cursor.fetchone()['n']
+    return counts
+
+def samples(cursor, count):
+    """Live sessions of synthetic users, with the identifiers they sign in with"""
+    cursor.execute(SAMPLE_QUERY, (PHONE_PREFIX + '%', count))
+    rows = cursor.fetchall()
+    if not rows:
+        raise RuntimeError('No live synthetic sessions to sample; load more users')
+    return rows
+
+def order_items(snapshot, rng, count=3):
+    """Single units of well-stocked catalog products, so timed orders are not refused for stock"""
+    products = [p for c in snapshot.categories for p in snapshot.category_products(c['slug'], 0, 100)
+                if p['stockQty'] >= 1000]
+    return [{
+        'productId': p['id'], 'name': p['name'], 'image': p['imageUrl'],
+        'variant': str(p['gsmOptions'][0]) if p.get('gsmOptions') else None,
+        'unitPrice': p['pricePerUnit'], 'quantity': 1
+    } for p in rng.sample(products, min(count, len(products)))]
+
+def endpoints(snapshot, rng):
+    """(name, fn(client, sample) -> response); each call is one timed request"""
+    slugs = [c['slug'] for c in snapshot.categories]
+    address = {'fullName': 'Bench User', 'phone': '5000000000', 'house': '1, Bench House', 'city': 'Pune',
+               'state': 'Maharashtra', 'pincode': '411001'}
+    def headers(s):
+        return {'X-Session-Token': s['session_token']}
+    return [
+        ('login by email', lambda c, s: c.post('/api/login', json={'identifier': s['email'], 'password': SYNTHETIC_PASSWORD})),
+        ('login by phone', lambda c, s: c.post('/api/login', json={'identifier': s['phone_number'], 'password': SYNTHETIC_PASSWORD})),
+        ('me', lambda c, s: c.get('/api/me', headers=headers(s))),
+        ('order history', lambda c, s: c.get('/api/orders', headers=headers(s))),
+        ('addresses', lambda c, s: c.get('/api/addresses', headers=headers(s))),
+        ('place order', lambda c, s: c.post('/api/orders', headers=headers(s),
+                                            json={'items': order_items(snapshot, rng), 'address': address})),
+        ('category page', lambda c, s: c.get(f"/api/categories/{rng.choice(slugs)}/products?page={rng.randint(1, 50)}")),
+    ]
+
+def measure(client, fn, rows, requests):
+    timings, errors = [], 0
+    for i in range(requests):
+        start = time.perf_counter()
+        response = fn(client, rows[i % len(rows)])
+        timings.append(time.perf_counter() - start)
+        if response.status_code >= 300:
+            errors += 1
+    timings.sort()
+    return {
+        'p50': round(timings[len(timings) // 2] * 1e3, 3),
+        'p99': round(timings[int(len(timings) * 0.99)] * 1e3, 3),
+        'errors': errors
+    }
+
+def _scans(plan):
+    """(node type, relation) for every scan in an EXPLAIN (FORMAT JSON) plan tree"""
+    scans = []
+    if 'Relation Name' in plan:
+        scans.append((plan['Node Type'], plan['Relation Name']))
+    for child in plan.get('Plans', []):
+        scans.extend(_scans(child))
+    return scans
+
+def plans(conn, sample):
+    """Scans each hot query plans with, and the sequential scans of large tables among them"""
+    start_at, end_at = history_range(None, None)
+    queries = [
+        (USER_BY_IDENTIFIER.name, USER_BY_IDENTIFIER.sql, (sample['phone_number'], sample['phone_number'])),
+        (USER_BY_SESSION.name, USER_BY_SESSION.sql, (sample['session_token'],)),
+        ('order_history', HISTORY_QUERY, {'user_id': sample['user_id'], 'start': start_at, 'end': end_at, 'limit': 100}),
+    ]
+    cursor = conn.cursor(cursor_factory=PlainCursor)
+    results = {}
+    try:
+        for name, sql, params in queries:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            scans = _scans(cursor.fetchone()[0][0]['Plan'])
+            large = []
+            for node, relation in scans:
+                if node != 'Seq Scan':
+                    continue
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', (relation,))
+                if cursor.fetchone()[0] > SEQ_SCAN_ROWS:
+                    large.append(relation)
+            results[name] = {'scans': [f"{node} on {relation}" for node, relation in scans], 'seqScans': large}
+    finally:
+        cursor.close()
+        conn.rollback()
+    return results
+
+def regressions(results, baseline, tolerance):
+    """Messages for plans that seq-scan large tables and p99s beyond tolerance x the baseline"""
+    found = []
+    previous = {step['users']: step for step in (baseline or {}).get('steps', [])}
+    for step in results['steps']:
+        for query, plan in step['plans'].items():
+            for relation in plan['seqScans']:
+                found.append(f"{step['users']} users: {query} seq-scans {relation}")
+        base = previous.get(step['users'])
+        if not base:
+            continue
+        for name, timing in step['endpoints'].items():
+            before = base['endpoints'].get(name)
+            if before and timing['p99'] > before['p99'] * tolerance and timing['p99'] - before['p99'] > MIN_REGRESSION_MS:
+                found.append(f"{step['users']} users: {name} p99 {timing['p99']:.1f} ms (baseline {before['p99']:.1f} ms)")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--steps', default='10000,100000,1000000', help='synthetic user counts to measure at')
+    parser.add_argument('--products', type=int, default=0, help='synthetic products to add before the first step')
+    parser.add_argument('--requests', type=int, default=300, help='timed requests per endpoint per step')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--settle', type=float, default=15, help='seconds to let background jobs finish before timing')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='results JSON from an earlier run to compare p99s against')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args()
+    steps = sorted(int(s) for s in args.steps.split(','))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    # Importing the app creates the schema and the initial catalog snapshot
+    import app as server
+    client = server.app.test_client()
+    conn = connect()
+    cursor = conn.cursor()
+    if args.products:
+        version, count = load_products(conn, args.products, args.seed, Config.CATALOG_SNAPSHOT)
+        print(f"catalog {version}: {count} products")
+    rng = random.Random(args.seed)
+    results = {'seed': args.seed, 'requests': args.requests, 'steps': []}
+    try:
+        for users in steps:
+            have = synthetic_users(cursor)
+            conn.commit()
+            if have < users:
+                started = time.perf_counter()
+                load_users(conn, users - have, args.seed)
+                print(f"loaded {users - have} users in {time.perf_counter() - started:.1f}s")
+            server.catalog.reload_if_changed()
+            # The app's startup refreshes and index rebuilds run on threads in this process; let them finish
+            time.sleep(args.settle)
+            snapshot = server.catalog.current()
+            rows = samples(cursor, args.requests)
+            step = {'users': users, 'rows': row_counts(cursor), 'endpoints': {}, 'plans': plans(conn, rows[0])}
+            conn.commit()
+            for name, fn in endpoints(snapshot, rng):
+                fn(client, rows[0])  # warm caches and pooled connections
+                step['endpoints'][name] = measure(client, fn, rows, args.requests)
+            results['steps'].append(step)
+
+            print(f"\n{users} synthetic users; " + ', '.join(f"{t} {n}" for t, n in step['rows'].items()))
+            print(f"{'endpoint':<18}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+            for name, timing in step['endpoints'].items():
+                print(f"{name:<18}{timing['p50']:>10.2f}{timing['p99']:>10.2f}{timing['errors']:>8}")
+            for query, plan in step['plans'].items():
+                print(f"{query:<18} {'; '.join(plan['scans'])}")
+    finally:
+        cursor.close()
+        conn.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    found = regressions(results, baseline, args.tolerance)
+    for message in found:
+        print(f"REGRESSION {message}")
+    if found:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
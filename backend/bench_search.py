@@ -0,0 +1,59 @@
+"""Measure typeahead latency of the suggest index over a synthetic catalog.
+
+Usage: python bench_search.py [--products 100000] [--queries 20000]
+"""
+import argparse
+import random
+import time
+from search_index import SuggestIndex
+
+SIZES = ['A0', 'A1', 'A2', 'A3', 'A4', 'A5']
+KINDS = ['Paper Sheets', 'Bond Paper', 'Copier Paper', 'Cardstock', 'Art Paper', 'Photo Paper']
+GSMS = [60, 70, 75, 80, 90, 100, 120, 170, 210, 250, 300]
+
+def synthetic_catalog(count, seed=7):
+    rng = random.Random(seed)
+    brands = [f"{rng.choice(['Acme', 'Bright', 'Metro', 'Fine', 'Global', 'Premium'])} {rng.choice(['Papers', 'Pulp', 'Print', 'Mills'])} {i}" for i in range(400)]
+    return [{
+        'id': i,
+        'sku': f"PC{i}",
+        'name': f"{rng.choice(SIZES)} {rng.choice(KINDS)}",
+        'brand': rng.choice(brands),
+        'gsmOptions': rng.sample(GSMS, 3)
+    } for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.products)
+    index = SuggestIndex()
+    start = time.perf_counter()
+    index.build(catalog)
+    print(f"build: {time.perf_counter() - start:.2f}s for {args.products} products, {len(index.keys)} keys")
+
+    rng = random.Random(1)
+    words = [p['sku'] for p in catalog[:1000]] + [p['brand'] for p in catalog[:1000]] + ['80 gsm', 'a4 copier', 'bond', 'card']
+    prefixes = []
+    for _ in range(args.queries):
+        word = rng.choice(words).lower()
+        prefixes.append(word[:rng.randint(1, len(word))])
+
+    timings = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"suggest: p50 {p50:.1f}us, p99 {p99:.1f}us over {args.queries} queries")
+
+    start = time.perf_counter()
+    index.upsert_product(dict(catalog[0], brand='Newly Listed Brand'))
+    print(f"incremental update: {(time.perf_counter() - start) * 1e3:.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Compare bytes and CPU per catalog response for the JSON encoders and field projection.
+
+Usage: python bench_serialization.py [--products 48] [--iterations 2000]
+"""
+import argparse
+import json
+import time
+from serializer import orjson, project
+
+IMAGE_URL = 'https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a4-bundle.jpg'
+BRANDS = ["B2B", "Global Paper Co.", "Acme Papers", "FinePrint", "PaperWorks", "Premium Pulp", "BrightLeaf", "Metro Paper"]
+
+# Fields CategoryPage.js renders for each product card
+CARD_FIELDS = {'id', 'name', 'brand', 'imageUrl', 'gsmOptions', 'pricePerUnit', 'inStock'}
+
+def build_listing(count):
+    """Category listing payload shaped like /api/categories/<slug>/products"""
+    items = [{
+        'id': 100 + i,
+        'name': 'A4 Paper Sheets',
+        'categorySlug': 'a4-paper-sheets',
+        'brand': BRANDS[i % len(BRANDS)],
+        'imageUrl': IMAGE_URL,
+        'gsmOptions': [70, 75, 80, 90],
+        'pricePerUnit': round(3.0 + (i % 5) * 0.2, 2),
+        'minOrderQty': 10,
+        'inStock': i % 7 != 0,
+        'stockQty': 1000 if i % 7 != 0 else 0
+    } for i in range(count)]
+    return {'total': count, 'page': 1, 'pageSize': count, 'facets': {'brands': sorted(BRANDS), 'gsms': [70, 75, 80, 90]}, 'items': items}
+
+def flask_default(payload):
+    # Flask's DefaultJSONProvider: sorted keys, ASCII escaping, compact separators
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+
+def stdlib_fast(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+
+def measure(encode, payload, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        body = encode(payload)
+    elapsed = time.process_time() - start
+    return len(body), elapsed / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=48)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    full = build_listing(args.products)
+    projected = dict(full, items=project(full['items'], CARD_FIELDS))
+
+    encoders = [('flask default', flask_default), ('stdlib compact', stdlib_fast)]
+    if orjson is not None:
+        encoders.append(('orjson', orjson.dumps))
+    else:
+        print('orjson is not installed; only stdlib encoders are measured')
+
+    print(f"{'encoder':<16}{'payload':<12}{'bytes':>10}{'us/response':>14}")
+    for name, encode in encoders:
+        for label, payload in (('full', full), ('projected', projected)):
+            size, cpu_us = measure(encode, payload, args.iterations)
+            print(f"{name:<16}{label:<12}{size:>10}{cpu_us:>14.1f}")
+
+if __name__ == '__main__':
+    main()
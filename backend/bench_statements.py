@@ -0,0 +1,116 @@
+"""Compare ad-hoc and prepared execution of the hot auth and order queries.
+
+Usage: python bench_statements.py [--iterations 2000]
+
+Runs against the database in config.py with the app's tables created (start
+the app once). Timed writes are rolled back; the seeded user, session and
+order are deleted at the end.
+"""
+import argparse
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+import psycopg2
+from psycopg2.extensions import cursor as PlainCursor
+from psycopg2.extras import RealDictCursor
+from config import Config
+from statements import USER_BY_IDENTIFIER, USER_BY_SESSION, INSERT_SESSION, INSERT_ORDER_ITEM
+
+PLANNING_TIME = re.compile(r'Planning Time: ([\d.]+) ms')
+
+def connect():
+    return psycopg2.connect(
+        host=Config.DB_HOST, port=Config.DB_PORT, database=Config.DB_NAME,
+        user=Config.DB_USER, password=Config.DB_PASSWORD, cursor_factory=RealDictCursor
+    )
+
+def seed(cursor):
+    """A user, a session and an order to look up and attach rows to"""
+    tag = uuid.uuid4().hex[:8]
+    cursor.execute('''
+        INSERT INTO users (full_name, phone_number, email, password_hash)
+        VALUES ('Bench User', %s, %s, 'x') RETURNING id
+    ''', (f"9{int(tag, 16) % 10 ** 9:09d}", f"bench-{tag}@example.invalid"))
+    user_id = cursor.fetchone()['id']
+    token = f"bench-{tag}"
+    cursor.execute('INSERT INTO sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)',
+                   (user_id, token, datetime.now() + timedelta(days=1)))
+    cursor.execute('''
+        INSERT INTO orders (user_id, payment_method, total_amount) VALUES (%s, 'cod', 0) RETURNING id, created_at
+    ''', (user_id,))
+    order = cursor.fetchone()
+    return user_id, token, order
+
+def workloads(user_id, token, order):
+    expires = datetime.now() + timedelta(days=30)
+    return [
+        (USER_BY_IDENTIFIER, lambda i: (f"bench-missing-{i % 50}", f"bench-missing-{i % 50}")),
+        (USER_BY_SESSION, lambda i: (token,)),
+        (INSERT_SESSION, lambda i: (user_id, uuid.uuid4().hex, expires)),
+        (INSERT_ORDER_ITEM, lambda i: (order['id'], order['created_at'], 100 + i % 40, 'Bench', None, '80', 3.5, 1)),
+    ]
+
+def timed(run, iterations):
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        run(i)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6, timings[int(len(timings) * 0.99)] * 1e6
+
+def planning_ms(conn, sql, params):
+    """Planning time Postgres reports for one execution of sql"""
+    cursor = conn.cursor(cursor_factory=PlainCursor)
+    cursor.execute(f"EXPLAIN (ANALYZE, SUMMARY, TIMING OFF) {sql}", params)
+    plan = '\n'.join(row[0] for row in cursor.fetchall())
+    cursor.close()
+    match = PLANNING_TIME.search(plan)
+    return float(match.group(1)) if match else float('nan')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    conn = connect()
+    cursor = conn.cursor()
+    user_id, token, order = seed(cursor)
+    conn.commit()
+    print(f"{'statement':<22}{'mode':<10}{'p50 us':>10}{'p99 us':>10}{'plan ms':>10}")
+    try:
+        for statement, params in workloads(user_id, token, order):
+            def ad_hoc(i):
+                cursor.execute(statement.sql, params(i))
+            def prepared(i):
+                cursor.execute(statement.execute_sql, params(i))
+
+            cursor.execute(statement.prepare_sql)
+            # Warm both paths so the prepared statement has settled on its cached plan
+            for i in range(10):
+                ad_hoc(i)
+                prepared(i)
+            for mode, run, sql in (('ad hoc', ad_hoc, statement.sql), ('prepared', prepared, statement.execute_sql)):
+                p50, p99 = timed(run, args.iterations)
+                plan = planning_ms(conn, sql, params(0))
+                print(f"{statement.name:<22}{mode:<10}{p50:>10.1f}{p99:>10.1f}{plan:>10.3f}")
+            cursor.execute(f"DEALLOCATE {statement.name}")
+
+        conn.rollback()
+
+        # What a request paid before connections were pooled: connect, query, disconnect
+        def connect_per_call(i):
+            fresh = connect()
+            fresh.cursor().execute(USER_BY_SESSION.sql, (token,))
+            fresh.close()
+        p50, p99 = timed(connect_per_call, max(args.iterations // 10, 10))
+        print(f"{USER_BY_SESSION.name:<22}{'connect':<10}{p50:>10.1f}{p99:>10.1f}{'':>10}")
+    finally:
+        conn.rollback()
+        cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
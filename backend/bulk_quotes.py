@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+from bisect import bisect_right
+from itertools import islice
+
+# Quantity breaks for bulk pricing: (minimum quantity, discount percent)
+PRICE_TIERS = [
+    (0, 0),
+    (100, 5),
+    (500, 10),
+    (1000, 15),
+    (5000, 20),
+]
+_TIER_BREAKS = [t[0] for t in PRICE_TIERS]
+_TIER_DISCOUNTS = [t[1] for t in PRICE_TIERS]
+
+QUOTE_CHUNK_SIZE = 500
+
+def iter_quote_lines(stream, fmt):
+    """Yield raw quote lines one at a time from a CSV or NDJSON byte stream.
+
+    The response is already streaming when a bad line is read, so undecodable bytes
+    and unparseable CSV rows become malformed lines instead of raising.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        line_no = 1
+        while True:
+            line_no += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                row = None
+            yield line_no, row
+    else:
+        for line_no, raw in enumerate(text, start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                yield line_no, json.loads(raw)
+            except ValueError:
+                yield line_no, None
+
+def chunked(iterable, size):
+    """Group an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _parse_line(line_no, row):
+    """Normalise a raw line into (line, product id, quantity) or an error dict"""
+    if not isinstance(row, dict):
+        return {'line': line_no, 'error': 'Malformed line'}
+    try:
+        product_id = int(row.get('productId') or row.get('product_id'))
+        quantity = int(row.get('quantity'))
+    except (TypeError, ValueError):
+        return {'line': line_no, 'error': 'productId and quantity must be integers'}
+    if quantity <= 0:
+        return {'line': line_no, 'error': 'Quantity must be positive'}
+    return line_no, product_id, quantity
+
+def price_chunk(chunk, resolve_products, availability):
+    """Price a chunk of raw lines, resolving all of its products and their live stock in one batch each"""
+    parsed = [_parse_line(line_no, row) for line_no, row in chunk]
+    valid = [p for p in parsed if isinstance(p, tuple)]
+    products = resolve_products({p[1] for p in valid})
+    levels = availability(products)
+
+    # Column-wise tier lookup for the whole chunk
+    quantities = [p[2] for p in valid]
+    discounts = [_TIER_DISCOUNTS[bisect_right(_TIER_BREAKS, q) - 1] for q in quantities]
+
+    results = []
+    priced = iter(zip(valid, discounts))
+    for entry in parsed:
+        if not isinstance(entry, tuple):
+            results.append(entry)
+            continue
+        (line_no, product_id, quantity), discount = next(priced)
+        product = products.get(product_id)
+        if not product:
+            results.append({'line': line_no, 'productId': product_id, 'error': 'Unknown product'})
+            continue
+        unit_price = round(product['pricePerUnit'] * (100 - discount) / 100, 2)
+        results.append({
+            'line': line_no,
+            'productId': product_id,
+            'name': product['name'],
+            'brand': product['brand'],
+            'quantity': quantity,
+            'listPrice': product['pricePerUnit'],
+            'discountPercent': discount,
+            'unitPrice': unit_price,
+            'lineTotal': round(unit_price * quantity, 2),
+            'inStock': levels[product_id] > 0
+        })
+    return results
+
+def stream_quote(stream, fmt, resolve_products, availability, chunk_size=QUOTE_CHUNK_SIZE):
+    """Yield NDJSON quote lines followed by a summary line.
+
+    availability maps product ids to the units on hand, as the stock store reports them.
+    """
+    total_amount = 0.0
+    priced_lines = 0
+    rejected_lines = 0
+    for chunk in chunked(iter_quote_lines(stream, fmt), chunk_size):
+        for result in price_chunk(chunk, resolve_products, availability):
+            if 'error' in result:
+                rejected_lines += 1
+            else:
+                priced_lines += 1
+                total_amount += result['lineTotal']
+            yield json.dumps(result) + '\n'
+    yield json.dumps({
+        'summary': True,
+        'pricedLines': priced_lines,
+        'rejectedLines': rejected_lines,
+        'totalAmount': round(total_amount, 2)
+    }) + '\n'
@@ -0,0 +1,269 @@
+import json
+import secrets
+import threading
+import time
+
+CART_TTL = 30 * 24 * 3600
+MAX_CART_LINES = 200
+# A request can touch every line of a full cart at once
+MAX_OPS_PER_REQUEST = MAX_CART_LINES
+MAX_LINE_QUANTITY = 100000
+
+# Reserved hash fields next to the productId-variant lines; line ids never start with '_'
+COUNT_FIELD = '_count'
+SUBTOTAL_FIELD = '_subtotal'
+
+# KEYS[1] cart hash; ARGV[1] ttl, ARGV[2] max lines, then (op, line id, quantity, line json) per operation.
+# Lines carry pricePaise, so totals move by integer deltas and never need a rescan.
+# Returns false for a missing cart and -1, changing nothing, when the adds would exceed max lines.
+APPLY_SCRIPT = '''
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local added, new_lines = {}, 0
+for i = 3, #ARGV, 4 do
+    local field = ARGV[i + 1]
+    if ARGV[i] == 'add' and not added[field] and redis.call('HEXISTS', KEYS[1], field) == 0 then
+        added[field] = true
+        new_lines = new_lines + 1
+    end
+end
+if new_lines > 0 and redis.call('HLEN', KEYS[1]) - 2 + new_lines > tonumber(ARGV[2]) then
+    return -1
+end
+local changed = {}
+for i = 3, #ARGV, 4 do
+    local op, field, quantity = ARGV[i], ARGV[i + 1], tonumber(ARGV[i + 2])
+    local raw = redis.call('HGET', KEYS[1], field)
+    local old_qty, old_price, line = 0, 0, nil
+    if raw then
+        line = cjson.decode(raw)
+        old_qty, old_price = line.quantity, line.pricePaise
+    end
+    local new_qty = old_qty
+    if op == 'add' then
+        if ARGV[i + 3] ~= '' then
+            line = cjson.decode(ARGV[i + 3])
+        end
+        new_qty = old_qty + quantity
+    elseif op == 'set' and line then
+        new_qty = quantity
+    elseif op == 'remove' then
+        new_qty = 0
+    end
+    if line then
+        if new_qty <= 0 then
+            redis.call('HDEL', KEYS[1], field)
+            new_qty = 0
+            table.insert(changed, field)
+            table.insert(changed, '')
+        else
+            line.quantity = new_qty
+            local encoded = cjson.encode(line)
+            redis.call('HSET', KEYS[1], field, encoded)
+            table.insert(changed, field)
+            table.insert(changed, encoded)
+        end
+        redis.call('HINCRBY', KEYS[1], '_count', new_qty - old_qty)
+        redis.call('HINCRBY', KEYS[1], '_subtotal', new_qty * (line.pricePaise or 0) - old_qty * old_price)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+local totals = redis.call('HMGET', KEYS[1], '_count', '_subtotal')
+table.insert(changed, 1, totals[2] or '0')
+table.insert(changed, 1, totals[1] or '0')
+return changed
+'''
+
+def cart_key(cart_id):
+    return f"cart:{cart_id}"
+
+def new_cart_id():
+    return secrets.token_urlsafe(16)
+
+def line_id(product_id, variant):
+    return f"{product_id}-{variant}"
+
+def _paise(amount):
+    return int(round(float(amount) * 100))
+
+def parse_ops(ops, resolve_products):
+    """Validate delta operations into (op, line id, quantity, line) tuples; raises ValueError.
+
+    Catalog products are priced from the catalog; other lines keep the client's unit price.
+    """
+    if not isinstance(ops, list) or not ops:
+        raise ValueError('ops must be a non-empty list')
+    if len(ops) > MAX_OPS_PER_REQUEST:
+        raise ValueError(f'At most {MAX_OPS_PER_REQUEST} operations per request')
+    catalog = resolve_products({o.get('productId') for o in ops if isinstance(o, dict) and o.get('op') == 'add'})
+    parsed = []
+    for o in ops:
+        if not isinstance(o, dict) or o.get('op') not in ('add', 'set', 'remove'):
+            raise ValueError('Each op needs op = add, set or remove')
+        try:
+            quantity = int(o.get('quantity', 0 if o['op'] == 'remove' else 1))
+        except (TypeError, ValueError):
+            raise ValueError('quantity must be an integer')
+        if abs(quantity) > MAX_LINE_QUANTITY:
+            raise ValueError('quantity is too large')
+
+        if o['op'] == 'add':
+            if o.get('productId') is None:
+                raise ValueError('add needs productId')
+            product = catalog.get(o['productId'])
+            variant = str(o.get('variant') or '')
+            unit_price = product['pricePerUnit'] if product else o.get('unitPrice')
+            try:
+                price_paise = _paise(unit_price)
+            except (TypeError, ValueError):
+                raise ValueError('add needs a unitPrice for products outside the catalog')
+            line = {
+                'productId': o['productId'],
+                'name': (product or {}).get('name') or o.get('name'),
+                'image': o.get('image') or (product or {}).get('imageUrl'),
+                'variant': variant,
+                'category': o.get('category'),
+                'originalPrice': o.get('originalPrice'),
+                'pricePaise': price_paise
+            }
+            lid = line_id(o['productId'], variant)
+            if lid.startswith('_'):
+                raise ValueError('Invalid productId')
+            parsed.append(('add', lid, quantity, line))
+        else:
+            if not o.get('lineId'):
+                raise ValueError(f"{o['op']} needs lineId")
+            lid = str(o['lineId'])
+            if lid.startswith('_'):
+                raise ValueError('Invalid lineId')
+            parsed.append((o['op'], lid, quantity, None))
+    return parsed
+
+def _cart_full():
+    return ValueError(f'A cart holds at most {MAX_CART_LINES} lines')
+
+def _public_line(lid, line):
+    return dict(
+        {k: v for k, v in line.items() if k != 'pricePaise'},
+        id=lid,
+        unitPrice=line['pricePaise'] / 100,
+        lineTotal=line['pricePaise'] * line['quantity'] / 100
+    )
+
+def _totals(count, subtotal_paise):
+    return {'count': int(count or 0), 'subtotal': int(subtotal_paise or 0) / 100}
+
+class RedisCartStore:
+    """Carts as Redis hashes, one field per productId-variant line plus running totals"""
+
+    def __init__(self, client):
+        self.client = client
+        self._apply = client.register_script(APPLY_SCRIPT)
+
+    def apply(self, cart_id, ops, ttl=CART_TTL):
+        """Apply delta ops atomically; returns totals and the changed lines (None when removed),
+        or None if the cart does not exist. Raises ValueError if the cart would exceed MAX_CART_LINES."""
+        args = [ttl, MAX_CART_LINES]
+        for op, lid, quantity, line in ops:
+            args.extend([op, lid, quantity, json.dumps(line) if line else ''])
+        result = self._apply(keys=[cart_key(cart_id)], args=args)
+        if result is None:
+            return None
+        if result == -1:
+            raise _cart_full()
+        lines = {result[i]: (_public_line(result[i], json.loads(result[i + 1])) if result[i + 1] else None)
+                 for i in range(2, len(result), 2)}
+        return dict(_totals(result[0], result[1]), lines=lines)
+
+    def get(self, cart_id):
+        """Full cart, or None if it does not exist or has expired"""
+        data = self.client.hgetall(cart_key(cart_id))
+        if not data:
+            return None
+        items = [_public_line(k, json.loads(v)) for k, v in data.items() if not k.startswith('_')]
+        return dict(_totals(data.get(COUNT_FIELD), data.get(SUBTOTAL_FIELD)), items=items)
+
+    def create(self, cart_id, ttl=CART_TTL):
+        self.client.hset(cart_key(cart_id), mapping={COUNT_FIELD: 0, SUBTOTAL_FIELD: 0})
+        self.client.expire(cart_key(cart_id), ttl)
+
+    def delete(self, cart_id):
+        self.client.delete(cart_key(cart_id))
+
+class LocalCartStore:
+    """In-process carts used when Redis is unavailable"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.carts = {}
+
+    def _live(self, cart_id):
+        cart = self.carts.get(cart_id)
+        if cart and cart['expires'] <= time.time():
+            del self.carts[cart_id]
+            return None
+        return cart
+
+    def apply(self, cart_id, ops, ttl=CART_TTL):
+        with self.lock:
+            cart = self._live(cart_id)
+            if cart is None:
+                return None
+            new_lines = {lid for op, lid, _, _ in ops if op == 'add' and lid not in cart['lines']}
+            if len(cart['lines']) + len(new_lines) > MAX_CART_LINES:
+                raise _cart_full()
+            changed = {}
+            for op, lid, quantity, new_line in ops:
+                line = cart['lines'].get(lid)
+                old_qty = line['quantity'] if line else 0
+                old_price = line['pricePaise'] if line else 0
+                new_qty = old_qty
+                if op == 'add':
+                    line = dict(new_line)
+                    new_qty = old_qty + quantity
+                elif op == 'set' and line:
+                    new_qty = quantity
+                elif op == 'remove':
+                    new_qty = 0
+                if not line:
+                    continue
+                if new_qty <= 0:
+                    new_qty = 0
+                    cart['lines'].pop(lid, None)
+                    changed[lid] = None
+                else:
+                    line = dict(line, quantity=new_qty)
+                    cart['lines'][lid] = line
+                    changed[lid] = _public_line(lid, line)
+                cart['count'] += new_qty - old_qty
+                cart['subtotal'] += new_qty * line['pricePaise'] - old_qty * old_price
+            cart['expires'] = time.time() + ttl
+            return dict(_totals(cart['count'], cart['subtotal']), lines=changed)
+
+    def get(self, cart_id):
+        with self.lock:
+            cart = self._live(cart_id)
+            if cart is None:
+                return None
+            items = [_public_line(lid, line) for lid, line in cart['lines'].items()]
+            return dict(_totals(cart['count'], cart['subtotal']), items=items)
+
+    def create(self, cart_id, ttl=CART_TTL):
+        with self.lock:
+            self.carts[cart_id] = {'lines': {}, 'count': 0, 'subtotal': 0, 'expires': time.time() + ttl}
+
+    def delete(self, cart_id):
+        with self.lock:
+            self.carts.pop(cart_id, None)
+
+def order_items(cart):
+    """Cart lines in the item shape create_order takes"""
+    return [{
+        'productId': line['productId'],
+        'name': line['name'],
+        'image': line['image'],
+        'variant': line['variant'],
+        'unitPrice': line['unitPrice'],
+        'quantity': line['quantity']
+    } for line in cart['items']]
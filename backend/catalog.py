@@ -0,0 +1,536 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from operator import or_
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # stdlib decoder is used when orjson is not installed
+    orjson = None
+
+# Snapshot layout: preamble, JSON header (version, categories, per-category listing
+# ranges and facets, column and section directory), then 8-byte aligned binary
+# sections. Products are stored column by column: typed arrays for numbers and
+# flags, dictionary codes for repetitive values (brand, category, image, GSM set)
+# and a string heap for unique text such as SKUs. Workers mmap the file read-only,
+# so columns live once in the page cache however many workers serve it, and a
+# product dict is materialised only when a request touches that row.
+MAGIC = b'PCSNAP02'
+LEGACY_MAGIC = b'PCSNAP01'
+# magic, header length (padded to 8 bytes), product count
+_PREAMBLE = struct.Struct('<8sQQ')
+
+# Storage for known product fields. 'dict' columns hold codes into a table of distinct
+# values and fall back to a string heap ('text') when nearly every value is distinct.
+# Other fields, and values a column cannot hold exactly, go to the row's JSON extras.
+COLUMNS = {
+    'id': 'q',
+    'sku': 'text',
+    'name': 'dict',
+    'categorySlug': 'dict',
+    'brand': 'dict',
+    'imageUrl': 'dict',
+    'gsmOptions': 'dict',
+    'sheetSize': 'dict',
+    'pricePerUnit': 'd',
+    'pricePerReam': 'd',
+    'pricePerCarton': 'd',
+    'minOrderQty': 'i',
+    'stockQty': 'i',
+    'inStock': 'B',
+}
+_INT_RANGES = {'q': (-2 ** 63, 2 ** 63), 'i': (-2 ** 31, 2 ** 31)}
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode()
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _fits(kind, value):
+    """Whether a column of this kind stores value exactly (None prices are kept as NaN)"""
+    if kind in _INT_RANGES:
+        low, high = _INT_RANGES[kind]
+        return type(value) is int and low <= value < high
+    if kind == 'd':
+        return value is None or (type(value) is float and value == value)
+    if kind == 'B':
+        return type(value) is bool
+    if kind == 'text':
+        return type(value) is str
+    return True
+
+def _heap(values):
+    """int64 end offsets (with a leading 0) and the concatenated UTF-8 bytes"""
+    offsets = array('q', [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode()
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+def _column_kinds(products):
+    """COLUMNS, with 'dict' text columns whose values are nearly all distinct moved to a heap"""
+    kinds = dict(COLUMNS)
+    for name, kind in COLUMNS.items():
+        if kind != 'dict':
+            continue
+        present = [p[name] for p in products if name in p]
+        if all(type(v) is str for v in present) and len(set(present)) > max(256, len(products) // 4):
+            kinds[name] = 'text'
+    return kinds
+
+def _encode_columns(products):
+    """Shape table, column directory and binary sections for products in listing order"""
+    kinds = _column_kinds(products)
+    shapes, shape_codes = {}, array('I')
+    extras_offsets, extras = array('q', [0]), bytearray()
+    values = {name: [] for name in kinds}
+    for product in products:
+        shape, row_extras = [], {}
+        for key, value in product.items():
+            columnar = key in kinds and _fits(kinds[key], value)
+            shape.append((key, columnar))
+            if not columnar:
+                row_extras[key] = value
+        shape = tuple(shape)
+        for name in kinds:
+            values[name].append(product[name] if (name, True) in shape else None)
+        shape_codes.append(shapes.setdefault(shape, len(shapes)))
+        if row_extras:
+            extras += _dumps(row_extras)
+        extras_offsets.append(len(extras))
+
+    columns = {}
+    sections = {'shapes': shape_codes, 'extras.offsets': extras_offsets, 'extras.data': bytes(extras)}
+    for name, kind in kinds.items():
+        column = values[name]
+        columns[name] = {'kind': kind}
+        if kind == 'dict':
+            table = {}
+            sections[name] = array('I', (table.setdefault(_dumps(v), len(table)) for v in column))
+            columns[name]['values'] = [_loads(raw) for raw in table]
+        elif kind == 'text':
+            sections[f'{name}.offsets'], sections[f'{name}.data'] = _heap(v or '' for v in column)
+        elif kind == 'd':
+            sections[name] = array('d', (float('nan') if v is None else v for v in column))
+        else:
+            sections[name] = array(kind, (v or 0 for v in column))
+    shape_table = [[[key, columnar] for key, columnar in shape] for shape in shapes]
+    return shape_table, columns, sections
+
+# --- Demo catalog, written to a snapshot on first start ---
+DEMO_CATEGORIES = [
+    {"id": 1, "name": "A1 Paper Sheets", "slug": "a1-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a3-bundle.jpg", "description": "Premium quality, A1 Sheets."},
+    {"id": 2, "name": "A2 Paper Sheets", "slug": "a2-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a2-bundle.jpg", "description": "Premium quality, A2 Sheets."},
+    {"id": 3, "name": "A3 Paper Sheets", "slug": "a3-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a3-bundle.jpg", "description": "Premium quality, A3 Sheets."},
+    {"id": 4, "name": "A4 Paper Sheets", "slug": "a4-paper-sheets", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a4-bundle.jpg", "description": "Premium quality, A4 Sheets."},
+    {"id": 5, "name": "Passport Size Photos", "slug": "passport-size-photos", "heroImageUrl": "https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/passport-photo.jpg", "description": "Premium photo sheets."},
+]
+
+# Simple pool of brands and gsm options
+_BRANDS = ["B2B", "Global Paper Co.", "Acme Papers", "FinePrint", "PaperWorks", "Premium Pulp", "BrightLeaf", "Metro Paper"]
+_GSMS = [70, 75, 80, 90]
+
+def demo_products():
+    """8 demo products per category"""
+    products = []
+    pid = 100
+    for cat in DEMO_CATEGORIES:
+        for i in range(8):
+            base_price = 3.0 + (i % 5) * 0.2
+            products.append({
+                "id": pid,
+                "sku": f"PC{pid}",
+                "name": cat["name"],
+                "categorySlug": cat["slug"],
+                "brand": _BRANDS[i % len(_BRANDS)],
+                "imageUrl": cat["heroImageUrl"],
+                "gsmOptions": _GSMS,
+                "pricePerUnit": round(base_price, 2),
+                "minOrderQty": 10,
+                "inStock": True if i % 7 != 0 else False,
+                "stockQty": 1000 if i % 7 != 0 else 0
+            })
+            pid += 1
+    return products
+
+def write_snapshot(path, categories, products):
+    """Write a snapshot atomically (temp file + rename) and return its version"""
+    order = {c['slug']: i for i, c in enumerate(categories)}
+    products = sorted(products, key=lambda p: (
+        order.get(p.get('categorySlug'), len(order)), p.get('categorySlug') or '', p['id']
+    ))
+
+    listing = {}
+    for pos, product in enumerate(products):
+        entry = listing.setdefault(product.get('categorySlug'), {'start': pos, 'brands': set(), 'gsms': set()})
+        entry['end'] = pos + 1
+        entry['brands'].add(product['brand'])
+        entry['gsms'].update(product.get('gsmOptions') or [])
+    for entry in listing.values():
+        entry['brands'] = sorted(entry['brands'])
+        entry['gsms'] = sorted(entry['gsms'])
+    listing.pop(None, None)
+
+    by_id = sorted(range(len(products)), key=lambda pos: products[pos]['id'])
+    ids = array('q', (products[pos]['id'] for pos in by_id))
+    if any(ids[i] == ids[i + 1] for i in range(len(ids) - 1)):
+        raise ValueError('Duplicate product ids in catalog')
+    shapes, columns, sections = _encode_columns(products)
+    sections.update(ids=ids, positions=array('q', by_id))
+
+    directory, blobs, offset = {}, [], 0
+    for name, data in sections.items():
+        raw = data.tobytes() if isinstance(data, array) else data
+        directory[name] = [offset, len(raw), data.typecode if isinstance(data, array) else 'B']
+        raw += b'\0' * (-len(raw) % 8)
+        blobs.append(raw)
+        offset += len(raw)
+    body = b''.join(blobs)
+
+    version = hashlib.sha256(_dumps([categories, shapes, columns]) + body).hexdigest()[:12]
+    header = _dumps({
+        'version': version, 'createdAt': time.time(), 'categories': categories, 'listing': listing,
+        'shapes': shapes, 'columns': columns, 'sections': directory
+    })
+    header += b' ' * (-len(header) % 8)
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(header), len(products)))
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return version
+
+def _read_legacy(path):
+    """Categories and products from a PCSNAP01 snapshot (one JSON record per product)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    _, header_len, count = _PREAMBLE.unpack_from(data, 0)
+    base = _PREAMBLE.size
+    header = _loads(data[base:base + header_len])
+    base += header_len
+    offsets = array('q')
+    offsets.frombytes(data[base:base + (count + 1) * 8])
+    records = base + (3 * count + 1) * 8
+    return header['categories'], [_loads(data[records + offsets[i]:records + offsets[i + 1]]) for i in range(count)]
+
+def upgrade_snapshot(path):
+    """Rewrite a PCSNAP01 snapshot in the columnar format; returns True if it did"""
+    with open(path, 'rb') as f:
+        if f.read(len(LEGACY_MAGIC)) != LEGACY_MAGIC:
+            return False
+    write_snapshot(path, *_read_legacy(path))
+    return True
+
+def _copied(table, codes):
+    # Containers such as gsmOptions are shared by many rows; every row gets its own copy
+    def read(pos):
+        value = table[codes[pos]]
+        return value.copy() if isinstance(value, (list, dict)) else value
+    return read
+
+def _search_text(value):
+    return '' if value is None else str(value).lower()
+
+def _optional_float(column):
+    def read(pos):
+        value = column[pos]
+        return None if value != value else value
+    return read
+
+class CatalogSnapshot:
+    """Read-only columnar view over one snapshot file; rows are materialised on access"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len, count = _PREAMBLE.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            hint = '; run `python catalog.py upgrade` to convert it' if magic == LEGACY_MAGIC else ''
+            raise ValueError(f'{path} is not a columnar catalog snapshot{hint}')
+        base = _PREAMBLE.size
+        header = _loads(self.mm[base:base + header_len])
+        self.version = header['version']
+        self.created_at = header['createdAt']
+        self.categories = header['categories']
+        self.listing = header['listing']
+        self.count = count
+
+        # Zero-copy typed views into the mapping
+        view = memoryview(self.mm)
+        base += header_len
+        end = base
+        self.sections = {}
+        for name, (offset, length, typecode) in header['sections'].items():
+            self.sections[name] = view[base + offset:base + offset + length].cast(typecode)
+            end = max(end, base + offset + length + (-length % 8))
+        if end != len(self.mm):
+            raise ValueError(f'{path} is truncated')
+        self.ids = self.sections['ids']
+        self.positions = self.sections['positions']
+        self.shape_codes = self.sections['shapes']
+        self.extras_offsets = self.sections['extras.offsets']
+        self.extras_data = self.sections['extras.data']
+
+        self.columns = header['columns']
+        self.tables = {}
+        self.readers = {name: self._reader(name, spec) for name, spec in self.columns.items()}
+        # Each shape lists a row's keys in order, with the column reader or None for extras
+        self.shapes = [
+            tuple((sys.intern(key), self.readers[key] if columnar else None) for key, columnar in shape)
+            for shape in header['shapes']
+        ]
+        # Every row's brand and name are dictionary codes, so search can work on codes alone
+        self.searchable = all(key in self.tables for key in ('brand', 'name')) and all(
+            ['brand', True] in shape and ['name', True] in shape for shape in header['shapes']
+        )
+
+    def _reader(self, name, spec):
+        kind = spec['kind']
+        if kind == 'dict':
+            codes = self.sections[name]
+            table = self.tables[name] = [sys.intern(v) if type(v) is str else v for v in spec['values']]
+            if any(isinstance(v, (list, dict)) for v in table):
+                return _copied(table, codes)
+            return lambda pos: table[codes[pos]]
+        if kind == 'text':
+            offsets, data = self.sections[f'{name}.offsets'], self.sections[f'{name}.data']
+            return lambda pos: str(data[offsets[pos]:offsets[pos + 1]], 'utf-8')
+        column = self.sections[name]
+        if kind == 'd':
+            return _optional_float(column)
+        if kind == 'B':
+            return lambda pos: column[pos] != 0
+        return column.__getitem__
+
+    def __len__(self):
+        return self.count
+
+    def _extras(self, pos):
+        return _loads(self.extras_data[self.extras_offsets[pos]:self.extras_offsets[pos + 1]])
+
+    def _record(self, pos):
+        row, extras = {}, None
+        for key, read in self.shapes[self.shape_codes[pos]]:
+            if read is not None:
+                row[key] = read(pos)
+            else:
+                if extras is None:
+                    extras = self._extras(pos)
+                row[key] = extras[key]
+        return row
+
+    def _field(self, pos, key):
+        for name, read in self.shapes[self.shape_codes[pos]]:
+            if name == key:
+                return read(pos) if read is not None else self._extras(pos)[key]
+        return None
+
+    def _position(self, product_id):
+        if not isinstance(product_id, int):
+            return None
+        i = bisect_left(self.ids, product_id)
+        if i < self.count and self.ids[i] == product_id:
+            return self.positions[i]
+        return None
+
+    def __contains__(self, product_id):
+        return self._position(product_id) is not None
+
+    def __iter__(self):
+        for pos in range(self.count):
+            yield self._record(pos)
+
+    def product(self, product_id):
+        pos = self._position(product_id)
+        return None if pos is None else self._record(pos)
+
+    def products(self, product_ids):
+        """Resolve a batch of ids; unknown ids are left out"""
+        found = {}
+        for product_id in product_ids:
+            pos = self._position(product_id)
+            if pos is not None:
+                found[product_id] = self._record(pos)
+        return found
+
+    def category_size(self, slug):
+        entry = self.listing.get(slug)
+        return None if entry is None else entry['end'] - entry['start']
+
+    def category_products(self, slug, start=0, end=None):
+        """Products of a category in listing order, optionally sliced; None for unknown slugs"""
+        entry = self.listing.get(slug)
+        if entry is None:
+            return None
+        size = entry['end'] - entry['start']
+        end = size if end is None else min(end, size)
+        return [self._record(entry['start'] + i) for i in range(max(start, 0), end)]
+
+    def category_search(self, slug, q, start=0, end=None):
+        """(total, products[start:end]) for rows whose lowercased "brand name" contains q; None for unknown slugs.
+
+        Matching reads only the brand and name codes; only the returned slice is materialised.
+        """
+        entry = self.listing.get(slug)
+        if entry is None:
+            return None
+        rows = range(entry['start'], entry['end'])
+        if self.searchable and ' ' not in q:
+            # Without a space q cannot span the brand/name boundary: match each distinct value once
+            brand_hits = [q in _search_text(v) for v in self.tables['brand']]
+            name_hits = [q in _search_text(v) for v in self.tables['name']]
+            mask = map(or_, map(brand_hits.__getitem__, self.sections['brand'][rows.start:rows.stop]),
+                       map(name_hits.__getitem__, self.sections['name'][rows.start:rows.stop]))
+            hits = list(compress(rows, mask))
+        else:
+            hits = [pos for pos in rows
+                    if q in f"{_search_text(self._field(pos, 'brand'))} {_search_text(self._field(pos, 'name'))}"]
+        return len(hits), [self._record(pos) for pos in hits[start:end]]
+
+    def facets(self, slug):
+        entry = self.listing.get(slug) or {}
+        return {'brands': entry.get('brands', []), 'gsms': entry.get('gsms', [])}
+
+    def size_bytes(self):
+        return len(self.mm)
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+class CatalogStore:
+    """Holds the live snapshot and swaps in a new one when the file is replaced.
+
+    Requests take `current()` once and keep using that snapshot, so a swap never
+    changes the catalog under an in-flight request; the old mapping is released
+    when its last reader drops it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.signature = None
+        self.listeners = []
+        self.metrics = {'reloads': 0, 'failedReloads': 0, 'loadedAt': None}
+
+    def current(self):
+        return self.snapshot
+
+    def on_reload(self, fn):
+        """Register fn(snapshot, previous), run before a new snapshot is published"""
+        self.listeners.append(fn)
+        return fn
+
+    def load(self):
+        with self.lock:
+            signature = _file_signature(self.path)
+            snapshot = CatalogSnapshot(self.path)
+            previous = self.snapshot
+            # Derived indexes catch up first so requests never see a snapshot without them
+            for fn in self.listeners:
+                fn(snapshot, previous)
+            self.snapshot = snapshot
+            self.signature = signature
+            self.metrics['loadedAt'] = time.time()
+            if previous is not None:
+                self.metrics['reloads'] += 1
+            return snapshot
+
+    def reload_if_changed(self):
+        """Load the file again if it was replaced; keeps serving the old snapshot on errors"""
+        try:
+            signature = _file_signature(self.path)
+        except OSError as e:
+            print(f"Catalog reload error: {e}")
+            return False
+        if signature == self.signature:
+            return False
+        try:
+            self.load()
+            return True
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            print(f"Catalog reload error: {e}")
+            self.metrics['failedReloads'] += 1
+            # Do not retry the same broken file on every poll
+            self.signature = signature
+            return False
+
+    def _watch_loop(self, interval, stop_event):
+        while not stop_event.wait(interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                # A listener failing on a backend outage; the file is retried on the next poll
+                print(f"Catalog reload error: {e}")
+
+    def start_watcher(self, interval=None):
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self._watch_loop,
+            args=(interval or Config.CATALOG_RELOAD_INTERVAL, stop_event),
+            daemon=True
+        )
+        thread.start()
+        return stop_event
+
+    def status(self):
+        snapshot = self.snapshot
+        return dict(
+            self.metrics,
+            path=self.path,
+            version=snapshot.version if snapshot else None,
+            products=len(snapshot) if snapshot else 0,
+            mappedBytes=snapshot.size_bytes() if snapshot else 0
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description='Build, import or dump catalog snapshots')
+    parser.add_argument('command', choices=['build', 'import', 'dump', 'upgrade'])
+    parser.add_argument('source', nargs='?', help='JSON catalog to import, or snapshot to upgrade')
+    parser.add_argument('--output', help='Output path (default: CATALOG_SNAPSHOT, or catalog.json for dump)')
+    args = parser.parse_args()
+
+    if args.command == 'upgrade':
+        path = args.source or Config.CATALOG_SNAPSHOT
+        print(f"Upgraded {path}" if upgrade_snapshot(path) else f"{path} is already columnar")
+        return 0
+
+    if args.command == 'dump':
+        snapshot = CatalogSnapshot(Config.CATALOG_SNAPSHOT)
+        with open(args.output or 'catalog.json', 'w', encoding='utf-8') as f:
+            json.dump({'categories': snapshot.categories, 'products': list(snapshot)}, f, indent=2, ensure_ascii=False)
+        return 0
+
+    if args.command == 'import':
+        if not args.source:
+            parser.error('import needs a JSON catalog file')
+        with open(args.source, encoding='utf-8') as f:
+            data = json.load(f)
+        categories, products = data['categories'], data['products']
+    else:
+        categories, products = DEMO_CATEGORIES, demo_products()
+    version = write_snapshot(args.output or Config.CATALOG_SNAPSHOT, categories, products)
+    print(f"Wrote catalog snapshot {version} ({len(products)} products)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
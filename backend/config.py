@@ -15,16 +15,79 @@ class Config:
     DB_USER = os.getenv('DB_USER', 'postgres')
     DB_PASSWORD = os.getenv('DB_PASSWORD', 'admin1234')
     
+    # Timeouts and circuit breaker for Postgres
+    DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '3'))
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000'))
+    DB_BREAKER_THRESHOLD = int(os.getenv('DB_BREAKER_THRESHOLD', '5'))
+    DB_BREAKER_RESET_SECONDS = float(os.getenv('DB_BREAKER_RESET_SECONDS', '10'))
+    
+    # Read replicas as comma-separated host[:port] entries; empty means all reads go to the primary
+    DB_REPLICA_HOSTS = os.getenv('DB_REPLICA_HOSTS', '')
+    DB_REPLICA_USER = os.getenv('DB_REPLICA_USER', DB_USER)
+    DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD', DB_PASSWORD)
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '2'))
+    REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+    
+    # Idle connections kept per database server (0 disables pooling and prepared statements)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_POOL_MAX_IDLE_SECONDS = float(os.getenv('DB_POOL_MAX_IDLE_SECONDS', '300'))
+    
     # Redis Configuration
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    REDIS_TIMEOUT = float(os.getenv('REDIS_TIMEOUT', '0.5'))
+    REDIS_BREAKER_THRESHOLD = int(os.getenv('REDIS_BREAKER_THRESHOLD', '3'))
+    REDIS_BREAKER_RESET_SECONDS = float(os.getenv('REDIS_BREAKER_RESET_SECONDS', '5'))
+
+    # ASGI mode (asgi.py): connections per worker's event loop, and threads for the routes it hands to Flask
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '20'))
+    ASYNC_REDIS_POOL_SIZE = int(os.getenv('ASYNC_REDIS_POOL_SIZE', '100'))
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16'))
+    
+    # Order ingestion: 'sync' writes each order in the request, 'async' queues it
+    ORDER_QUEUE_MODE = os.getenv('ORDER_QUEUE_MODE', 'sync')
+    ORDER_QUEUE_LOG = os.getenv('ORDER_QUEUE_LOG', 'order_queue.log')
+    ORDER_QUEUE_WORKERS = int(os.getenv('ORDER_QUEUE_WORKERS', '2'))
+    ORDER_QUEUE_BATCH_SIZE = int(os.getenv('ORDER_QUEUE_BATCH_SIZE', '200'))
+    
+    # Catalog snapshot file, re-checked for changes every CATALOG_RELOAD_INTERVAL seconds
+    CATALOG_SNAPSHOT = os.getenv('CATALOG_SNAPSHOT', 'catalog.snap')
+    CATALOG_RELOAD_INTERVAL = float(os.getenv('CATALOG_RELOAD_INTERVAL', '2'))
+    
+    # Seconds between sales rollup runs (and trending re-ranks)
+    TRENDING_REFRESH_INTERVAL = float(os.getenv('TRENDING_REFRESH_INTERVAL', '60'))
+    
+    # Seconds between daily sales rollup runs for admin analytics
+    ANALYTICS_REFRESH_INTERVAL = float(os.getenv('ANALYTICS_REFRESH_INTERVAL', '300'))
+    
+    # Seconds between co-purchase mining runs for related products
+    RELATED_REFRESH_INTERVAL = float(os.getenv('RELATED_REFRESH_INTERVAL', '3600'))
+    
+    # Orders are partitioned by month; partitions older than ORDER_ARCHIVE_AFTER_MONTHS
+    # (0 keeps everything) are archived to gzip NDJSON files in ORDER_ARCHIVE_DIR and dropped
+    ORDER_ARCHIVE_DIR = os.getenv('ORDER_ARCHIVE_DIR', 'archive')
+    ORDER_ARCHIVE_AFTER_MONTHS = int(os.getenv('ORDER_ARCHIVE_AFTER_MONTHS', '0'))
+    PARTITION_MAINTENANCE_INTERVAL = float(os.getenv('PARTITION_MAINTENANCE_INTERVAL', '3600'))
     
     # Fast2SMS Configuration
     FAST2SMS_API_KEY = os.getenv('FAST2SMS_API_KEY', '')
     
+    # SMS are sent by background workers; without an API key they are printed instead
+    SMS_API_URL = os.getenv('SMS_API_URL', 'https://www.fast2sms.com/dev/bulkV2')
+    SMS_TIMEOUT = float(os.getenv('SMS_TIMEOUT', '5'))
+    SMS_WORKERS = int(os.getenv('SMS_WORKERS', '2'))
+    SMS_BATCH_SIZE = int(os.getenv('SMS_BATCH_SIZE', '50'))
+    
+    # Responsive image variants built by images.py, served under IMAGE_BASE_URL (point it at a CDN in production)
+    IMAGE_VARIANT_DIR = os.getenv('IMAGE_VARIANT_DIR', 'image_variants')
+    IMAGE_BASE_URL = os.getenv('IMAGE_BASE_URL', 'http://localhost:5000/img')
+    
     # Application Settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
     
+    # Admin endpoints are disabled unless a token is configured
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    
     @classmethod
     def get_database_url(cls):
         """Get complete database URL"""
@@ -32,3 +95,14 @@ class Config:
             return cls.DATABASE_URL
         else:
             return f"postgresql://{cls.DB_USER}:{cls.DB_PASSWORD}@{cls.DB_HOST}:{cls.DB_PORT}/{cls.DB_NAME}"
+    
+    @classmethod
+    def get_replica_hosts(cls):
+        """Parse DB_REPLICA_HOSTS into (host, port) pairs"""
+        hosts = []
+        for entry in cls.DB_REPLICA_HOSTS.split(','):
+            entry = entry.strip()
+            if entry:
+                host, _, port = entry.partition(':')
+                hosts.append((host, port or cls.DB_PORT))
+        return hosts
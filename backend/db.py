@@ -0,0 +1,262 @@
+import itertools
+import os
+import threading
+import time
+from contextvars import ContextVar
+import psycopg2
+from psycopg2.extensions import connection as PGConnection, TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor
+from config import Config
+from resilience import CircuitBreaker, CircuitOpenError
+
+# Idle connections per (role, host, port), reused most recently returned first
+_idle = {}
+_pool_lock = threading.Lock()
+_pool_metrics = {'opened': 0, 'reused': 0, 'returned': 0, 'discarded': 0}
+# Connections inherited from a parent process; kept referenced so they are never closed here
+_inherited = []
+# Connections idle longer than this are pinged before reuse: a server restart, failover or
+# proxy idle timeout leaves dead sockets in the pool
+PING_AFTER_IDLE_SECONDS = 5
+
+def _after_fork():
+    global _pool_lock
+    # A connection's socket is shared with the parent after fork, so the child must not touch it
+    _pool_lock = threading.Lock()
+    _inherited.extend(conn for idle in _idle.values() for conn in idle)
+    _idle.clear()
+
+os.register_at_fork(after_in_child=_after_fork)
+
+class PooledConnection(PGConnection):
+    """Connection that goes back to its pool on close() and remembers what it has PREPAREd"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_key = None
+        self.idle_since = None
+        self.prepared_statements = set()
+
+    def close(self):
+        if not _release(self):
+            with _pool_lock:
+                _pool_metrics['discarded'] += 1
+            super().close()
+
+class ReplicaConnection(PooledConnection):
+    """Connection to a read replica"""
+    is_replica = True
+
+def _release(conn):
+    """Put a connection back in its pool after ending any open transaction; False to really close it"""
+    if conn.closed or conn.pool_key is None or Config.DB_POOL_SIZE <= 0:
+        return False
+    try:
+        if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+    except psycopg2.Error:
+        return False
+    if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        return False
+    conn.idle_since = time.monotonic()
+    with _pool_lock:
+        idle = _idle.setdefault(conn.pool_key, [])
+        if len(idle) >= Config.DB_POOL_SIZE:
+            return False
+        idle.append(conn)
+        _pool_metrics['returned'] += 1
+    return True
+
+def _alive(conn):
+    """One round trip outside a transaction, so the check leaves no transaction open"""
+    try:
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute('SELECT 1')
+        cur.close()
+        conn.autocommit = False
+        return True
+    except psycopg2.Error:
+        return False
+
+def _pooled(key, connect):
+    """An idle connection for key, or a new one from connect(); stale or dead idle connections are closed"""
+    if Config.DB_POOL_SIZE <= 0:
+        conn = connect()
+        # Preparing on a connection used once would only add a round trip
+        conn.prepared_statements = None
+        return conn
+    while True:
+        stale = []
+        conn = None
+        with _pool_lock:
+            idle = _idle.get(key, [])
+            while idle:
+                candidate = idle.pop()
+                if candidate.closed or time.monotonic() - candidate.idle_since > Config.DB_POOL_MAX_IDLE_SECONDS:
+                    stale.append(candidate)
+                    continue
+                conn = candidate
+                break
+        for candidate in stale:
+            candidate.pool_key = None
+            candidate.close()
+        if conn is None:
+            break
+        if time.monotonic() - conn.idle_since <= PING_AFTER_IDLE_SECONDS or _alive(conn):
+            with _pool_lock:
+                _pool_metrics['reused'] += 1
+            return conn
+        conn.pool_key = None
+        conn.close()
+    conn = connect()
+    conn.pool_key = key
+    with _pool_lock:
+        _pool_metrics['opened'] += 1
+    return conn
+
+def pool_status():
+    with _pool_lock:
+        return dict(_pool_metrics, idle={f"{role} {host}:{port}": len(conns) for (role, host, port), conns in _idle.items()})
+
+postgres_breaker = CircuitBreaker('postgres', Config.DB_BREAKER_THRESHOLD, Config.DB_BREAKER_RESET_SECONDS)
+
+def _timeouts():
+    return {
+        'connect_timeout': Config.DB_CONNECT_TIMEOUT,
+        'options': f"-c statement_timeout={Config.DB_STATEMENT_TIMEOUT_MS}"
+    }
+
+# Set once the current request has taken a primary connection, so later reads see its writes
+_used_primary = ContextVar('used_primary', default=False)
+
+_replicas = [{'host': host, 'port': port, 'healthy': True, 'lag': None} for host, port in Config.get_replica_hosts()]
+_replicas_lock = threading.Lock()
+_round_robin = itertools.count()
+
+def reset_request_routing():
+    """Forget primary use from a previous request handled on this thread"""
+    _used_primary.set(False)
+
+def is_replica(conn):
+    return getattr(conn, 'is_replica', False)
+
+def _open_replica(replica):
+    return psycopg2.connect(
+        host=replica['host'],
+        port=replica['port'],
+        database=Config.DB_NAME,
+        user=Config.DB_REPLICA_USER,
+        password=Config.DB_REPLICA_PASSWORD,
+        cursor_factory=RealDictCursor,
+        connection_factory=ReplicaConnection,
+        **_timeouts()
+    )
+
+def _connect_replica(replica):
+    return _pooled(('replica', replica['host'], replica['port']), lambda: _open_replica(replica))
+
+def _replica_connection():
+    """Connect to the next healthy replica, or return None"""
+    with _replicas_lock:
+        healthy = [r for r in _replicas if r['healthy']]
+    if not healthy:
+        return None
+    start = next(_round_robin)
+    for offset in range(len(healthy)):
+        replica = healthy[(start + offset) % len(healthy)]
+        try:
+            return _connect_replica(replica)
+        except psycopg2.Error as e:
+            print(f"Replica connection error ({replica['host']}): {e}")
+            with _replicas_lock:
+                replica['healthy'] = False
+    return None
+
+def get_db_connection(readonly=False):
+    """Get PostgreSQL database connection; read-only callers may be routed to a replica.
+
+    Raises CircuitOpenError without connecting while the primary is failing.
+    """
+    if readonly and not _used_primary.get():
+        conn = _replica_connection()
+        if conn:
+            return conn
+    else:
+        _used_primary.set(True)
+
+    if not postgres_breaker.allow():
+        raise CircuitOpenError('postgres', postgres_breaker.retry_after())
+    try:
+        conn = _pooled(('primary', Config.DB_HOST, Config.DB_PORT), lambda: psycopg2.connect(
+            host=Config.DB_HOST,
+            port=Config.DB_PORT,
+            database=Config.DB_NAME,
+            user=Config.DB_USER,
+            password=Config.DB_PASSWORD,
+            cursor_factory=RealDictCursor,
+            connection_factory=PooledConnection,
+            **_timeouts()
+        ))
+        postgres_breaker.record_success()
+        return conn
+    except psycopg2.Error as e:
+        postgres_breaker.record_failure()
+        print(f"Database connection error: {e}")
+        return None
+
+REPLICA_LAG_QUERY = '''
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag
+'''
+
+def check_replicas():
+    """Measure replication lag and evict replicas that are unreachable or too far behind"""
+    for replica in _replicas:
+        lag = None
+        try:
+            # A fresh connection, so the check also proves the replica accepts connections
+            conn = _open_replica(replica)
+            try:
+                cur = conn.cursor()
+                cur.execute(REPLICA_LAG_QUERY)
+                lag = float(cur.fetchone()['lag'])
+                cur.close()
+            finally:
+                conn.close()
+        except psycopg2.Error as e:
+            print(f"Replica lag check error ({replica['host']}): {e}")
+        with _replicas_lock:
+            replica['lag'] = lag
+            replica['healthy'] = lag is not None and lag <= Config.REPLICA_MAX_LAG_SECONDS
+
+def replica_status():
+    with _replicas_lock:
+        return [{'host': r['host'], 'port': r['port'], 'healthy': r['healthy'], 'lag': r['lag']} for r in _replicas]
+
+def healthy_replicas():
+    """(host, port) of the replicas that passed their last lag check"""
+    with _replicas_lock:
+        return [(r['host'], r['port']) for r in _replicas if r['healthy']]
+
+def _replica_monitor_loop(interval, stop_event):
+    while True:
+        check_replicas()
+        if stop_event.wait(interval):
+            return
+
+def start_replica_monitor(interval=None):
+    """Re-check replica lag in the background; no-op without replicas"""
+    stop_event = threading.Event()
+    if _replicas:
+        thread = threading.Thread(
+            target=_replica_monitor_loop,
+            args=(interval or Config.REPLICA_LAG_CHECK_INTERVAL, stop_event),
+            daemon=True
+        )
+        thread.start()
+    return stop_event
@@ -0,0 +1,204 @@
+"""Pre-built responsive image variants, named by content hash.
+
+    python images.py build [--source ../public/images] [--output image_variants]
+
+resizes every source image to a few widths in AVIF, WebP and JPEG with a
+process pool and writes a manifest; the API reads the manifest to emit
+srcset-ready URLs. Variants are immutable, so they are cached for a year.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+WIDTHS = (160, 320, 640, 1024)
+DEFAULT_WIDTH = 640
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+MANIFEST_NAME = 'manifest.json'
+
+# Most compact first, so browsers pick the first <source> they support
+FORMATS = (
+    ('avif', 'image/avif', {'quality': 50}),
+    ('webp', 'image/webp', {'quality': 75, 'method': 6}),
+    ('jpeg', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+)
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _render(task):
+    """Resize one source to one width and format; runs in a worker process"""
+    source_path, output_dir, width, fmt = task
+    options = dict(next(opts for name, _, opts in FORMATS if name == fmt))
+    with Image.open(source_path) as im:
+        im = im.convert('RGB')
+        if im.width > width:
+            im = im.resize((width, round(im.height * width / im.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        im.save(buffer, format=fmt.upper(), **options)
+        size = im.size
+    data = buffer.getvalue()
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    name = f"{stem}-{size[0]}.{hashlib.sha256(data).hexdigest()[:16]}.{EXTENSIONS[fmt]}"
+    path = os.path.join(output_dir, name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return os.path.basename(source_path), fmt, size[0], size[1], name
+
+def build_variants(source_dir, output_dir, workers=None):
+    """Render missing variants for every source image; returns the manifest.
+
+    Sources whose content hash matches the previous manifest are skipped.
+    """
+    if Image is None:
+        raise RuntimeError('Pillow is required to build image variants (pip install Pillow)')
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = json.load(f)
+
+    manifest, tasks = {}, []
+    for name in sorted(os.listdir(source_dir)):
+        if not name.lower().endswith(SOURCE_EXTENSIONS):
+            continue
+        path = os.path.join(source_dir, name)
+        source_hash = _file_hash(path)
+        entry = previous.get(name)
+        if entry and entry['sourceHash'] == source_hash and all(
+                os.path.exists(os.path.join(output_dir, variant))
+                for variants in entry['variants'].values() for _, variant in variants):
+            manifest[name] = entry
+            continue
+        with Image.open(path) as im:
+            original_width, original_height = im.size
+        manifest[name] = {'sourceHash': source_hash, 'width': original_width, 'height': original_height,
+                          'variants': {fmt: [] for fmt, _, _ in FORMATS}}
+        # Never upscale; a narrow source gets a single variant at its own width
+        widths = sorted({min(w, original_width) for w in WIDTHS})
+        tasks.extend((path, output_dir, w, fmt) for w in widths for fmt, _, _ in FORMATS)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, fmt, width, height, variant in pool.map(_render, tasks, chunksize=4):
+            manifest[name]['variants'][fmt].append([width, variant])
+    for entry in manifest.values():
+        for variants in entry['variants'].values():
+            variants.sort()
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+class ImageVariants:
+    """Maps image URLs to srcset-ready variant URLs from the build manifest"""
+
+    def __init__(self, output_dir, base_url):
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.base_url = base_url.rstrip('/')
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.cache = {}
+        self.signature = None
+
+    def reload_if_changed(self):
+        """Re-read the manifest when the file changed; returns True if it did"""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return False
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return False
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except ValueError as e:
+            print(f"Image manifest error: {e}")
+            return False
+        with self.lock:
+            self.entries = entries
+            self.cache = {}
+            self.signature = signature
+        return True
+
+    def image_set(self, url):
+        """{'src', 'width', 'height', 'sources': [{'type', 'srcset'}]} for a known image, else None"""
+        if not url:
+            return None
+        cache = self.cache
+        if url in cache:
+            return cache[url]
+        entry = self.entries.get(os.path.basename(urlparse(url).path))
+        result = None
+        if entry:
+            variants = entry['variants']
+            fallback = [v for v in variants['jpeg'] if v[0] <= DEFAULT_WIDTH] or variants['jpeg'][:1]
+            result = {
+                'src': f"{self.base_url}/{fallback[-1][1]}",
+                'width': entry['width'],
+                'height': entry['height'],
+                'sources': [{
+                    'type': mime,
+                    'srcset': ', '.join(f"{self.base_url}/{name} {width}w" for width, name in variants[fmt])
+                } for fmt, mime, _ in FORMATS if variants.get(fmt)]
+            }
+        cache[url] = result
+        return result
+
+    def rewrite(self, item, url_field, set_field):
+        """Copy of item with url_field pointing at the default variant and set_field holding the sources"""
+        image_set = self.image_set(item.get(url_field))
+        if image_set is None:
+            return item
+        return dict(item, **{url_field: image_set['src'], set_field: image_set})
+
+    def _watch_loop(self, interval, stop_event):
+        while not stop_event.wait(interval):
+            self.reload_if_changed()
+
+    def start_watcher(self, interval=5):
+        """Pick up a rebuilt manifest without a restart"""
+        stop_event = threading.Event()
+        thread = threading.Thread(target=self._watch_loop, args=(interval, stop_event), daemon=True)
+        thread.start()
+        return stop_event
+
+    def status(self):
+        return {'images': len(self.entries), 'loaded': self.signature is not None}
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Build responsive image variants')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='render variants for new or changed source images')
+    build.add_argument('--source', default=os.path.join(here, '..', 'public', 'images'))
+    build.add_argument('--output', default=os.path.join(here, 'image_variants'))
+    build.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    manifest = build_variants(args.source, args.output, args.workers)
+    variants = sum(len(v) for entry in manifest.values() for v in entry['variants'].values())
+    print(f"{len(manifest)} source images, {variants} variants in {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import redis
+import requests
+from requests.adapters import HTTPAdapter
+
+SMS_QUEUE_KEY = 'sms:outbox'
+FAST2SMS_URL = 'https://www.fast2sms.com/dev/bulkV2'
+
+# Requests in flight per worker, each on its own pooled keep-alive connection
+SEND_CONCURRENCY = 8
+
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 0.5
+
+OTP_TTL_SECONDS = 300
+
+# A code still queued after it has expired is useless
+MESSAGE_TTL = OTP_TTL_SECONDS
+
+# Counters reported through the admin metrics endpoint
+NOTIFICATION_METRICS = {
+    'enqueued': 0,
+    'sent': 0,
+    'failed': 0,
+    'expired': 0,
+    'retries': 0,
+    'requests': 0,
+    'batches': 0,
+}
+_metrics_lock = threading.Lock()
+_latencies = deque(maxlen=1000)
+
+def _count(**increments):
+    with _metrics_lock:
+        for key, value in increments.items():
+            NOTIFICATION_METRICS[key] += value
+
+class SmsSendError(Exception):
+    """Raised by a sender; retryable errors are worth another attempt after a backoff"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+def normalize_phone(phone):
+    """Ten-digit Indian mobile number as Fast2SMS expects it, or None"""
+    digits = re.sub(r'\D', '', str(phone or ''))
+    return digits[-10:] if len(digits) >= 10 else None
+
+class Fast2SmsSender:
+    """Sends through the Fast2SMS bulk API over a keep-alive connection pool"""
+
+    def __init__(self, api_key, url=FAST2SMS_URL, timeout=5, pool_size=SEND_CONCURRENCY):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def send(self, route, text, numbers):
+        """One API request for every number receiving the same text"""
+        payload = {'route': route, 'numbers': ','.join(numbers)}
+        payload['variables_values' if route == 'otp' else 'message'] = text
+        try:
+            response = self.session.post(
+                self.url, json=payload, headers={'authorization': self.api_key}, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise SmsSendError(str(e))
+        if response.status_code == 429 or response.status_code >= 500:
+            raise SmsSendError(f"HTTP {response.status_code}")
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code >= 400 or not body.get('return'):
+            raise SmsSendError(body.get('message') or f"HTTP {response.status_code}", retryable=False)
+
+class ConsoleSender:
+    """Prints messages instead of sending them; used when no SMS API key is configured"""
+
+    def send(self, route, text, numbers):
+        print(f"SMS ({route}) to {','.join(numbers)}: {text}")
+
+class RedisSmsQueue:
+    """Outbound SMS on a Redis list shared by every worker process"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def append(self, message):
+        self.client.rpush(SMS_QUEUE_KEY, json.dumps(message))
+
+    def read(self, count, block_ms):
+        # Polls rather than BLPOP: a blocking pop outlasts the shared client's socket
+        # timeout, and an idle queue would then trip the Redis breaker for everyone
+        batch = self.client.lpop(SMS_QUEUE_KEY, count)
+        if not batch:
+            time.sleep(block_ms / 1000)
+            return []
+        return [json.loads(raw) for raw in batch]
+
+    def backlog(self):
+        return self.client.llen(SMS_QUEUE_KEY)
+
+class AsyncRedisSmsQueue:
+    """Appends to RedisSmsQueue's list from an event loop; the threaded workers drain it as usual"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def append(self, message):
+        await self.client.rpush(SMS_QUEUE_KEY, json.dumps(message))
+
+class LocalSmsQueue:
+    """In-process SMS queue used when Redis is unavailable"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.pending = deque()
+
+    def append(self, message):
+        with self.lock:
+            self.pending.append(message)
+            self.available.notify()
+
+    def read(self, count, block_ms):
+        with self.lock:
+            if not self.pending:
+                self.available.wait(block_ms / 1000)
+            batch = []
+            while self.pending and len(batch) < count:
+                batch.append(self.pending.popleft())
+            return batch
+
+    def backlog(self):
+        with self.lock:
+            return len(self.pending)
+
+class ResilientSmsQueue:
+    """RedisSmsQueue behind the Redis breaker; messages go to an in-process queue while Redis is failing.
+
+    Workers drain the in-process queue first, then Redis, so OTPs queued during an
+    outage are still sent by this process.
+    """
+
+    def __init__(self, primary, breaker, fallback=None):
+        self.primary = primary
+        self.breaker = breaker
+        self.fallback = fallback or LocalSmsQueue()
+
+    def _call(self, name, *args):
+        """(result, True) from Redis, or (None, False) when the breaker is open or the call failed"""
+        if self.breaker.allow():
+            try:
+                result = getattr(self.primary, name)(*args)
+                self.breaker.record_success()
+                return result, True
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                print(f"Redis error, using in-process SMS queue: {e}")
+                self.breaker.record_failure()
+        return None, False
+
+    def append(self, message):
+        if not self._call('append', message)[1]:
+            self.fallback.append(message)
+
+    def read(self, count, block_ms):
+        if self.fallback.backlog():
+            return self.fallback.read(count, 0)
+        batch, from_redis = self._call('read', count, block_ms)
+        return batch if from_redis else self.fallback.read(count, block_ms)
+
+    def backlog(self):
+        queued, _ = self._call('backlog')
+        return (queued or 0) + self.fallback.backlog()
+
+class AsyncResilientSmsQueue:
+    """ResilientSmsQueue for an AsyncRedisSmsQueue; pass the sync queue's breaker and fallback to share them"""
+
+    def __init__(self, primary, breaker, fallback):
+        self.primary = primary
+        self.breaker = breaker
+        self.fallback = fallback
+
+    async def append(self, message):
+        if self.breaker.allow():
+            try:
+                await self.primary.append(message)
+                self.breaker.record_success()
+                return
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                print(f"Redis error, using in-process SMS queue: {e}")
+                self.breaker.record_failure()
+        self.fallback.append(message)
+
+def _message(phone, text, route):
+    number = normalize_phone(phone)
+    if not number:
+        return None
+    return {'number': number, 'route': route, 'text': text, 'enqueuedAt': time.time()}
+
+def enqueue_sms(queue, phone, text, route='q'):
+    """Queue a message and return at once; False if the number is unusable"""
+    message = _message(phone, text, route)
+    if message is None:
+        return False
+    queue.append(message)
+    _count(enqueued=1)
+    return True
+
+def enqueue_otp(queue, phone, otp):
+    return enqueue_sms(queue, phone, otp, route='otp')
+
+async def enqueue_otp_async(queue, phone, otp):
+    """enqueue_otp for an event loop; queue is an AsyncResilientSmsQueue"""
+    message = _message(phone, otp, 'otp')
+    if message is None:
+        return False
+    await queue.append(message)
+    _count(enqueued=1)
+    return True
+
+def _send_with_retries(sender, route, text, numbers, stop_event):
+    """Send one group, backing off exponentially between retryable failures; True once delivered"""
+    for attempt in range(MAX_ATTEMPTS):
+        _count(requests=1)
+        try:
+            sender.send(route, text, numbers)
+            return True
+        except SmsSendError as e:
+            if not e.retryable or attempt == MAX_ATTEMPTS - 1:
+                print(f"SMS send failed for {len(numbers)} recipient(s): {e}")
+                return False
+            _count(retries=1)
+            delay = BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+            if stop_event.wait(delay):
+                return False
+    return False
+
+def _send_group(sender, route, text, messages, stop_event):
+    numbers = sorted({m['number'] for m in messages})
+    if _send_with_retries(sender, route, text, numbers, stop_event):
+        delivered = time.time()
+        with _metrics_lock:
+            NOTIFICATION_METRICS['sent'] += len(messages)
+            _latencies.extend(delivered - m['enqueuedAt'] for m in messages)
+    else:
+        _count(failed=len(messages))
+
+def dispatch_batch(sender, batch, stop_event, executor):
+    """Send a drained batch, one request per distinct (route, text), several at a time"""
+    now = time.time()
+    groups = defaultdict(list)
+    expired = 0
+    for message in batch:
+        if now - message['enqueuedAt'] > MESSAGE_TTL:
+            expired += 1
+            continue
+        groups[(message['route'], message['text'])].append(message)
+    _count(expired=expired, batches=1)
+
+    futures = [executor.submit(_send_group, sender, route, text, messages, stop_event)
+               for (route, text), messages in groups.items()]
+    for future in futures:
+        future.result()
+
+def _worker_loop(queue, sender_factory, batch_size, block_ms, stop_event):
+    # Each worker keeps its own keep-alive connections
+    sender = sender_factory()
+    executor = ThreadPoolExecutor(max_workers=SEND_CONCURRENCY)
+    while not stop_event.is_set():
+        try:
+            batch = queue.read(batch_size, block_ms)
+        except Exception as e:
+            print(f"SMS queue error: {e}")
+            stop_event.wait(1)
+            continue
+        if batch:
+            dispatch_batch(sender, batch, stop_event, executor)
+    executor.shutdown(wait=False)
+
+def start_sms_workers(queue, sender_factory, workers=2, batch_size=50, block_ms=1000):
+    """Start daemon threads that drain the queue and send in batches"""
+    stop_event = threading.Event()
+    for _ in range(workers):
+        thread = threading.Thread(
+            target=_worker_loop,
+            args=(queue, sender_factory, batch_size, block_ms, stop_event),
+            daemon=True
+        )
+        thread.start()
+    return stop_event
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def notification_metrics(queue):
+    """Counters, queue depth and enqueue-to-delivery latency over the last 1000 messages"""
+    with _metrics_lock:
+        metrics = dict(NOTIFICATION_METRICS)
+        latencies = sorted(_latencies)
+    metrics['backlog'] = queue.backlog()
+    if latencies:
+        metrics['latencyMs'] = {
+            'p50': round(_percentile(latencies, 0.5) * 1000, 1),
+            'p95': round(_percentile(latencies, 0.95) * 1000, 1),
+            'max': round(latencies[-1] * 1000, 1)
+        }
+    return metrics
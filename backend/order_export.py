@@ -0,0 +1,107 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+from psycopg2.extras import RealDictCursor
+from db import get_db_connection
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    'order_id', 'user_id', 'status', 'payment_method', 'total_amount', 'created_at',
+    'item_id', 'product_id', 'item_name', 'variant', 'unit_price', 'quantity',
+    'address_id', 'ship_name', 'ship_phone', 'house', 'landmark', 'street', 'city', 'state', 'pincode'
+]
+
+EXPORT_QUERY = '''
+    SELECT o.id AS order_id, o.user_id, o.status, o.payment_method, o.total_amount, o.created_at,
+           oi.id AS item_id, oi.product_id, oi.name AS item_name, oi.variant, oi.unit_price, oi.quantity,
+           a.id AS address_id, a.full_name AS ship_name, a.phone AS ship_phone, a.house, a.landmark,
+           a.street, a.city, a.state, a.pincode
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id AND oi.created_at = o.created_at
+    LEFT JOIN addresses a ON a.id = o.address_id
+    WHERE (%(start)s::timestamp IS NULL OR o.created_at >= %(start)s)
+      AND (%(end)s::timestamp IS NULL OR o.created_at < %(end)s)
+      AND (%(start)s::timestamp IS NULL OR oi.created_at >= %(start)s)
+      AND (%(end)s::timestamp IS NULL OR oi.created_at < %(end)s)
+    ORDER BY o.id, oi.id
+'''
+
+def parse_date_range(start, end):
+    """Parse optional YYYY-MM-DD bounds; the end date is inclusive"""
+    start_at = datetime.strptime(start, '%Y-%m-%d') if start else None
+    end_at = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1) if end else None
+    return start_at, end_at
+
+def iter_order_rows(conn, start_at=None, end_at=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield export rows through a named server-side cursor, chunk_size rows per round trip"""
+    cursor = conn.cursor(name='order_export', cursor_factory=RealDictCursor)
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute(EXPORT_QUERY, {'start': start_at, 'end': end_at})
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def format_chunks(row_chunks, fmt):
+    """Encode chunks of rows as CSV or NDJSON text, one string per chunk"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        yield buffer.getvalue()
+        for rows in row_chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    else:
+        for rows in row_chunks:
+            yield ''.join(json.dumps(row, default=_json_default) + '\n' for row in rows)
+
+def stream_export(conn, start_at=None, end_at=None, fmt='csv'):
+    """Stream the formatted export, closing the connection when done"""
+    try:
+        yield from format_chunks(iter_order_rows(conn, start_at, end_at), fmt)
+    finally:
+        conn.rollback()
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export orders joined with items and addresses')
+    parser.add_argument('--from', dest='start', help='First order date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', help='Last order date, inclusive (YYYY-MM-DD)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--output', help='Output file (defaults to stdout)')
+    args = parser.parse_args(argv)
+
+    start_at, end_at = parse_date_range(args.start, args.end)
+    conn = get_db_connection()
+    if not conn:
+        sys.exit('Database connection failed')
+
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for chunk in stream_export(conn, start_at, end_at, args.format):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+if __name__ == '__main__':
+    main()
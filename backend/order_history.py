@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+DEFAULT_HISTORY_DAYS = 180
+MAX_HISTORY_ORDERS = 100
+
+# Both tables are bounded on created_at so only the partitions for the range are scanned
+HISTORY_QUERY = '''
+    SELECT o.id, o.status, o.payment_method, o.total_amount, o.coupon_code, o.discount_amount, o.created_at,
+           json_agg(json_build_object(
+               'productId', oi.product_id, 'name', oi.name, 'image', oi.image, 'variant', oi.variant,
+               'unitPrice', oi.unit_price, 'quantity', oi.quantity
+           ) ORDER BY oi.id) AS items
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id AND oi.created_at = o.created_at
+    WHERE o.user_id = %(user_id)s
+      AND o.created_at >= %(start)s AND o.created_at < %(end)s
+      AND oi.created_at >= %(start)s AND oi.created_at < %(end)s
+    GROUP BY o.id, o.created_at
+    ORDER BY o.created_at DESC
+    LIMIT %(limit)s
+'''
+
+def history_range(start_at, end_at):
+    """Default an open range to the last DEFAULT_HISTORY_DAYS days"""
+    end_at = end_at or datetime.now() + timedelta(days=1)
+    start_at = start_at or end_at - timedelta(days=DEFAULT_HISTORY_DAYS)
+    return start_at, end_at
+
+def order_record(row):
+    """API shape of a HISTORY_QUERY row"""
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'paymentMethod': row['payment_method'],
+        'totalAmount': float(row['total_amount']),
+        'couponCode': row['coupon_code'],
+        'discountAmount': float(row['discount_amount']),
+        'createdAt': row['created_at'].isoformat(),
+        'items': row['items']
+    }
+
+def list_orders(cursor, user_id, start_at, end_at, limit=MAX_HISTORY_ORDERS):
+    """The user's orders in [start_at, end_at), newest first, with their lines"""
+    cursor.execute(HISTORY_QUERY, {'user_id': user_id, 'start': start_at, 'end': end_at, 'limit': limit})
+    return [order_record(row) for row in cursor.fetchall()]
@@ -0,0 +1,339 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+import psycopg2
+from psycopg2.extras import execute_values
+from addresses import upsert_address, owned_address_id
+from resilience import CircuitOpenError
+
+ORDER_STREAM = 'orders:stream'
+ORDER_GROUP = 'order-writers'
+STATUS_TTL = 86400
+
+# Counters reported through the admin metrics endpoint
+ORDER_QUEUE_METRICS = {
+    'enqueued': 0,
+    'committed': 0,
+    'failed': 0,
+    'batches': 0,
+    'lastBatchSize': 0,
+    'maxBatchSize': 0,
+}
+_metrics_lock = threading.Lock()
+
+def _count(**increments):
+    with _metrics_lock:
+        for key, value in increments.items():
+            ORDER_QUEUE_METRICS[key] += value
+
+def new_provisional_id():
+    """Provisional order id handed to the client before the order is persisted"""
+    return uuid.uuid4().hex
+
+class RedisOrderQueue:
+    """Durable order queue on a Redis Stream with a consumer group"""
+
+    def __init__(self, client, claim_idle_ms=60000):
+        self.client = client
+        self.claim_idle_ms = claim_idle_ms
+        try:
+            self.client.xgroup_create(ORDER_STREAM, ORDER_GROUP, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def append(self, entry):
+        self.client.xadd(ORDER_STREAM, {'order': json.dumps(entry)})
+        self.set_status(entry['provisionalId'], {'status': 'QUEUED'})
+
+    def read(self, consumer, count, block_ms):
+        # Reclaim entries left pending by a worker that died mid-batch
+        claimed = self.client.xautoclaim(ORDER_STREAM, ORDER_GROUP, consumer, self.claim_idle_ms, count=count)
+        messages = claimed[1]
+        if not messages:
+            response = self.client.xreadgroup(ORDER_GROUP, consumer, {ORDER_STREAM: '>'}, count=count, block=block_ms)
+            messages = response[0][1] if response else []
+        return [(msg_id, json.loads(fields['order'])) for msg_id, fields in messages if fields]
+
+    def requeue(self, batch):
+        # Unacknowledged entries stay pending in the group; read() reclaims them once idle
+        pass
+
+    def ack(self, msg_ids):
+        if msg_ids:
+            self.client.xack(ORDER_STREAM, ORDER_GROUP, *msg_ids)
+            self.client.xdel(ORDER_STREAM, *msg_ids)
+
+    def set_status(self, provisional_id, status):
+        self.client.setex(f"order_status:{provisional_id}", STATUS_TTL, json.dumps(status))
+
+    def get_status(self, provisional_id):
+        status = self.client.get(f"order_status:{provisional_id}")
+        return json.loads(status) if status else None
+
+    def backlog(self):
+        return self.client.xlen(ORDER_STREAM)
+
+class LocalLogOrderQueue:
+    """Append-only file queue for single-process deployments without Redis"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done_path = path + '.done'
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.pending = deque()
+        self.statuses = {}
+        self._replay()
+        self.log = open(self.path, 'a', encoding='utf-8')
+        self.done_log = open(self.done_path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        """Re-queue logged orders that were never marked as persisted"""
+        done = set()
+        if os.path.exists(self.done_path):
+            with open(self.done_path, encoding='utf-8') as f:
+                done = {line.strip() for line in f if line.strip()}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn write at the tail of the log
+                    if entry['provisionalId'] not in done:
+                        self.pending.append((entry['provisionalId'], entry))
+                        self.statuses[entry['provisionalId']] = {'status': 'QUEUED'}
+        if not self.pending:
+            # Everything has been persisted, so both files can start afresh
+            open(self.path, 'w').close()
+            open(self.done_path, 'w').close()
+
+    def append(self, entry):
+        with self.lock:
+            self.log.write(json.dumps(entry) + '\n')
+            self.log.flush()
+            os.fsync(self.log.fileno())
+            self.pending.append((entry['provisionalId'], entry))
+            self.statuses[entry['provisionalId']] = {'status': 'QUEUED'}
+            self.available.notify()
+
+    def read(self, consumer, count, block_ms):
+        with self.lock:
+            if not self.pending:
+                self.available.wait(block_ms / 1000)
+            batch = []
+            while self.pending and len(batch) < count:
+                batch.append(self.pending.popleft())
+            return batch
+
+    def requeue(self, batch):
+        """Put an unpersisted batch back at the front of the queue, in order"""
+        with self.lock:
+            self.pending.extendleft(reversed(batch))
+            self.available.notify()
+
+    def ack(self, msg_ids):
+        if msg_ids:
+            with self.lock:
+                self.done_log.write(''.join(f"{msg_id}\n" for msg_id in msg_ids))
+                self.done_log.flush()
+                os.fsync(self.done_log.fileno())
+
+    def set_status(self, provisional_id, status):
+        with self.lock:
+            self.statuses[provisional_id] = status
+
+    def get_status(self, provisional_id):
+        with self.lock:
+            return self.statuses.get(provisional_id)
+
+    def backlog(self):
+        with self.lock:
+            return len(self.pending)
+
+def persist_batch(conn, entries):
+    """Persist a batch of queued orders in one transaction; returns status per provisional id"""
+    statuses = {}
+    cur = conn.cursor()
+    try:
+        order_rows = []
+        for entry in entries:
+            user_id = entry['userId']
+            if entry.get('addressId'):
+                address_id = owned_address_id(cur, user_id, entry['addressId'])
+                if not address_id:
+                    statuses[entry['provisionalId']] = {'status': 'FAILED', 'error': 'Address not found'}
+                    continue
+            else:
+                address_id = upsert_address(cur, user_id, entry.get('address') or {})
+            order_rows.append((
+                entry['provisionalId'], user_id, address_id, entry['paymentMethod'], entry['totalAmount'],
+                entry.get('couponCode'), entry.get('discountAmount') or 0
+            ))
+
+        # Claiming the provisional id first makes redelivery of an already committed order a no-op
+        claimed = execute_values(cur, '''
+            INSERT INTO order_provisional_ids (provisional_id) VALUES %s
+            ON CONFLICT (provisional_id) DO NOTHING
+            RETURNING provisional_id
+        ''', [(row[0],) for row in order_rows], page_size=1000, fetch=True)
+        claimed = {row['provisional_id'] for row in claimed}
+
+        inserted = execute_values(cur, '''
+            INSERT INTO orders (
+                provisional_id, user_id, address_id, payment_method, total_amount, coupon_code, discount_amount
+            )
+            VALUES %s
+            RETURNING id, provisional_id, created_at
+        ''', [row for row in order_rows if row[0] in claimed], page_size=1000, fetch=True)
+        order_ids = {row['provisional_id']: row['id'] for row in inserted}
+        created_at = {row['provisional_id']: row['created_at'] for row in inserted}
+        execute_values(cur, '''
+            UPDATE order_provisional_ids AS p SET order_id = v.order_id
+            FROM (VALUES %s) AS v (provisional_id, order_id)
+            WHERE p.provisional_id = v.provisional_id
+        ''', list(order_ids.items()), page_size=1000)
+
+        item_rows = []
+        for entry in entries:
+            order_id = order_ids.get(entry['provisionalId'])
+            if not order_id:
+                continue
+            for i in entry['items']:
+                item_rows.append((
+                    order_id, created_at[entry['provisionalId']], i.get('productId'), i.get('name'),
+                    i.get('image'), i.get('variant'), float(i.get('unitPrice', 0)), int(i.get('quantity', 0))
+                ))
+        execute_values(cur, '''
+            INSERT INTO order_items (order_id, created_at, product_id, name, image, variant, unit_price, quantity)
+            VALUES %s
+        ''', item_rows, page_size=1000)
+
+        replayed = [row[0] for row in order_rows if row[0] not in order_ids]
+        if replayed:
+            cur.execute('''
+                SELECT order_id AS id, provisional_id FROM order_provisional_ids WHERE provisional_id = ANY(%s)
+            ''', (replayed,))
+            order_ids.update({row['provisional_id']: row['id'] for row in cur.fetchall()})
+
+        conn.commit()
+        for provisional_id, order_id in order_ids.items():
+            statuses[provisional_id] = {'status': 'CONFIRMED', 'orderId': order_id}
+        return statuses
+    except Exception:
+        # Also for a malformed entry, so the connection is clean for the per-order retry
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+def _restock_failed(stock_store, entries, statuses):
+    """Return the stock committed at enqueue for orders that were not persisted"""
+    for entry in entries:
+        quantities = entry.get('stockQuantities')
+        if quantities and statuses.get(entry['provisionalId'], {}).get('status') == 'FAILED':
+            stock_store.restock({int(pid): qty for pid, qty in quantities.items()})
+
+# The database or the connection failed, not the order: retry the batch later
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+def _persist(conn, batch):
+    """Statuses for a batch, isolating orders that cannot be persisted"""
+    try:
+        return persist_batch(conn, [entry for _, entry in batch])
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        # Isolate the offending order by retrying the batch one order at a time
+        print(f"Order batch error: {e}")
+    statuses = {}
+    for _, entry in batch:
+        try:
+            statuses.update(persist_batch(conn, [entry]))
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            print(f"Order error: {e}")
+            if isinstance(entry, dict) and entry.get('provisionalId'):
+                statuses[entry['provisionalId']] = {'status': 'FAILED', 'error': 'Failed to place order'}
+    return statuses
+
+def _process_batch(queue, get_db_connection, stock_store, consumer, batch_size, block_ms):
+    batch = queue.read(consumer, batch_size, block_ms)
+    if not batch:
+        return
+
+    try:
+        conn = get_db_connection()
+    except CircuitOpenError:
+        conn = None
+    except Exception:
+        queue.requeue(batch)
+        raise
+    statuses = None
+    if conn:
+        try:
+            statuses = _persist(conn, batch)
+        except TRANSIENT_ERRORS as e:
+            # Orders committed before the failure are confirmed again on redelivery
+            print(f"Order batch deferred: {e}")
+        finally:
+            conn.close()
+    if statuses is None:
+        # Hand the batch back so it is retried once the database is reachable
+        queue.requeue(batch)
+        time.sleep(1)
+        return
+
+    for provisional_id, status in statuses.items():
+        queue.set_status(provisional_id, status)
+    queue.ack([msg_id for msg_id, _ in batch])
+    # Only after the ack, so a redelivered batch cannot give the same stock back twice
+    _restock_failed(stock_store, [entry for _, entry in batch], statuses)
+
+    failed = sum(1 for s in statuses.values() if s['status'] == 'FAILED')
+    _count(committed=len(statuses) - failed, failed=failed, batches=1)
+    with _metrics_lock:
+        ORDER_QUEUE_METRICS['lastBatchSize'] = len(batch)
+        ORDER_QUEUE_METRICS['maxBatchSize'] = max(ORDER_QUEUE_METRICS['maxBatchSize'], len(batch))
+
+def _worker_loop(queue, get_db_connection, stock_store, batch_size, block_ms, stop_event):
+    consumer = f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+    while not stop_event.is_set():
+        try:
+            _process_batch(queue, get_db_connection, stock_store, consumer, batch_size, block_ms)
+        except Exception as e:
+            # A Redis outage or similar must not end the worker; unacknowledged entries are retried
+            print(f"Order worker error: {e}")
+            stop_event.wait(1)
+
+def start_order_workers(queue, get_db_connection, stock_store, workers=2, batch_size=200, block_ms=200):
+    """Start daemon threads that drain the queue and group-commit orders"""
+    stop_event = threading.Event()
+    for _ in range(workers):
+        thread = threading.Thread(
+            target=_worker_loop,
+            args=(queue, get_db_connection, stock_store, batch_size, block_ms, stop_event),
+            daemon=True
+        )
+        thread.start()
+    return stop_event
+
+def enqueue_order(queue, entry):
+    """Append a validated order to the queue"""
+    queue.append(entry)
+    _count(enqueued=1)
+
+def queue_metrics(queue):
+    """Snapshot of queue counters plus the current backlog"""
+    with _metrics_lock:
+        metrics = dict(ORDER_QUEUE_METRICS)
+    metrics['backlog'] = queue.backlog()
+    processed = metrics['committed'] + metrics['failed']
+    metrics['avgBatchSize'] = round(processed / metrics['batches'], 2) if metrics['batches'] else 0
+    return metrics
@@ -0,0 +1,347 @@
+import argparse
+import gzip
+import json
+import os
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from resilience import CircuitOpenError
+from analytics import ROLLUP_NAME as SALES_ROLLUP
+from trending import ROLLUP_NAME as PRODUCT_SALES_ROLLUP
+
+MONTHS_AHEAD = 3
+ARCHIVE_CHUNK_SIZE = 5000
+
+# Serialises archival across workers; any constant unique to this job will do
+ARCHIVE_LOCK_ID = 4404
+
+# orders and order_items are range-partitioned by month on the order's created_at.
+# Keys must include the partition key, so ids are unique per (id, created_at).
+ORDERS_DDL = '''
+    CREATE TABLE IF NOT EXISTS orders (
+        id SERIAL,
+        user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        address_id INTEGER REFERENCES addresses (id),
+        payment_method VARCHAR(20) NOT NULL,
+        total_amount NUMERIC(10,2) NOT NULL,
+        status VARCHAR(20) DEFAULT 'PLACED',
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        provisional_id VARCHAR(32),
+        coupon_code VARCHAR(20),
+        discount_amount NUMERIC(10,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+'''
+
+# created_at is the order's created_at, so an order and its lines share a partition month
+ORDER_ITEMS_DDL = '''
+    CREATE TABLE IF NOT EXISTS order_items (
+        id SERIAL,
+        order_id INTEGER NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        product_id INTEGER,
+        name VARCHAR(255) NOT NULL,
+        image TEXT,
+        variant VARCHAR(120),
+        unit_price NUMERIC(10,2) NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (id, created_at),
+        FOREIGN KEY (order_id, created_at) REFERENCES orders (id, created_at) ON DELETE CASCADE
+    ) PARTITION BY RANGE (created_at)
+'''
+
+# Unique indexes on partitioned tables must include the partition key, so queued
+# orders claim their provisional id here to keep batch redelivery idempotent
+PROVISIONAL_IDS_DDL = '''
+    CREATE TABLE IF NOT EXISTS order_provisional_ids (
+        provisional_id VARCHAR(32) PRIMARY KEY,
+        order_id INTEGER,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+PARTITION_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)',
+]
+
+PARTITIONED_TABLES = ('orders', 'order_items')
+
+# Rollup that must have consumed a partition before it may be archived
+ROLLUP_WATERMARKS = {'orders': SALES_ROLLUP, 'order_items': PRODUCT_SALES_ROLLUP}
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table, month):
+    return f"{table}_{month:%Y%m}"
+
+def ensure_partitions(cursor, first_month, last_month):
+    """Create the missing monthly partitions from first_month through last_month, plus a default partition"""
+    for table in PARTITIONED_TABLES:
+        # Only missing partitions are created, as creating one locks the parent table
+        existing = {month for month, _ in list_month_partitions(cursor, table)}
+        month = month_start(first_month)
+        while month <= last_month:
+            if month not in existing:
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table}
+                    FOR VALUES FROM (%s) TO (%s)
+                ''', (month, add_months(month, 1)))
+            month = add_months(month, 1)
+        cursor.execute('SELECT 1 FROM pg_class WHERE relname = %s', (f"{table}_default",))
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relkind IN ('r', 'p')", (table,))
+    row = cursor.fetchone()
+    return row is None or row['relkind'] == 'p'
+
+def create_order_tables(cursor, months_ahead=MONTHS_AHEAD):
+    """Create the partitioned order tables, converting unpartitioned ones from older installs"""
+    if not is_partitioned(cursor, 'orders'):
+        _migrate_unpartitioned(cursor, months_ahead)
+    cursor.execute(ORDERS_DDL)
+    cursor.execute(ORDER_ITEMS_DDL)
+    cursor.execute(PROVISIONAL_IDS_DDL)
+    this_month = month_start(datetime.now())
+    ensure_partitions(cursor, this_month, add_months(this_month, months_ahead))
+    for statement in PARTITION_INDEXES:
+        cursor.execute(statement)
+
+def _migrate_unpartitioned(cursor, months_ahead):
+    """Copy rows from plain orders/order_items tables into the partitioned layout, in the caller's transaction"""
+    cursor.execute('SET LOCAL statement_timeout = 0')
+    # Older installs may predate these columns
+    for column in ('provisional_id VARCHAR(32)', 'coupon_code VARCHAR(20)',
+                   'discount_amount NUMERIC(10,2) NOT NULL DEFAULT 0'):
+        cursor.execute(f'ALTER TABLE orders ADD COLUMN IF NOT EXISTS {column}')
+    cursor.execute('ALTER TABLE orders RENAME TO orders_unpartitioned')
+    cursor.execute('ALTER TABLE order_items RENAME TO order_items_unpartitioned')
+    cursor.execute('ALTER INDEX orders_pkey RENAME TO orders_unpartitioned_pkey')
+    cursor.execute('ALTER INDEX order_items_pkey RENAME TO order_items_unpartitioned_pkey')
+    cursor.execute('DROP INDEX IF EXISTS idx_orders_provisional')
+
+    cursor.execute(ORDERS_DDL)
+    cursor.execute(ORDER_ITEMS_DDL)
+    cursor.execute(PROVISIONAL_IDS_DDL)
+    cursor.execute('SELECT MIN(created_at) AS first FROM orders_unpartitioned')
+    first = cursor.fetchone()['first'] or datetime.now()
+    ensure_partitions(cursor, first, add_months(month_start(datetime.now()), months_ahead))
+
+    cursor.execute('''
+        INSERT INTO orders (id, user_id, address_id, payment_method, total_amount, status, created_at,
+                            provisional_id, coupon_code, discount_amount)
+        SELECT id, user_id, address_id, payment_method, total_amount, status, COALESCE(created_at, NOW()),
+               provisional_id, coupon_code, discount_amount
+        FROM orders_unpartitioned
+    ''')
+    cursor.execute('''
+        INSERT INTO order_items (id, order_id, created_at, product_id, name, image, variant, unit_price, quantity)
+        SELECT oi.id, oi.order_id, COALESCE(o.created_at, NOW()), oi.product_id, oi.name, oi.image,
+               oi.variant, oi.unit_price, oi.quantity
+        FROM order_items_unpartitioned oi
+        JOIN orders_unpartitioned o ON o.id = oi.order_id
+    ''')
+    cursor.execute('''
+        INSERT INTO order_provisional_ids (provisional_id, order_id, created_at)
+        SELECT provisional_id, id, COALESCE(created_at, NOW())
+        FROM orders_unpartitioned
+        WHERE provisional_id IS NOT NULL
+    ''')
+    # Ids keep rising from where they were, so rollup high-water marks stay valid
+    for table in PARTITIONED_TABLES:
+        cursor.execute(f'''
+            SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false)
+            FROM {table}_unpartitioned
+        ''')
+    cursor.execute('DROP TABLE order_items_unpartitioned')
+    cursor.execute('DROP TABLE orders_unpartitioned')
+    print("Migrated orders and order_items to monthly partitions")
+
+def list_month_partitions(cursor, table):
+    """[(month, partition name)] for the table's monthly partitions, oldest first"""
+    cursor.execute('''
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s
+    ''', (table,))
+    months = []
+    prefix = f"{table}_"
+    for row in cursor.fetchall():
+        suffix = row['relname'][len(prefix):]
+        if row['relname'].startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            months.append((date(int(suffix[:4]), int(suffix[4:]), 1), row['relname']))
+    return sorted(months)
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def _write_archive(conn, partition, path):
+    """Dump a partition to gzip NDJSON through a server-side cursor; returns rows written"""
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    cursor = conn.cursor(name=f"archive_{partition}", cursor_factory=RealDictCursor)
+    cursor.itersize = ARCHIVE_CHUNK_SIZE
+    try:
+        cursor.execute(f'SELECT * FROM {partition} ORDER BY id')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            while True:
+                chunk = cursor.fetchmany(ARCHIVE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.writelines(json.dumps(row, default=_json_default) + '\n' for row in chunk)
+                rows += len(chunk)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        cursor.close()
+    return rows
+
+def _rolled_up(cursor, table, partition):
+    """True once the table's rollup high-water mark has passed every id in the partition"""
+    cursor.execute(f'''
+        SELECT (SELECT MAX(id) FROM {partition}) AS high_id,
+               (SELECT last_id FROM rollup_state WHERE name = %s) AS last_id
+    ''', (ROLLUP_WATERMARKS[table],))
+    row = cursor.fetchone()
+    return row['high_id'] is None or (row['last_id'] is not None and row['last_id'] >= row['high_id'])
+
+def archive_month(conn, month, archive_dir):
+    """Archive one month of orders and order_items to gzip NDJSON, then detach and drop its partitions.
+
+    Returns {table: rows archived}, or None when the month was skipped because the
+    rollups have not consumed it yet or another worker is archiving.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute('SET LOCAL statement_timeout = 0')
+        cur.execute('SELECT pg_try_advisory_xact_lock(%s) AS locked', (ARCHIVE_LOCK_ID,))
+        if not cur.fetchone()['locked']:
+            conn.rollback()
+            return None
+        partitions = {table: partition_name(table, month) for table in PARTITIONED_TABLES}
+        # Hold off writers (late status updates) so the archive matches what is dropped
+        cur.execute(f"LOCK TABLE {', '.join(partitions.values())} IN SHARE MODE")
+        if not all(_rolled_up(cur, table, partition) for table, partition in partitions.items()):
+            conn.rollback()
+            return None
+
+        os.makedirs(archive_dir, exist_ok=True)
+        archived = {}
+        for table, partition in partitions.items():
+            archived[table] = _write_archive(conn, partition, os.path.join(archive_dir, f"{partition}.ndjson.gz"))
+
+        # Lines first: the order partition cannot go while rows still reference it
+        for table in ('order_items', 'orders'):
+            cur.execute(f'ALTER TABLE {table} DETACH PARTITION {partitions[table]}')
+            cur.execute(f'DROP TABLE {partitions[table]}')
+        cur.execute('DELETE FROM order_provisional_ids WHERE created_at < %s', (add_months(month, 1),))
+        conn.commit()
+        return archived
+    except (psycopg2.Error, OSError):
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+def archive_partitions(conn, archive_dir, keep_months):
+    """Archive every monthly partition that ended more than keep_months ago; returns {month: rows}"""
+    cutoff = add_months(month_start(datetime.now()), -keep_months)
+    cur = conn.cursor()
+    try:
+        months = [month for month, _ in list_month_partitions(cur, 'orders') if add_months(month, 1) <= cutoff]
+    finally:
+        cur.close()
+    conn.rollback()
+    report = {}
+    for month in months:
+        archived = archive_month(conn, month, archive_dir)
+        if archived is None:
+            break
+        report[f"{month:%Y-%m}"] = archived
+    return report
+
+def maintain_partitions(conn, archive_dir, keep_months, months_ahead=MONTHS_AHEAD):
+    """Keep future partitions created and, if keep_months is set, archive old ones"""
+    cur = conn.cursor()
+    try:
+        this_month = month_start(datetime.now())
+        ensure_partitions(cur, this_month, add_months(this_month, months_ahead))
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    if keep_months:
+        return archive_partitions(conn, archive_dir, keep_months)
+    return {}
+
+def _maintenance_loop(get_db_connection, archive_dir, keep_months, interval, stop_event):
+    while True:
+        try:
+            conn = get_db_connection()
+        except CircuitOpenError:
+            conn = None
+        if conn:
+            try:
+                archived = maintain_partitions(conn, archive_dir, keep_months)
+                for month, rows in archived.items():
+                    print(f"Archived orders for {month}: {rows}")
+            except Exception as e:
+                print(f"Partition maintenance error: {e}")
+            finally:
+                conn.close()
+        if stop_event.wait(interval):
+            return
+
+def start_partition_maintenance(get_db_connection, archive_dir, keep_months, interval=3600):
+    """Create upcoming partitions and archive old ones in the background"""
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=_maintenance_loop,
+        args=(get_db_connection, archive_dir, keep_months, interval, stop_event),
+        daemon=True
+    )
+    thread.start()
+    return stop_event
+
+def main():
+    from config import Config
+    from db import get_db_connection
+
+    parser = argparse.ArgumentParser(description='Create order partitions and archive old ones')
+    parser.add_argument('--archive-dir', default=Config.ORDER_ARCHIVE_DIR)
+    parser.add_argument('--keep-months', type=int, default=Config.ORDER_ARCHIVE_AFTER_MONTHS,
+                        help='months kept in the database; 0 only creates upcoming partitions')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit('Database connection failed')
+    try:
+        archived = maintain_partitions(conn, args.archive_dir, args.keep_months)
+    finally:
+        conn.close()
+    for month, rows in archived.items():
+        print(f"{month}: {rows['orders']} orders, {rows['order_items']} order items")
+    if not archived:
+        print('Nothing to archive')
+
+if __name__ == '__main__':
+    main()
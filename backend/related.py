@@ -0,0 +1,156 @@
+import heapq
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from resilience import CircuitOpenError
+
+MAX_NEIGHBOURS = 8
+CO_PURCHASE_DAYS = 90
+CO_PURCHASES_PER_PRODUCT = 20
+GSM_ADJACENT = 10
+
+# Neighbour scoring; the largest component names the reason shown to shoppers
+WEIGHTS = {'co-purchased': 4.0, 'same-category': 2.0, 'same-brand': 1.5, 'adjacent-gsm': 1.0}
+
+CO_PURCHASE_QUERY = '''
+    SELECT product_id, other_id, orders FROM (
+        SELECT a.product_id, b.product_id AS other_id, COUNT(DISTINCT a.order_id) AS orders,
+               ROW_NUMBER() OVER (PARTITION BY a.product_id ORDER BY COUNT(DISTINCT a.order_id) DESC, b.product_id) AS rank
+        FROM order_items a
+        JOIN order_items b ON b.order_id = a.order_id AND b.created_at = a.created_at AND b.product_id <> a.product_id
+        JOIN orders o ON o.id = a.order_id AND o.created_at = a.created_at
+        WHERE a.created_at >= NOW() - make_interval(days => %(days)s)
+          AND b.created_at >= NOW() - make_interval(days => %(days)s)
+          AND o.created_at >= NOW() - make_interval(days => %(days)s)
+          AND a.product_id IS NOT NULL AND b.product_id IS NOT NULL
+        GROUP BY a.product_id, b.product_id
+    ) ranked
+    WHERE rank <= %(per_product)s
+'''
+
+def mine_co_purchases(conn, days=CO_PURCHASE_DAYS, per_product=CO_PURCHASES_PER_PRODUCT):
+    """{product id: {other product id: orders containing both}} over recent orders"""
+    cur = conn.cursor()
+    try:
+        cur.execute(CO_PURCHASE_QUERY, {'days': days, 'per_product': per_product})
+        pairs = defaultdict(dict)
+        for row in cur.fetchall():
+            pairs[row['product_id']][row['other_id']] = row['orders']
+        return dict(pairs)
+    finally:
+        cur.close()
+
+def _window(bucket, key, k):
+    """Ids around key in a (gsm, id)-sorted bucket, i.e. the nearest GSM values"""
+    i = bisect_left(bucket, key)
+    return [pid for _, pid in bucket[max(0, i - k):i + k + 1]]
+
+def build_neighbours(products, co_purchases, k=MAX_NEIGHBOURS):
+    """Precompute up to k (neighbour id, reason) pairs per product.
+
+    Candidates come from the product's own category and brand ordered by GSM
+    plus its co-purchased products, so the work per product stays bounded.
+    """
+    info = {}
+    by_category = defaultdict(list)
+    by_brand = defaultdict(list)
+    for p in products:
+        gsms = p.get('gsmOptions') or [0]
+        info[p['id']] = (p.get('categorySlug'), p.get('brand'), min(gsms), max(gsms))
+        key = (min(gsms), p['id'])
+        by_category[p.get('categorySlug')].append(key)
+        by_brand[p.get('brand')].append(key)
+    for bucket in list(by_category.values()) + list(by_brand.values()):
+        bucket.sort()
+
+    w_bought, w_category = WEIGHTS['co-purchased'], WEIGHTS['same-category']
+    w_brand, w_gsm = WEIGHTS['same-brand'], WEIGHTS['adjacent-gsm']
+    neighbours = {}
+    for pid, (category, brand, low, high) in info.items():
+        bought_with = co_purchases.get(pid, {})
+        candidates = set(_window(by_category[category], (low, pid), k))
+        candidates.update(_window(by_brand[brand], (low, pid), k))
+        candidates.update(other for other in bought_with if other in info)
+        candidates.discard(pid)
+
+        scored = []
+        for other in candidates:
+            other_category, other_brand, other_low, other_high = info[other]
+            score, best, reason = 0.0, 0.0, None
+            if other in bought_with:
+                score = best = w_bought * (1 + math.log(bought_with[other]))
+                reason = 'co-purchased'
+            if other_category == category:
+                score += w_category
+                if w_category > best:
+                    best, reason = w_category, 'same-category'
+            if other_brand == brand:
+                score += w_brand
+                if w_brand > best:
+                    best, reason = w_brand, 'same-brand'
+            # GSM ranges that overlap or sit within GSM_ADJACENT of each other
+            if other_low - GSM_ADJACENT <= high and low - GSM_ADJACENT <= other_high:
+                score += w_gsm
+                if w_gsm > best:
+                    reason = 'adjacent-gsm'
+            if reason:
+                scored.append((score, -other, reason))
+        neighbours[pid] = tuple((-neg_id, reason) for _, neg_id, reason in heapq.nlargest(k, scored))
+    return neighbours
+
+class RelatedIndex:
+    """Precomputed neighbour lists, rebuilt on catalog changes and after each co-purchase mining run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.neighbours = {}
+        self.co_purchases = {}
+        self.built_at = None
+
+    def rebuild(self, products, co_purchases=None):
+        with self.lock:
+            if co_purchases is not None:
+                self.co_purchases = co_purchases
+            neighbours = build_neighbours(products, self.co_purchases)
+            self.neighbours = neighbours
+            self.built_at = time.time()
+
+    def related(self, product_id, limit=MAX_NEIGHBOURS):
+        """[(neighbour id, reason)] best first"""
+        return self.neighbours.get(product_id, ())[:limit]
+
+    def snapshot(self):
+        return {
+            'builtAt': self.built_at,
+            'products': len(self.neighbours),
+            'coPurchasedProducts': len(self.co_purchases)
+        }
+
+def _related_loop(index, get_db_connection, current_products, interval, stop_event):
+    while True:
+        try:
+            conn = get_db_connection(readonly=True)
+        except CircuitOpenError:
+            conn = None
+        if conn:
+            try:
+                index.rebuild(current_products(), mine_co_purchases(conn))
+            except Exception as e:
+                print(f"Related products refresh error: {e}")
+            finally:
+                conn.close()
+        if stop_event.wait(interval):
+            return
+
+def start_related_refresh(index, get_db_connection, current_products, interval=3600):
+    """Re-mine co-purchases and rebuild neighbour lists in the background"""
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=_related_loop,
+        args=(index, get_db_connection, current_products, interval, stop_event),
+        daemon=True
+    )
+    thread.start()
+    return stop_event
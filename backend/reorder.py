@@ -0,0 +1,81 @@
+SOURCE_PRODUCTS_QUERY = '''
+    SELECT DISTINCT oi.product_id
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id AND oi.created_at = o.created_at
+    WHERE o.id = %(order_id)s AND o.user_id = %(user_id)s AND oi.product_id IS NOT NULL
+'''
+
+# Clones an order and its lines in one statement. Lines are repriced from the
+# served catalog, passed in as arrays; lines for products not in it keep their old price.
+REORDER_QUERY = '''
+    WITH current_products AS (
+        SELECT * FROM unnest(%(product_ids)s::int[], %(names)s::text[], %(images)s::text[], %(prices)s::numeric[])
+            AS c (product_id, name, image, unit_price)
+    ),
+    source AS (
+        SELECT id, created_at, user_id, address_id, payment_method
+        FROM orders
+        WHERE id = %(order_id)s AND user_id = %(user_id)s
+    ),
+    priced AS (
+        SELECT oi.id AS source_item_id, oi.product_id, COALESCE(p.name, oi.name) AS name,
+               COALESCE(p.image, oi.image) AS image, oi.variant,
+               COALESCE(p.unit_price, oi.unit_price) AS unit_price,
+               oi.unit_price AS previous_unit_price, oi.quantity
+        FROM order_items oi
+        JOIN source s ON s.id = oi.order_id AND oi.created_at = s.created_at
+        LEFT JOIN current_products p ON p.product_id = oi.product_id
+    ),
+    new_order AS (
+        INSERT INTO orders (user_id, address_id, payment_method, total_amount)
+        SELECT user_id, address_id, payment_method,
+               (SELECT COALESCE(SUM(unit_price * quantity), 0) FROM priced)
+        FROM source
+        WHERE EXISTS (SELECT 1 FROM priced)
+        RETURNING id, created_at, total_amount
+    ),
+    new_items AS (
+        INSERT INTO order_items (order_id, created_at, product_id, name, image, variant, unit_price, quantity)
+        SELECT n.id, n.created_at, pr.product_id, pr.name, pr.image, pr.variant, pr.unit_price, pr.quantity
+        FROM priced pr CROSS JOIN new_order n
+        ORDER BY pr.source_item_id
+    )
+    SELECT n.id AS order_id, n.total_amount, pr.product_id, pr.name, pr.image, pr.variant,
+           pr.unit_price, pr.previous_unit_price, pr.quantity
+    FROM priced pr CROSS JOIN new_order n
+    ORDER BY pr.source_item_id
+'''
+
+def clone_order(cursor, user_id, order_id, resolve_products):
+    """Copy one of the user's orders at current prices; returns the new order, or None if
+    the order does not exist, belongs to someone else or has no lines.
+
+    resolve_products maps product ids to the served catalog's products. The caller
+    reserves stock for the returned items and commits or rolls back.
+    """
+    params = {'order_id': order_id, 'user_id': user_id}
+    cursor.execute(SOURCE_PRODUCTS_QUERY, params)
+    products = resolve_products([row['product_id'] for row in cursor.fetchall()])
+    cursor.execute(REORDER_QUERY, dict(
+        params,
+        product_ids=list(products),
+        names=[p['name'] for p in products.values()],
+        images=[p.get('imageUrl') for p in products.values()],
+        prices=[p['pricePerUnit'] for p in products.values()]
+    ))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return {
+        'orderId': rows[0]['order_id'],
+        'totalAmount': float(rows[0]['total_amount']),
+        'items': [{
+            'productId': r['product_id'],
+            'name': r['name'],
+            'image': r['image'],
+            'variant': r['variant'],
+            'unitPrice': float(r['unit_price']),
+            'previousUnitPrice': float(r['previous_unit_price']),
+            'quantity': r['quantity']
+        } for r in rows]
+    }
@@ -0,0 +1,176 @@
+import threading
+import time
+import redis
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through per reset_timeout"""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=10):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half-open' if self.probing else 'open'
+
+    def allow(self):
+        """True if a call may go through; in the open state only one probe per reset_timeout"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.probing = True
+                return True
+            return False
+
+    def retry_after(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)))
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def trip(self):
+        """Open the breaker immediately, e.g. when a backend is down at startup"""
+        with self.lock:
+            self.failures = self.failure_threshold
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+    def snapshot(self):
+        return {'state': self.state, 'failures': self.failures}
+
+class LocalKeyValueStore:
+    """In-process stand-in for the Redis string commands used by the auth flows"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, ex=None, nx=False):
+        with self.lock:
+            if nx and self._live(key):
+                return None
+            self.data[key] = (str(value), time.time() + ex if ex else None)
+            return True
+
+    def setex(self, key, seconds, value):
+        return self.set(key, value, ex=seconds)
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def ping(self):
+        return True
+
+class ResilientRedis:
+    """Redis client wrapper that degrades to an in-process store while Redis is failing"""
+
+    def __init__(self, client, breaker, fallback=None):
+        self.client = client
+        self.breaker = breaker
+        self.fallback = fallback or LocalKeyValueStore()
+
+    def _call(self, name, *args, **kwargs):
+        if self.breaker.allow():
+            try:
+                result = getattr(self.client, name)(*args, **kwargs)
+                self.breaker.record_success()
+                return result, True
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                print(f"Redis error, using in-process store: {e}")
+                self.breaker.record_failure()
+        return getattr(self.fallback, name)(*args, **kwargs), False
+
+    def get(self, key):
+        value, from_redis = self._call('get', key)
+        if value is None and from_redis:
+            # Keys written while Redis was down live in the fallback store
+            value = self.fallback.get(key)
+        return value
+
+    def set(self, key, value, ex=None, nx=False):
+        return self._call('set', key, value, ex=ex, nx=nx)[0]
+
+    def setex(self, key, seconds, value):
+        return self._call('setex', key, seconds, value)[0]
+
+    def delete(self, *keys):
+        self.fallback.delete(*keys)
+        return self._call('delete', *keys)[0]
+
+class AsyncResilientRedis:
+    """ResilientRedis for a redis.asyncio client; pass the sync wrapper's breaker and fallback to share them"""
+
+    def __init__(self, client, breaker, fallback):
+        self.client = client
+        self.breaker = breaker
+        self.fallback = fallback
+
+    async def _call(self, name, *args, **kwargs):
+        if self.breaker.allow():
+            try:
+                result = await getattr(self.client, name)(*args, **kwargs)
+                self.breaker.record_success()
+                return result, True
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                print(f"Redis error, using in-process store: {e}")
+                self.breaker.record_failure()
+        return getattr(self.fallback, name)(*args, **kwargs), False
+
+    async def get(self, key):
+        value, from_redis = await self._call('get', key)
+        if value is None and from_redis:
+            value = self.fallback.get(key)
+        return value
+
+    async def set(self, key, value, ex=None, nx=False):
+        return (await self._call('set', key, value, ex=ex, nx=nx))[0]
+
+    async def setex(self, key, seconds, value):
+        return (await self._call('setex', key, seconds, value))[0]
+
+    async def delete(self, *keys):
+        self.fallback.delete(*keys)
+        return (await self._call('delete', *keys))[0]
@@ -0,0 +1,166 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+
+WARM_PREFIX_LENGTH = 3
+MAX_SCAN = 1000
+MAX_CACHED_PREFIXES = 50000
+
+# Ties between equally popular suggestions go to broader types first
+TYPE_WEIGHT = {'category': 4, 'brand': 3, 'size': 3, 'gsm': 2, 'sku': 1}
+
+_SIZE = re.compile(r'\bA\d\b', re.IGNORECASE)
+
+def normalize(text):
+    return ' '.join(str(text).lower().split())
+
+def product_terms(product):
+    """(type, label) pairs a product can be found by"""
+    terms = {('category', product['name']), ('brand', product['brand'])}
+    terms.update(('gsm', f"{gsm} GSM") for gsm in product.get('gsmOptions') or [])
+    terms.update(('size', size.upper()) for size in _SIZE.findall(product['name']))
+    if product.get('sku'):
+        terms.add(('sku', product['sku']))
+    return terms
+
+def _keys(label):
+    """Search keys for a label: the whole label and every word-start suffix"""
+    words = normalize(label).split(' ')
+    keys = {' '.join(words[i:]) for i in range(len(words))}
+    keys.add(normalize(label).replace(' ', ''))
+    return keys
+
+class SuggestIndex:
+    """Sorted-array prefix index over catalog terms with cached top-k per prefix"""
+
+    def __init__(self, k=10):
+        self.k = k
+        self.lock = threading.RLock()
+        self.keys = []           # sorted (key, label id)
+        self.labels = {}         # label id -> suggestion dict with product ids
+        self.label_ids = {}      # (type, label) -> label id
+        self.products = {}       # product id -> its terms
+        self.top_cache = {}      # prefix -> ranked label ids
+        self.next_label_id = 0
+
+    def _rank(self, label_id):
+        label = self.labels[label_id]
+        return (len(label['productIds']), TYPE_WEIGHT[label['type']], -label_id)
+
+    def _add_term(self, term, product_id):
+        label_id = self.label_ids.get(term)
+        if label_id is None:
+            label_id = self.label_ids[term] = self.next_label_id
+            self.next_label_id += 1
+            self.labels[label_id] = {'type': term[0], 'text': term[1], 'productIds': set()}
+            for key in _keys(term[1]):
+                insort(self.keys, (key, label_id))
+        self.labels[label_id]['productIds'].add(product_id)
+        self._invalidate(term[1])
+
+    def _remove_term(self, term, product_id):
+        label_id = self.label_ids[term]
+        label = self.labels[label_id]
+        label['productIds'].discard(product_id)
+        self._invalidate(term[1])
+        if not label['productIds']:
+            for key in _keys(term[1]):
+                i = bisect_left(self.keys, (key, label_id))
+                if i < len(self.keys) and self.keys[i] == (key, label_id):
+                    del self.keys[i]
+            del self.labels[label_id]
+            del self.label_ids[term]
+
+    def _invalidate(self, label):
+        for key in _keys(label):
+            for n in range(1, len(key) + 1):
+                self.top_cache.pop(key[:n], None)
+
+    def upsert_product(self, product):
+        with self.lock:
+            new_terms = product_terms(product)
+            old_terms = self.products.get(product['id'], set())
+            for term in old_terms - new_terms:
+                self._remove_term(term, product['id'])
+            for term in new_terms - old_terms:
+                self._add_term(term, product['id'])
+            self.products[product['id']] = new_terms
+
+    def remove_product(self, product_id):
+        with self.lock:
+            for term in self.products.pop(product_id, set()):
+                self._remove_term(term, product_id)
+
+    def build(self, products):
+        """Bulk-build the index from scratch with a single sort"""
+        with self.lock:
+            self.labels, self.label_ids, self.products, self.top_cache = {}, {}, {}, {}
+            self.next_label_id = 0
+            keys = []
+            for product in products:
+                terms = self.products[product['id']] = product_terms(product)
+                for term in terms:
+                    label_id = self.label_ids.get(term)
+                    if label_id is None:
+                        label_id = self.label_ids[term] = self.next_label_id
+                        self.next_label_id += 1
+                        self.labels[label_id] = {'type': term[0], 'text': term[1], 'productIds': set()}
+                        keys.extend((key, label_id) for key in _keys(term[1]))
+                    self.labels[label_id]['productIds'].add(product['id'])
+            keys.sort()
+            self.keys = keys
+            self.warm()
+
+    def sync(self, products):
+        """Incrementally apply a full catalog: upsert changed products, drop missing ones"""
+        with self.lock:
+            seen = set()
+            for product in products:
+                seen.add(product['id'])
+                if self.products.get(product['id']) != product_terms(product):
+                    self.upsert_product(product)
+            for product_id in set(self.products) - seen:
+                self.remove_product(product_id)
+
+    def _scan(self, prefix, limit):
+        start = bisect_left(self.keys, (prefix, -1))
+        end = min(len(self.keys), start + limit)
+        matched = set()
+        for i in range(start, end):
+            key, label_id = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            matched.add(label_id)
+        return heapq.nlargest(self.k, matched, key=self._rank)
+
+    def suggest(self, prefix, k=None):
+        """Top-k suggestions for a typed prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            ranked = self.top_cache.get(prefix)
+            if ranked is None:
+                # Short prefixes match huge ranges, so they are ranked in full; longer ones are capped
+                limit = len(self.keys) if len(prefix) <= WARM_PREFIX_LENGTH else MAX_SCAN
+                ranked = self._scan(prefix, limit)
+                if len(self.top_cache) >= MAX_CACHED_PREFIXES:
+                    self.top_cache = {p: r for p, r in self.top_cache.items() if len(p) <= WARM_PREFIX_LENGTH}
+                self.top_cache[prefix] = ranked
+            results = []
+            for label_id in ranked[:k or self.k]:
+                label = self.labels[label_id]
+                suggestion = {'text': label['text'], 'type': label['type'], 'count': len(label['productIds'])}
+                if label['type'] == 'sku':
+                    suggestion['productId'] = next(iter(label['productIds']))
+                results.append(suggestion)
+            return results
+
+    def warm(self):
+        """Precompute the short-prefix cache, e.g. after a bulk build"""
+        with self.lock:
+            prefixes = {key[:n] for key, _ in self.keys for n in range(1, WARM_PREFIX_LENGTH + 1)}
+            for prefix in prefixes:
+                if prefix not in self.top_cache:
+                    self.top_cache[prefix] = self._scan(prefix, len(self.keys))
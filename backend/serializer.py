@@ -0,0 +1,37 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # stdlib encoder is used when orjson is not installed
+    orjson = None
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson when available"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(
+                obj,
+                default=self.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            ).decode()
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', False)
+        kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj), mimetype=self.mimetype)
+
+def parse_fields(value):
+    """Parse a comma-separated fields= parameter into a set, or None for all fields"""
+    fields = {f.strip() for f in (value or '').split(',') if f.strip()}
+    return fields or None
+
+def project(records, fields):
+    """Keep only the requested keys of each record"""
+    if not fields:
+        return records
+    return [{k: v for k, v in record.items() if k in fields} for record in records]
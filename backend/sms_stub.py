@@ -0,0 +1,92 @@
+"""Local stand-in for the Fast2SMS bulk API, for exercising the SMS pipeline.
+
+    python sms_stub.py --port 9090 --latency-ms 300 --fail-rate 0.1
+
+then start the backend with FAST2SMS_API_KEY=stub and
+SMS_API_URL=http://localhost:9090/dev/bulkV2. GET /stats reports requests,
+recipients and TCP connections seen, so batching and keep-alive can be checked.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+stats = {'requests': 0, 'recipients': 0, 'connections': 0, 'failed': 0}
+stats_lock = threading.Lock()
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    fail_rate = 0.0
+    quiet = False
+
+    def setup(self):
+        super().setup()
+        with stats_lock:
+            stats['connections'] += 1
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with stats_lock:
+                self._reply(200, dict(stats))
+        else:
+            self._reply(404, {'return': False, 'message': 'Not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._reply(400, {'return': False, 'status_code': 400, 'message': 'Invalid JSON'})
+        if not self.headers.get('authorization'):
+            return self._reply(401, {'return': False, 'status_code': 412, 'message': 'Invalid Authentication'})
+        numbers = [n for n in str(payload.get('numbers', '')).split(',') if n]
+        if not numbers:
+            return self._reply(400, {'return': False, 'status_code': 400, 'message': 'Numbers are required'})
+
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            with stats_lock:
+                stats['failed'] += 1
+            return self._reply(503, {'return': False, 'message': 'Temporarily unavailable'})
+
+        with stats_lock:
+            stats['requests'] += 1
+            stats['recipients'] += len(numbers)
+        if not self.quiet:
+            text = payload.get('variables_values') or payload.get('message')
+            print(f"[sms-stub] {payload.get('route')} to {','.join(numbers)}: {text}", flush=True)
+        self._reply(200, {'return': True, 'request_id': uuid.uuid4().hex, 'message': ['SMS sent successfully.']})
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub Fast2SMS server')
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay before each response')
+    parser.add_argument('--fail-rate', type=float, default=0, help='fraction of requests answered with 503')
+    parser.add_argument('--quiet', action='store_true', help='do not print each message')
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency_ms / 1000
+    StubHandler.fail_rate = args.fail_rate
+    StubHandler.quiet = args.quiet
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"SMS stub listening on http://127.0.0.1:{args.port}/dev/bulkV2")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
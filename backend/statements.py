@@ -0,0 +1,96 @@
+"""Registry of hot queries executed as server-side prepared statements.
+
+A statement is declared once with psycopg2 `%s` placeholders. On a pooled
+connection it is PREPAREd the first time that connection runs it and then
+executed by name, so Postgres parses and plans it once per connection instead
+of on every call. Connections that do not track prepared statements (pooling
+disabled) fall back to sending the text as before.
+"""
+import threading
+import psycopg2
+from psycopg2 import errorcodes
+
+STATEMENTS = {}
+
+STATEMENT_METRICS = {'prepares': 0, 'executions': 0, 'adHoc': 0}
+_metrics_lock = threading.Lock()
+
+def _count(key):
+    with _metrics_lock:
+        STATEMENT_METRICS[key] += 1
+
+class Statement:
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        parts = sql.split('%s')
+        self.param_count = len(parts) - 1
+        # Same text with $1..$n placeholders, as PREPARE expects
+        numbered = parts[0] + ''.join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+        self.prepare_sql = f"PREPARE {name} AS {numbered}"
+        args = ', '.join(['%s'] * self.param_count)
+        self.execute_sql = f"EXECUTE {name}({args})" if args else f"EXECUTE {name}"
+
+    def __repr__(self):
+        return f"Statement({self.name!r})"
+
+def prepared(name, sql):
+    """Declare a statement; names must be unique SQL identifiers"""
+    if name in STATEMENTS:
+        raise ValueError(f"Statement {name} is already declared")
+    statement = STATEMENTS[name] = Statement(name, sql)
+    return statement
+
+def execute(cursor, statement, params=()):
+    """Run a declared statement on cursor, preparing it on the connection first if needed"""
+    prepared_names = getattr(cursor.connection, 'prepared_statements', None)
+    if prepared_names is None:
+        _count('adHoc')
+        cursor.execute(statement.sql, params)
+        return
+    if statement.name not in prepared_names:
+        try:
+            cursor.execute(statement.prepare_sql)
+        except psycopg2.Error as e:
+            # Prepared by an earlier checkout whose bookkeeping was lost; it is usable next time
+            if e.pgcode == errorcodes.DUPLICATE_PREPARED_STATEMENT:
+                prepared_names.add(statement.name)
+            raise
+        prepared_names.add(statement.name)
+        _count('prepares')
+    try:
+        cursor.execute(statement.execute_sql, params)
+    except psycopg2.Error as e:
+        if e.pgcode == errorcodes.INVALID_SQL_STATEMENT_NAME:
+            # The server no longer has it (e.g. DISCARD ALL); prepare again on the next call
+            prepared_names.discard(statement.name)
+        raise
+    _count('executions')
+
+# --- Hot auth and checkout queries ---
+USER_BY_IDENTIFIER = prepared('user_by_identifier', '''
+    SELECT id, full_name, phone_number, email, password_hash, is_verified
+    FROM users
+    WHERE phone_number = %s OR email = %s
+''')
+
+USER_BY_SESSION = prepared('user_by_session', '''
+    SELECT u.id, u.full_name, u.phone_number, u.email
+    FROM users u
+    JOIN sessions s ON u.id = s.user_id
+    WHERE s.session_token = %s AND s.expires_at > NOW()
+''')
+
+INSERT_SESSION = prepared('insert_session', '''
+    INSERT INTO sessions (user_id, session_token, expires_at)
+    VALUES (%s, %s, %s)
+''')
+
+INSERT_ORDER_ITEM = prepared('insert_order_item', '''
+    INSERT INTO order_items (order_id, created_at, product_id, name, image, variant, unit_price, quantity)
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+''')
+
+def statement_metrics():
+    with _metrics_lock:
+        return dict(STATEMENT_METRICS, declared=len(STATEMENTS))
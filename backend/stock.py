@@ -0,0 +1,294 @@
+import threading
+import time
+import uuid
+from collections import Counter
+import psycopg2
+from psycopg2.extras import execute_values
+from resilience import CircuitOpenError
+
+RESERVATION_TTL = 600
+EXPIRY_KEY = 'stock:reservations'
+COMMITTED_KEY = 'stock:committed'
+INFLIGHT_KEY = 'stock:committed:inflight'
+RECONCILE_LOCK_KEY = 'stock:reconcile:lock'
+
+# KEYS[1] reservation hash, KEYS[2] expiry zset, KEYS[3..] stock counters
+# ARGV[1] reservation id, ARGV[2] expiry timestamp, ARGV[3..] quantities
+RESERVE_SCRIPT = '''
+for i = 3, #KEYS do
+    local available = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if available < tonumber(ARGV[i]) then
+        return i - 2
+    end
+end
+for i = 3, #KEYS do
+    redis.call('DECRBY', KEYS[i], ARGV[i])
+    redis.call('HSET', KEYS[1], KEYS[i], ARGV[i])
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 0
+'''
+
+# KEYS[1] reservation hash, KEYS[2] expiry zset; ARGV[1] reservation id
+RELEASE_SCRIPT = '''
+local lines = redis.call('HGETALL', KEYS[1])
+for i = 1, #lines, 2 do
+    redis.call('INCRBY', lines[i], lines[i + 1])
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return #lines / 2
+'''
+
+# KEYS[1] reservation hash, KEYS[2] expiry zset, KEYS[3] committed deltas; ARGV[1] reservation id
+COMMIT_SCRIPT = '''
+local lines = redis.call('HGETALL', KEYS[1])
+for i = 1, #lines, 2 do
+    redis.call('HINCRBY', KEYS[3], lines[i], lines[i + 1])
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return #lines / 2
+'''
+
+# Move pending committed deltas aside unless an earlier batch is still unreconciled
+TAKE_COMMITTED_SCRIPT = '''
+if redis.call('EXISTS', KEYS[2]) == 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+end
+return redis.call('HGETALL', KEYS[2])
+'''
+
+def stock_key(product_id):
+    return f"stock:{product_id}"
+
+def _product_id(key):
+    return int(key.split(':', 1)[1])
+
+def cart_quantities(items):
+    """Aggregate cart lines into quantity per product id"""
+    quantities = Counter()
+    for i in items:
+        if i.get('productId') is not None:
+            quantities[int(i['productId'])] += int(i.get('quantity', 0))
+    return {pid: qty for pid, qty in quantities.items() if qty > 0}
+
+class RedisStockStore:
+    """Stock counters in Redis; a whole cart is reserved by a single Lua script"""
+
+    def __init__(self, client):
+        self.client = client
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._commit = client.register_script(COMMIT_SCRIPT)
+        self._take_committed = client.register_script(TAKE_COMMITTED_SCRIPT)
+
+    def seed(self, levels):
+        """Initialise counters that do not exist yet, leaving live counters alone"""
+        pipe = self.client.pipeline()
+        for product_id, quantity in levels.items():
+            pipe.setnx(stock_key(product_id), quantity)
+        pipe.execute()
+
+    def availability(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        values = self.client.mget([stock_key(pid) for pid in product_ids])
+        return {pid: int(v or 0) for pid, v in zip(product_ids, values)}
+
+    def reserve(self, quantities, ttl=RESERVATION_TTL):
+        """Reserve all lines or none; returns (reservation id, None) or (None, short product id)"""
+        reservation_id = uuid.uuid4().hex
+        product_ids = list(quantities)
+        keys = [f"stock:res:{reservation_id}", EXPIRY_KEY] + [stock_key(pid) for pid in product_ids]
+        args = [reservation_id, int(time.time()) + ttl] + [quantities[pid] for pid in product_ids]
+        short = self._reserve(keys=keys, args=args)
+        if short:
+            return None, product_ids[short - 1]
+        return reservation_id, None
+
+    def release(self, reservation_id):
+        self._release(keys=[f"stock:res:{reservation_id}", EXPIRY_KEY], args=[reservation_id])
+
+    def commit(self, reservation_id):
+        self._commit(keys=[f"stock:res:{reservation_id}", EXPIRY_KEY, COMMITTED_KEY], args=[reservation_id])
+
+    def restock(self, quantities):
+        """Give back committed stock for an order that could not be persisted"""
+        pipe = self.client.pipeline()
+        for product_id, quantity in quantities.items():
+            pipe.incrby(stock_key(product_id), quantity)
+            pipe.hincrby(COMMITTED_KEY, stock_key(product_id), -quantity)
+        pipe.execute()
+
+    def release_expired(self):
+        expired = self.client.zrangebyscore(EXPIRY_KEY, '-inf', int(time.time()))
+        for reservation_id in expired:
+            self.release(reservation_id)
+        return len(expired)
+
+    def take_committed(self):
+        """Committed deltas awaiting reconciliation, per product id"""
+        flat = self._take_committed(keys=[COMMITTED_KEY, INFLIGHT_KEY])
+        return {_product_id(flat[i]): int(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+    def ack_committed(self):
+        self.client.delete(INFLIGHT_KEY)
+
+    def acquire_reconcile_lock(self, ttl):
+        return bool(self.client.set(RECONCILE_LOCK_KEY, '1', nx=True, ex=ttl))
+
+    def release_reconcile_lock(self):
+        self.client.delete(RECONCILE_LOCK_KEY)
+
+class LocalStockStore:
+    """In-process stock counters used when Redis is not available"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.levels = {}
+        self.reservations = {}
+        self.committed = Counter()
+        self.inflight = {}
+
+    def seed(self, levels):
+        with self.lock:
+            for product_id, quantity in levels.items():
+                self.levels.setdefault(product_id, quantity)
+
+    def availability(self, product_ids):
+        with self.lock:
+            return {pid: self.levels.get(pid, 0) for pid in product_ids}
+
+    def reserve(self, quantities, ttl=RESERVATION_TTL):
+        with self.lock:
+            for product_id, quantity in quantities.items():
+                if self.levels.get(product_id, 0) < quantity:
+                    return None, product_id
+            for product_id, quantity in quantities.items():
+                self.levels[product_id] -= quantity
+            reservation_id = uuid.uuid4().hex
+            self.reservations[reservation_id] = (dict(quantities), time.time() + ttl)
+            return reservation_id, None
+
+    def release(self, reservation_id):
+        with self.lock:
+            quantities, _ = self.reservations.pop(reservation_id, ({}, 0))
+            for product_id, quantity in quantities.items():
+                self.levels[product_id] += quantity
+
+    def commit(self, reservation_id):
+        with self.lock:
+            quantities, _ = self.reservations.pop(reservation_id, ({}, 0))
+            self.committed.update(quantities)
+
+    def restock(self, quantities):
+        with self.lock:
+            for product_id, quantity in quantities.items():
+                self.levels[product_id] = self.levels.get(product_id, 0) + quantity
+                self.committed[product_id] -= quantity
+
+    def release_expired(self):
+        now = time.time()
+        with self.lock:
+            expired = [rid for rid, (_, expires_at) in self.reservations.items() if expires_at <= now]
+        for reservation_id in expired:
+            self.release(reservation_id)
+        return len(expired)
+
+    def take_committed(self):
+        with self.lock:
+            if not self.inflight and self.committed:
+                self.inflight = dict(self.committed)
+                self.committed.clear()
+            return dict(self.inflight)
+
+    def ack_committed(self):
+        with self.lock:
+            self.inflight = {}
+
+    def acquire_reconcile_lock(self, ttl):
+        return True
+
+    def release_reconcile_lock(self):
+        pass
+
+def load_stock_levels(conn):
+    """Durable stock quantities from Postgres"""
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT product_id, quantity FROM product_stock')
+        return {row['product_id']: row['quantity'] for row in cur.fetchall()}
+    finally:
+        cur.close()
+
+def reconcile(store, conn, lock_ttl=30):
+    """Apply committed stock deltas to Postgres in one set-based update"""
+    if not store.acquire_reconcile_lock(lock_ttl):
+        return 0
+    cur = conn.cursor()
+    try:
+        deltas = store.take_committed()
+        if not deltas:
+            return 0
+        execute_values(cur, '''
+            UPDATE product_stock AS s
+            SET quantity = s.quantity - d.delta, updated_at = NOW()
+            FROM (VALUES %s) AS d (product_id, delta)
+            WHERE s.product_id = d.product_id
+        ''', sorted(deltas.items()), page_size=len(deltas))
+        conn.commit()
+        store.ack_committed()
+        return len(deltas)
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        store.release_reconcile_lock()
+
+def _maintenance_loop(store, get_db_connection, interval, stop_event):
+    while not stop_event.wait(interval):
+        try:
+            store.release_expired()
+        except Exception as e:
+            print(f"Stock release error: {e}")
+        try:
+            conn = get_db_connection()
+        except CircuitOpenError:
+            continue
+        if not conn:
+            continue
+        try:
+            reconcile(store, conn)
+        except Exception as e:
+            print(f"Stock reconcile error: {e}")
+        finally:
+            conn.close()
+
+def start_stock_maintenance(store, get_db_connection, interval=5):
+    """Release expired reservations and reconcile committed stock in the background"""
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=_maintenance_loop,
+        args=(store, get_db_connection, interval, stop_event),
+        daemon=True
+    )
+    thread.start()
+    return stop_event
+
+def seed_stock_table(conn, levels):
+    """Insert default stock rows for products that have none yet"""
+    cur = conn.cursor()
+    try:
+        execute_values(cur, '''
+            INSERT INTO product_stock (product_id, quantity) VALUES %s
+            ON CONFLICT (product_id) DO NOTHING
+        ''', sorted(levels.items()), page_size=1000)
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
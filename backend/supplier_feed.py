@@ -0,0 +1,330 @@
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from psycopg2.extras import execute_values
+from bulk_quotes import chunked
+from catalog import CatalogSnapshot, write_snapshot
+from config import Config
+from db import get_db_connection
+
+FEED_CHUNK_SIZE = 5000
+MAX_REPORTED_REJECTS = 100
+MAX_PRICE = Decimal('100000000')  # DECIMAL(10,2)
+
+# Header spellings seen in supplier price lists -> canonical column
+COLUMN_ALIASES = {
+    'sku': 'sku', 'item_code': 'sku', 'product_code': 'sku',
+    'name': 'name', 'description': 'name', 'product_name': 'name',
+    'brand': 'brand', 'manufacturer': 'brand',
+    'category': 'category', 'category_slug': 'category',
+    'gsm': 'gsm', 'grammage': 'gsm',
+    'size': 'size', 'sheet_size': 'size', 'paper_size': 'size',
+    'price_per_unit': 'price_per_unit', 'unit_price': 'price_per_unit', 'price': 'price_per_unit',
+    'price_per_ream': 'price_per_ream', 'ream_price': 'price_per_ream',
+    'price_per_carton': 'price_per_carton', 'carton_price': 'price_per_carton',
+    'min_order_qty': 'min_order_qty', 'moq': 'min_order_qty',
+    'stock_qty': 'stock_qty', 'stock': 'stock_qty',
+    'image_url': 'image_url', 'image': 'image_url',
+}
+
+STAGING_COLUMNS = [
+    'line_no', 'sku', 'name', 'category_slug', 'brand', 'gsm', 'sheet_size',
+    'price_per_unit', 'price_per_ream', 'price_per_carton', 'min_order_qty', 'stock_qty', 'image_url'
+]
+
+_SIZE = re.compile(r'^A[0-6]$')
+_NUMBER_NOISE = re.compile(r'[₹,\s]|^rs\.?', re.IGNORECASE)
+
+# Only rows whose catalog fields actually change count as updates
+MERGE_QUERY = '''
+    WITH merged AS (
+        INSERT INTO products (
+            sku, name, category_slug, brand, gsm_options, sheet_size, price_per_unit,
+            price_per_ream, price_per_carton, min_order_qty, stock_qty, image_url, supplier
+        )
+        SELECT DISTINCT ON (sku)
+            sku, name, category_slug, brand, ARRAY[gsm], sheet_size, price_per_unit,
+            price_per_ream, price_per_carton, min_order_qty, stock_qty, image_url, %(supplier)s
+        FROM feed_staging
+        ORDER BY sku, line_no DESC
+        ON CONFLICT (sku) DO UPDATE SET
+            name = EXCLUDED.name,
+            category_slug = EXCLUDED.category_slug,
+            brand = EXCLUDED.brand,
+            gsm_options = EXCLUDED.gsm_options,
+            sheet_size = EXCLUDED.sheet_size,
+            price_per_unit = EXCLUDED.price_per_unit,
+            price_per_ream = EXCLUDED.price_per_ream,
+            price_per_carton = EXCLUDED.price_per_carton,
+            min_order_qty = EXCLUDED.min_order_qty,
+            image_url = COALESCE(EXCLUDED.image_url, products.image_url),
+            supplier = EXCLUDED.supplier,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE (products.name, products.category_slug, products.brand, products.gsm_options,
+               products.sheet_size, products.price_per_unit, products.price_per_ream,
+               products.price_per_carton, products.min_order_qty, products.supplier)
+          IS DISTINCT FROM
+              (EXCLUDED.name, EXCLUDED.category_slug, EXCLUDED.brand, EXCLUDED.gsm_options,
+               EXCLUDED.sheet_size, EXCLUDED.price_per_unit, EXCLUDED.price_per_ream,
+               EXCLUDED.price_per_carton, EXCLUDED.min_order_qty, EXCLUDED.supplier)
+        RETURNING id, (xmax = 0) AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted) AS inserted,
+           COUNT(*) FILTER (WHERE NOT inserted) AS updated,
+           COALESCE(array_agg(id), '{}') AS ids
+    FROM merged
+'''
+
+CATALOG_QUERY = '''
+    SELECT p.id, p.sku, p.name, p.category_slug, p.brand, p.gsm_options, p.sheet_size,
+           p.price_per_unit, p.price_per_ream, p.price_per_carton, p.min_order_qty, p.image_url,
+           COALESCE(s.quantity, p.stock_qty) AS stock_qty
+    FROM products p
+    LEFT JOIN product_stock s ON s.product_id = p.id
+    WHERE p.id = ANY(%s)
+    ORDER BY p.id
+'''
+
+def _canonical(header):
+    return COLUMN_ALIASES.get(re.sub(r'[\s\-]+', '_', (header or '').strip().lower()))
+
+def _price(value, field, required=False):
+    value = _NUMBER_NOISE.sub('', value or '')
+    if not value:
+        if required:
+            raise ValueError(f'{field} is required')
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{field} is not a number')
+    if not price.is_finite() or price <= 0 or price >= MAX_PRICE:
+        raise ValueError(f'{field} is out of range')
+    return price.quantize(Decimal('0.01'))
+
+def _integer(value, field, default=None, low=0, high=None):
+    value = (value or '').strip()
+    if not value:
+        if default is None:
+            raise ValueError(f'{field} is required')
+        return default
+    try:
+        number = int(Decimal(value))
+    except (InvalidOperation, ValueError, OverflowError):
+        raise ValueError(f'{field} is not a number')
+    if number < low or (high is not None and number > high):
+        raise ValueError(f'{field} is out of range')
+    return number
+
+def normalize_row(line_no, row, category_slugs):
+    """Validate and normalise one feed row into a staging tuple; raises ValueError with the reason"""
+    sku = (row.get('sku') or '').strip().upper()
+    if not sku or len(sku) > 64:
+        raise ValueError('sku is required (max 64 characters)')
+    name = ' '.join((row.get('name') or '').split())
+    brand = ' '.join((row.get('brand') or '').split())
+    if not name or not brand:
+        raise ValueError('name and brand are required')
+    size = (row.get('size') or '').strip().upper() or None
+    if size and not _SIZE.match(size):
+        raise ValueError(f'Unknown sheet size {size}')
+
+    category = (row.get('category') or '').strip().lower()
+    if not category and size:
+        category = f'{size.lower()}-paper-sheets'
+    if category not in category_slugs:
+        raise ValueError(f'Unknown category {category or "(none)"}')
+
+    return (
+        line_no, sku, name[:255], category, brand[:100],
+        _integer(row.get('gsm'), 'gsm', low=30, high=500),
+        size,
+        _price(row.get('price_per_unit'), 'price_per_unit', required=True),
+        _price(row.get('price_per_ream'), 'price_per_ream'),
+        _price(row.get('price_per_carton'), 'price_per_carton'),
+        _integer(row.get('min_order_qty'), 'min_order_qty', default=1, low=1, high=1000000),
+        _integer(row.get('stock_qty'), 'stock_qty', default=0, high=1000000000),
+        (row.get('image_url') or '').strip() or None
+    )
+
+def _decoded_lines(stream):
+    # Decoded line by line, so an encoding error names the line it is on
+    for line_no, raw in enumerate(stream, start=1):
+        try:
+            yield raw.decode('utf-8-sig' if line_no == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise ValueError(f'Line {line_no} is not valid UTF-8')
+
+def iter_feed_rows(stream):
+    """Yield (line number, row dict with canonical keys) from a CSV byte stream.
+
+    Raises ValueError naming the line when the feed is not UTF-8 or not parseable CSV.
+    """
+    reader = csv.reader(_decoded_lines(stream))
+    try:
+        header = [_canonical(h) for h in next(reader, [])]
+        for line_no, values in enumerate(reader, start=2):
+            if any(v.strip() for v in values):
+                yield line_no, {key: value for key, value in zip(header, values) if key}
+    except csv.Error as e:
+        raise ValueError(f'Line {reader.line_num}: {e}')
+
+def _copy_chunk(cursor, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY feed_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def seed_products(cursor, snapshot):
+    """Copy the current catalog into an empty products table so feeds extend it"""
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM products) AS seeded')
+    if cursor.fetchone()['seeded']:
+        return
+    execute_values(cursor, '''
+        INSERT INTO products (
+            id, sku, name, category_slug, brand, gsm_options, sheet_size, price_per_unit,
+            min_order_qty, stock_qty, image_url, supplier
+        ) VALUES %s ON CONFLICT DO NOTHING
+    ''', [
+        (p['id'], p.get('sku') or f"PC{p['id']}", p['name'], p['categorySlug'], p['brand'],
+         p.get('gsmOptions') or [], p.get('sheetSize'), p['pricePerUnit'], p.get('minOrderQty', 1),
+         p.get('stockQty', 0), p.get('imageUrl'), p.get('supplier'))
+        for p in snapshot
+    ], page_size=1000)
+    cursor.execute("SELECT setval('products_id_seq', GREATEST((SELECT MAX(id) FROM products), 1))")
+
+def ingest_feed(conn, stream, supplier, snapshot, chunk_size=FEED_CHUNK_SIZE):
+    """Stage a CSV feed with COPY and merge it into products in one transaction.
+
+    Returns the report and the ids of the products the feed inserted or changed.
+    """
+    started = time.perf_counter()
+    category_slugs = {c['slug'] for c in snapshot.categories}
+    report = {'supplier': supplier, 'rows': 0, 'accepted': 0, 'rejected': 0, 'rejects': []}
+    cursor = conn.cursor()
+    try:
+        seed_products(cursor, snapshot)
+        if len(snapshot):
+            # Products only in the snapshot keep their ids, so new ones are numbered past them
+            cursor.execute('''
+                SELECT setval('products_id_seq', GREATEST((SELECT last_value FROM products_id_seq), %s))
+            ''', (snapshot.ids[-1],))
+        cursor.execute('''
+            CREATE TEMP TABLE feed_staging (
+                line_no INTEGER, sku VARCHAR(64), name VARCHAR(255), category_slug VARCHAR(100),
+                brand VARCHAR(100), gsm INTEGER, sheet_size VARCHAR(4), price_per_unit DECIMAL(10,2),
+                price_per_ream DECIMAL(10,2), price_per_carton DECIMAL(10,2), min_order_qty INTEGER,
+                stock_qty INTEGER, image_url TEXT
+            ) ON COMMIT DROP
+        ''')
+        for chunk in chunked(iter_feed_rows(stream), chunk_size):
+            valid = []
+            for line_no, row in chunk:
+                try:
+                    valid.append(normalize_row(line_no, row, category_slugs))
+                except ValueError as e:
+                    report['rejected'] += 1
+                    if len(report['rejects']) < MAX_REPORTED_REJECTS:
+                        report['rejects'].append({'line': line_no, 'sku': row.get('sku'), 'error': str(e)})
+            if valid:
+                _copy_chunk(cursor, valid)
+            report['rows'] += len(chunk)
+            report['accepted'] += len(valid)
+        staged = time.perf_counter()
+
+        cursor.execute(MERGE_QUERY, {'supplier': supplier})
+        merged = cursor.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    finished = time.perf_counter()
+    report['inserted'] = merged['inserted']
+    report['updated'] = merged['updated']
+    report['unchanged'] = report['accepted'] - merged['inserted'] - merged['updated']
+    report['stageSeconds'] = round(staged - started, 3)
+    report['mergeSeconds'] = round(finished - staged, 3)
+    report['rowsPerSecond'] = round(report['rows'] / max(finished - started, 1e-6))
+    return report, merged['ids']
+
+def _catalog_product(row, categories):
+    category = categories.get(row['category_slug']) or {}
+    return {
+        'id': row['id'],
+        'sku': row['sku'],
+        'name': row['name'],
+        'categorySlug': row['category_slug'],
+        'brand': row['brand'],
+        'imageUrl': row['image_url'] or category.get('heroImageUrl'),
+        'gsmOptions': list(row['gsm_options'] or []),
+        'sheetSize': row['sheet_size'],
+        'pricePerUnit': float(row['price_per_unit']),
+        'pricePerReam': float(row['price_per_ream']) if row['price_per_ream'] is not None else None,
+        'pricePerCarton': float(row['price_per_carton']) if row['price_per_carton'] is not None else None,
+        'minOrderQty': row['min_order_qty'],
+        'inStock': row['stock_qty'] > 0,
+        'stockQty': row['stock_qty']
+    }
+
+def publish_snapshot(conn, path, snapshot, product_ids):
+    """Write a new catalog snapshot: the current one with product_ids replaced by their rows in
+    the products table. Running workers pick it up on their next poll.
+
+    Products the table does not hold (the snapshot was replaced after the table was seeded) are kept.
+    """
+    by_slug = {c['slug']: c for c in snapshot.categories}
+    products = {p['id']: p for p in snapshot}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CATALOG_QUERY, (list(product_ids),))
+        for row in cursor.fetchall():
+            products[row['id']] = dict(products.get(row['id'], {}), **_catalog_product(row, by_slug))
+    finally:
+        cursor.close()
+    return write_snapshot(path, snapshot.categories, list(products.values())), len(products)
+
+def load_feed(conn, stream, supplier, snapshot_path=None, chunk_size=FEED_CHUNK_SIZE):
+    """Ingest one feed, then rebuild the catalog snapshot (and with it the derived indexes) once"""
+    snapshot_path = snapshot_path or Config.CATALOG_SNAPSHOT
+    snapshot = CatalogSnapshot(snapshot_path)
+    report, changed_ids = ingest_feed(conn, stream, supplier, snapshot, chunk_size)
+    if changed_ids:
+        started = time.perf_counter()
+        report['catalogVersion'], report['catalogProducts'] = publish_snapshot(conn, snapshot_path, snapshot, changed_ids)
+        report['publishSeconds'] = round(time.perf_counter() - started, 3)
+    else:
+        report['catalogVersion'] = snapshot.version
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load a supplier CSV price list into the catalog')
+    parser.add_argument('feed', help='CSV file, or - for stdin')
+    parser.add_argument('--supplier', required=True, help='Supplier name recorded on each product')
+    parser.add_argument('--chunk-size', type=int, default=FEED_CHUNK_SIZE)
+    parser.add_argument('--snapshot', help='Catalog snapshot to update (defaults to CATALOG_SNAPSHOT)')
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit('Database connection failed')
+    stream = sys.stdin.buffer if args.feed == '-' else open(args.feed, 'rb')
+    try:
+        report = load_feed(conn, stream, args.supplier, args.snapshot, args.chunk_size)
+    except ValueError as e:
+        sys.exit(f'Feed rejected: {e}')
+    finally:
+        stream.close()
+        conn.close()
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
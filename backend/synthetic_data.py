@@ -0,0 +1,326 @@
+"""Seeded synthetic users, sessions, addresses, orders and catalog at production scale.
+
+    python synthetic_data.py --users 1000000 [--products 200000] [--seed 7]
+
+bulk-loads with COPY into the database in config.py (start the app once to
+create the schema). Rows are appended above the current max ids, so repeated
+runs grow the data set; use a benchmark database nothing else writes to.
+Every synthetic user signs in with SYNTHETIC_PASSWORD.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from addresses import address_hash, normalize_address
+from analytics import roll_up_daily_sales
+from catalog import CatalogSnapshot, DEMO_CATEGORIES
+from config import Config
+from partitions import MONTHS_AHEAD, add_months, ensure_partitions, month_start
+from supplier_feed import publish_snapshot, seed_products
+from trending import roll_up_sales
+
+DEFAULT_SEED = 7
+SYNTHETIC_PASSWORD = 'synthetic-pass'
+SUPPLIER = 'synthetic'
+BATCH_USERS = 20000
+SESSION_DAYS = 30  # as issued by create_session
+
+# Mobile numbers start with 6-9, so synthetic ones starting with 5 never collide with real signups
+PHONE_PREFIX = '5'
+# Reserved example domains mark synthetic accounts
+EMAIL_DOMAINS = ['example.com', 'example.net', 'example.org']
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Amit', 'Ananya', 'Arjun', 'Deepa', 'Divya', 'Farhan', 'Gaurav', 'Isha', 'Kabir', 'Kavya',
+    'Manish', 'Meera', 'Neha', 'Nikhil', 'Pooja', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Sanjay', 'Sara', 'Sneha',
+    'Suresh', 'Tanvi', 'Varun', 'Vikram', 'Yash', 'Zoya'
+]
+LAST_NAMES = [
+    'Agarwal', 'Bhat', 'Chopra', 'Das', 'Desai', 'Gupta', 'Iyer', 'Jain', 'Joshi', 'Kapoor', 'Khan', 'Kumar',
+    'Mehta', 'Menon', 'Nair', 'Patel', 'Pillai', 'Rao', 'Reddy', 'Shah', 'Sharma', 'Singh', 'Verma', 'Yadav'
+]
+# (city, state, first three pincode digits)
+CITIES = [
+    ('Mumbai', 'Maharashtra', '400'), ('Pune', 'Maharashtra', '411'), ('Delhi', 'Delhi', '110'),
+    ('Bengaluru', 'Karnataka', '560'), ('Chennai', 'Tamil Nadu', '600'), ('Hyderabad', 'Telangana', '500'),
+    ('Kolkata', 'West Bengal', '700'), ('Ahmedabad', 'Gujarat', '380'), ('Jaipur', 'Rajasthan', '302'),
+    ('Lucknow', 'Uttar Pradesh', '226'), ('Kochi', 'Kerala', '682'), ('Indore', 'Madhya Pradesh', '452')
+]
+BUILDINGS = ['Sai Residency', 'Green Park', 'Shanti Niwas', 'Lakeview Apartments', 'Krishna Towers', 'Office Block B']
+STREETS = ['MG Road', 'Station Road', 'Link Road', 'Ring Road', 'Main Bazaar', 'Church Street', '2nd Cross']
+LANDMARKS = ['Near City Mall', 'Opp. Post Office', 'Behind Bus Stand', 'Near Metro Station']
+QUANTITIES = [1, 1, 2, 5, 10, 10, 25, 50, 100]
+
+SIZES = ['A0', 'A1', 'A2', 'A3', 'A4', 'A5']
+KINDS = ['Paper Sheets', 'Bond Paper', 'Copier Paper', 'Cardstock', 'Art Paper', 'Photo Paper']
+GSMS = [60, 70, 75, 80, 90, 100, 120, 170, 210, 250, 300]
+
+COLUMNS = {
+    'users': ['id', 'full_name', 'phone_number', 'email', 'password_hash', 'created_at', 'is_verified'],
+    'sessions': ['id', 'user_id', 'session_token', 'created_at', 'expires_at'],
+    'addresses': ['id', 'user_id', 'full_name', 'phone', 'house', 'landmark', 'street', 'city', 'state',
+                  'pincode', 'created_at', 'address_hash'],
+    'orders': ['id', 'user_id', 'address_id', 'payment_method', 'total_amount', 'status', 'created_at',
+               'discount_amount'],
+    'order_items': ['id', 'order_id', 'created_at', 'product_id', 'name', 'image', 'variant', 'unit_price',
+                    'quantity'],
+}
+PRODUCT_COLUMNS = [
+    'id', 'sku', 'name', 'category_slug', 'brand', 'gsm_options', 'sheet_size', 'price_per_unit',
+    'price_per_ream', 'price_per_carton', 'min_order_qty', 'stock_qty', 'image_url', 'supplier'
+]
+
+def connect():
+    """A dedicated connection without the app's statement timeout, which bulk loads outlast"""
+    return psycopg2.connect(
+        host=Config.DB_HOST, port=Config.DB_PORT, database=Config.DB_NAME,
+        user=Config.DB_USER, password=Config.DB_PASSWORD, cursor_factory=RealDictCursor
+    )
+
+def synthetic_products(count, seed=DEFAULT_SEED, first_id=100, categories=DEMO_CATEGORIES):
+    """Products shaped like supplier_feed's catalog rows, spread over the categories"""
+    rng = random.Random(seed)
+    brands = [f"{rng.choice(['Acme', 'Bright', 'Metro', 'Fine', 'Global', 'Premium'])} {rng.choice(['Papers', 'Pulp', 'Print', 'Mills'])} {i}" for i in range(400)]
+    gsm_sets = [sorted(rng.sample(GSMS, 4)) for _ in range(40)]
+    for i in range(count):
+        category = categories[i % len(categories)]
+        stock = rng.choice([0, rng.randint(1, 5000)])
+        price = round(rng.uniform(0.5, 12), 2)
+        yield {
+            'id': first_id + i,
+            'sku': f"PC{first_id + i}",
+            'name': f"{rng.choice(SIZES)} {rng.choice(KINDS)} {rng.choice(GSMS)} gsm",
+            'categorySlug': category['slug'],
+            'brand': rng.choice(brands),
+            'imageUrl': category['heroImageUrl'],
+            'gsmOptions': list(rng.choice(gsm_sets)),
+            'sheetSize': rng.choice(SIZES),
+            'pricePerUnit': price,
+            'pricePerReam': round(price * 500, 2) if i % 3 else None,
+            'pricePerCarton': None,
+            'minOrderQty': rng.choice([1, 10, 50]),
+            'inStock': stock > 0,
+            'stockQty': stock
+        }
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY rows (tuples in column order, None for NULL) into table"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def _next_id(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 AS next FROM {table}")
+    return cursor.fetchone()['next']
+
+def _advance_sequence(cursor, table, last_id):
+    """Point the table's id sequence past explicitly loaded ids"""
+    if last_id > 0:
+        cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", (table, last_id))
+
+def _between(rng, start, end):
+    return start + (end - start) * rng.random()
+
+def _count(rng, mean):
+    """0..2*mean, averaging mean"""
+    return rng.randint(0, round(2 * mean))
+
+def load_products(conn, count, seed, snapshot_path):
+    """COPY count synthetic products into the products table and publish them as the catalog snapshot"""
+    snapshot = CatalogSnapshot(snapshot_path)
+    cursor = conn.cursor()
+    try:
+        # The current catalog goes in first so synthetic ids start above it
+        seed_products(cursor, snapshot)
+        first_id = _next_id(cursor, 'products')
+        buffer = []
+        for p in synthetic_products(count, seed, first_id, snapshot.categories):
+            buffer.append((
+                p['id'], p['sku'], p['name'], p['categorySlug'], p['brand'],
+                '{' + ','.join(map(str, p['gsmOptions'])) + '}', p['sheetSize'], p['pricePerUnit'],
+                p['pricePerReam'], p['pricePerCarton'], p['minOrderQty'], p['stockQty'], p['imageUrl'], SUPPLIER
+            ))
+            if len(buffer) >= BATCH_USERS:
+                copy_rows(cursor, 'products', PRODUCT_COLUMNS, buffer)
+                buffer = []
+        copy_rows(cursor, 'products', PRODUCT_COLUMNS, buffer)
+        _advance_sequence(cursor, 'products', first_id + count - 1)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return publish_snapshot(conn, snapshot_path, snapshot, range(first_id, first_id + count))
+
+def _product_pool(cursor, rng):
+    """Orderable products, shuffled so that the popular head spans every category"""
+    cursor.execute('SELECT id, name, image_url, price_per_unit, gsm_options FROM products')
+    pool = [(row['id'], row['name'], row['image_url'], row['price_per_unit'], row['gsm_options'])
+            for row in cursor.fetchall()]
+    pool.sort()
+    rng.shuffle(pool)
+    return pool
+
+def _user_rows(rng, ids, count, now, profile, pool):
+    """Rows for count users and everything they own, keyed by table; advances ids"""
+    rows = {table: [] for table in COLUMNS}
+    history_start = now - timedelta(days=profile['history_days'])
+    signup_start = now - timedelta(days=profile['history_days'] * 1.5)
+    for _ in range(count):
+        user_id = ids['users']
+        ids['users'] += 1
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        phone = f"{PHONE_PREFIX}{user_id:09d}"
+        email = f"{name.lower().replace(' ', '.')}{user_id}@{rng.choice(EMAIL_DOMAINS)}"
+        salt = f"{rng.getrandbits(128):032x}"
+        # Same format as app.hash_password
+        password_hash = f"{salt}:{hashlib.sha256((SYNTHETIC_PASSWORD + salt).encode()).hexdigest()}"
+        created = _between(rng, signup_start, now)
+        rows['users'].append((user_id, name, phone, email, password_hash, created, rng.random() < 0.95))
+
+        # Sessions start any time after signup and last SESSION_DAYS, so most have expired
+        for _ in range(_count(rng, profile['sessions_per_user'])):
+            started = _between(rng, created, now)
+            token = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            rows['sessions'].append((ids['sessions'], user_id, token, started, started + timedelta(days=SESSION_DAYS)))
+            ids['sessions'] += 1
+
+        address_ids, hashes = [], set()
+        for _ in range(_count(rng, profile['addresses_per_user'])):
+            city, state, pin = rng.choice(CITIES)
+            normalized = normalize_address({
+                'fullName': name, 'phone': phone,
+                'house': f"{rng.randint(1, 999)}, {rng.choice(BUILDINGS)}",
+                'landmark': rng.choice(LANDMARKS) if rng.random() < 0.4 else '',
+                'street': rng.choice(STREETS), 'city': city, 'state': state,
+                'pincode': f"{pin}{rng.randint(0, 999):03d}"
+            })
+            digest = address_hash(normalized)
+            if digest in hashes:
+                continue
+            hashes.add(digest)
+            rows['addresses'].append((
+                ids['addresses'], user_id, normalized['fullName'], normalized['phone'], normalized['house'],
+                normalized['landmark'] or None, normalized['street'], city, state, normalized['pincode'],
+                created, digest
+            ))
+            address_ids.append(ids['addresses'])
+            ids['addresses'] += 1
+
+        for _ in range(_count(rng, profile['orders_per_user'])):
+            order_id = ids['orders']
+            ids['orders'] += 1
+            placed = _between(rng, max(created, history_start), now)
+            total = 0
+            for _ in range(1 + _count(rng, profile['items_per_order'] - 1)):
+                # Cubing skews sales towards the head of the pool
+                product_id, product_name, image, price, gsm_options = pool[int(len(pool) * rng.random() ** 3)]
+                quantity = rng.choice(QUANTITIES)
+                total += price * quantity
+                variant = str(rng.choice(gsm_options)) if gsm_options else None
+                rows['order_items'].append((
+                    ids['order_items'], order_id, placed, product_id, product_name, image, variant, price, quantity
+                ))
+                ids['order_items'] += 1
+            rows['orders'].append((
+                order_id, user_id, rng.choice(address_ids) if address_ids else None,
+                'cod' if rng.random() < 0.55 else 'online', total, 'PLACED', placed, 0
+            ))
+    return rows
+
+def load_users(conn, users, seed=DEFAULT_SEED, history_days=365, sessions_per_user=2.0, addresses_per_user=1.5,
+               orders_per_user=3.0, items_per_order=3.0, batch_users=BATCH_USERS, progress=None):
+    """COPY users and their sessions, addresses, orders and order items, committing per batch; returns row counts"""
+    profile = {
+        'history_days': history_days, 'sessions_per_user': sessions_per_user,
+        'addresses_per_user': addresses_per_user, 'orders_per_user': orders_per_user,
+        'items_per_order': max(items_per_order, 1)
+    }
+    now = datetime.now()
+    counts = dict.fromkeys(COLUMNS, 0)
+    cursor = conn.cursor()
+    try:
+        ids = {table: _next_id(cursor, table) for table in COLUMNS}
+        # Same seed and starting point, same data; a later run appends different users and tokens
+        rng = random.Random(f"{seed}:{ids['users']}")
+        pool = _product_pool(cursor, rng)
+        if not pool and orders_per_user > 0:
+            raise RuntimeError('No products to order; start the app once or pass --products')
+        this_month = month_start(now)
+        ensure_partitions(cursor, month_start(now - timedelta(days=history_days)), add_months(this_month, MONTHS_AHEAD))
+        conn.commit()
+
+        loaded = 0
+        while loaded < users:
+            batch = min(batch_users, users - loaded)
+            rows = _user_rows(rng, ids, batch, now, profile, pool)
+            # Parents before children, for the foreign keys
+            for table, columns in COLUMNS.items():
+                copy_rows(cursor, table, columns, rows[table])
+                counts[table] += len(rows[table])
+            for table in COLUMNS:
+                _advance_sequence(cursor, table, ids[table] - 1)
+            conn.commit()
+            loaded += batch
+            if progress:
+                progress(loaded, counts)
+        cursor.execute(f"ANALYZE {', '.join(COLUMNS)}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    # Catch the rollups up here, free of the statement timeout the app's incremental passes run under
+    roll_up_daily_sales(conn)
+    roll_up_sales(conn)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk-load seeded synthetic data')
+    parser.add_argument('--users', type=int, required=True)
+    parser.add_argument('--products', type=int, default=0, help='synthetic products to add to the catalog first')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--history-days', type=int, default=365, help='how far back orders go')
+    parser.add_argument('--sessions-per-user', type=float, default=2.0)
+    parser.add_argument('--addresses-per-user', type=float, default=1.5)
+    parser.add_argument('--orders-per-user', type=float, default=3.0)
+    parser.add_argument('--items-per-order', type=float, default=3.0)
+    parser.add_argument('--batch-users', type=int, default=BATCH_USERS)
+    parser.add_argument('--snapshot', help='Catalog snapshot to update (defaults to CATALOG_SNAPSHOT)')
+    args = parser.parse_args(argv)
+
+    try:
+        conn = connect()
+    except psycopg2.Error as e:
+        sys.exit(f"Database connection failed: {e}")
+    started = time.perf_counter()
+    report = {'seed': args.seed}
+    try:
+        if args.products:
+            report['catalogVersion'], report['catalogProducts'] = load_products(
+                conn, args.products, args.seed, args.snapshot or Config.CATALOG_SNAPSHOT)
+        report['rows'] = load_users(
+            conn, args.users, args.seed, args.history_days, args.sessions_per_user, args.addresses_per_user,
+            args.orders_per_user, args.items_per_order, args.batch_users,
+            progress=lambda done, counts: print(f"{done}/{args.users} users, {sum(counts.values())} rows", file=sys.stderr)
+        )
+    finally:
+        conn.close()
+    report['seconds'] = round(time.perf_counter() - started, 1)
+    report['rowsPerSecond'] = round(sum(report['rows'].values()) / max(report['seconds'], 0.1))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
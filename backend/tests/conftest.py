@@ -0,0 +1,169 @@
+"""Shared fixtures.
+
+Redis-backed tests run against fakeredis (with Lua support for the stock and cart
+scripts) and are skipped without it. Postgres-backed tests create a throwaway
+database next to DB_NAME and are skipped when the server cannot be reached or
+the user may not create databases.
+"""
+import os
+import sys
+import uuid
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from partitions import create_order_tables
+
+# The tables these tests touch, as app.init_db creates them. Orders reference
+# users and addresses, so those come before create_order_tables.
+USER_TABLES = [
+    '''
+    CREATE TABLE users (
+        id SERIAL PRIMARY KEY,
+        full_name VARCHAR(255) NOT NULL,
+        phone_number VARCHAR(15) UNIQUE NOT NULL,
+        email VARCHAR(255) UNIQUE,
+        password_hash VARCHAR(255) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_verified BOOLEAN DEFAULT FALSE
+    )
+    ''',
+    '''
+    CREATE TABLE addresses (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        full_name VARCHAR(255) NOT NULL,
+        phone VARCHAR(20) NOT NULL,
+        house VARCHAR(255) NOT NULL,
+        landmark VARCHAR(255),
+        street VARCHAR(255),
+        city VARCHAR(120),
+        state VARCHAR(120),
+        pincode VARCHAR(20),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        address_hash VARCHAR(64)
+    )
+    ''',
+    'CREATE UNIQUE INDEX idx_addresses_user_hash ON addresses (user_id, address_hash)',
+]
+
+CATALOG_TABLES = [
+    '''
+    CREATE TABLE products (
+        id SERIAL PRIMARY KEY,
+        sku VARCHAR(64) UNIQUE NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        category_slug VARCHAR(100) NOT NULL,
+        brand VARCHAR(100) NOT NULL,
+        gsm_options INTEGER[] NOT NULL DEFAULT '{}',
+        sheet_size VARCHAR(4),
+        price_per_unit DECIMAL(10,2) NOT NULL,
+        price_per_ream DECIMAL(10,2),
+        price_per_carton DECIMAL(10,2),
+        min_order_qty INTEGER NOT NULL DEFAULT 1,
+        stock_qty INTEGER NOT NULL DEFAULT 0,
+        image_url TEXT,
+        supplier VARCHAR(100),
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE rollup_state (
+        name VARCHAR(50) PRIMARY KEY,
+        last_id BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE sales_daily (
+        day DATE NOT NULL,
+        category_slug VARCHAR(100) NOT NULL,
+        payment_method VARCHAR(20) NOT NULL,
+        orders INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        revenue NUMERIC(14,2) NOT NULL,
+        PRIMARY KEY (day, category_slug, payment_method)
+    )
+    ''',
+    '''
+    CREATE TABLE orders_daily (
+        day DATE NOT NULL,
+        payment_method VARCHAR(20) NOT NULL,
+        orders INTEGER NOT NULL,
+        PRIMARY KEY (day, payment_method)
+    )
+    ''',
+    '''
+    CREATE TABLE coupon_usage_daily (
+        day DATE NOT NULL,
+        coupon_code VARCHAR(20) NOT NULL,
+        payment_method VARCHAR(20) NOT NULL,
+        orders INTEGER NOT NULL,
+        discount NUMERIC(14,2) NOT NULL,
+        revenue NUMERIC(14,2) NOT NULL,
+        PRIMARY KEY (day, coupon_code, payment_method)
+    )
+    ''',
+]
+
+def _connect(database):
+    return psycopg2.connect(
+        host=Config.DB_HOST, port=Config.DB_PORT, database=database, user=Config.DB_USER,
+        password=Config.DB_PASSWORD, cursor_factory=RealDictCursor, connect_timeout=Config.DB_CONNECT_TIMEOUT
+    )
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    return fakeredis.FakeRedis(decode_responses=True)
+
+@pytest.fixture(scope='session')
+def database():
+    """Name of a scratch database with the order, product and rollup tables"""
+    name = f"papercart_test_{uuid.uuid4().hex[:8]}"
+    try:
+        admin = _connect(Config.DB_NAME)
+        admin.autocommit = True
+        admin.cursor().execute(f'CREATE DATABASE {name}')
+    except psycopg2.Error as e:
+        pytest.skip(f'Postgres is not available: {e}')
+    try:
+        conn = _connect(name)
+        cur = conn.cursor()
+        for statement in USER_TABLES:
+            cur.execute(statement)
+        create_order_tables(cur)
+        for statement in CATALOG_TABLES:
+            cur.execute(statement)
+        conn.commit()
+        conn.close()
+        yield name
+    finally:
+        admin.cursor().execute(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)')
+        admin.close()
+
+@pytest.fixture
+def db(database):
+    """A connection to the scratch database, emptied after each test"""
+    conn = _connect(database)
+    yield conn
+    conn.rollback()
+    conn.cursor().execute('''
+        TRUNCATE users, addresses, orders, order_items, order_provisional_ids, products,
+                 rollup_state, sales_daily, orders_daily, coupon_usage_daily RESTART IDENTITY CASCADE
+    ''')
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def user_id(db):
+    cur = db.cursor()
+    cur.execute('''
+        INSERT INTO users (full_name, phone_number, password_hash) VALUES ('Test', '9876543210', 'x') RETURNING id
+    ''')
+    db.commit()
+    return cur.fetchone()['id']
@@ -0,0 +1,70 @@
+from datetime import date
+import pytest
+from analytics import parse_group_by, roll_up_daily_sales, sales_report
+
+DAY = date(2026, 3, 14)
+
+def place(cur, user_id, payment_method, lines, coupon_code=None, discount=0):
+    """Insert an order dated DAY with (product id, quantity, unit price) lines"""
+    total = sum(q * p for _, q, p in lines) - discount
+    cur.execute('''
+        INSERT INTO orders (user_id, payment_method, total_amount, coupon_code, discount_amount, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s) RETURNING id, created_at
+    ''', (user_id, payment_method, total, coupon_code, discount, f'{DAY} 12:00'))
+    order = cur.fetchone()
+    for product_id, quantity, price in lines:
+        cur.execute('''
+            INSERT INTO order_items (order_id, created_at, product_id, name, unit_price, quantity)
+            VALUES (%s, %s, %s, 'Paper', %s, %s)
+        ''', (order['id'], order['created_at'], product_id, price, quantity))
+
+@pytest.fixture
+def orders(db, user_id):
+    cur = db.cursor()
+    cur.execute('''
+        INSERT INTO products (id, sku, name, category_slug, brand, price_per_unit) VALUES
+            (1, 'A4-1', 'A4 Copier', 'a4-paper-sheets', 'B2B', 2.5),
+            (2, 'A3-1', 'A3 Art Card', 'a3-paper-sheets', 'B2B', 12)
+    ''')
+    # Spans both categories: one order, counted once in each category
+    place(cur, user_id, 'cod', [(1, 4, 2.5), (2, 1, 12)], coupon_code='FIRST100', discount=2)
+    place(cur, user_id, 'cod', [(1, 2, 2.5)])
+    place(cur, user_id, 'upi', [(2, 3, 12), (99, 1, 5)])
+    db.commit()
+    return db
+
+def test_rollup_consumes_each_order_once(orders):
+    assert roll_up_daily_sales(orders) == 3
+    assert roll_up_daily_sales(orders) == 0
+
+def test_order_counts_without_category(orders):
+    roll_up_daily_sales(orders)
+    report = sales_report(orders, None, None, ['day'])
+    assert report['sales'] == [{'day': DAY.isoformat(), 'orders': 3, 'units': 11, 'revenue': 68.0}]
+    assert report['rolledUpThroughOrderId'] == 3
+
+    by_payment = sales_report(orders, None, None, ['paymentMethod'])['sales']
+    assert [(r['paymentMethod'], r['orders']) for r in by_payment] == [('cod', 2), ('upi', 1)]
+
+def test_order_counts_per_category(orders):
+    roll_up_daily_sales(orders)
+    sales = sales_report(orders, None, None, ['category'])['sales']
+    assert [(r['category'], r['orders'], r['units']) for r in sales] == [
+        ('a3-paper-sheets', 2, 4), ('a4-paper-sheets', 2, 6), ('uncategorized', 1, 1)
+    ]
+
+def test_coupon_usage(orders):
+    roll_up_daily_sales(orders)
+    coupons = sales_report(orders, None, None, ['day'])['coupons']
+    assert coupons == [{'day': DAY.isoformat(), 'couponCode': 'FIRST100', 'orders': 1, 'discount': 2.0, 'revenue': 20.0}]
+
+def test_date_range_is_half_open(orders):
+    roll_up_daily_sales(orders)
+    assert sales_report(orders, DAY, DAY, ['day'])['sales'] == []
+    assert len(sales_report(orders, DAY, date(2026, 3, 15), ['day'])['sales']) == 1
+
+def test_parse_group_by():
+    assert parse_group_by(None) == ['day']
+    assert parse_group_by('category, paymentMethod') == ['category', 'paymentMethod']
+    with pytest.raises(ValueError, match='Unknown groupBy'):
+        parse_group_by('day,region')
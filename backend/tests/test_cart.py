@@ -0,0 +1,89 @@
+import pytest
+from cart import (
+    MAX_CART_LINES, MAX_LINE_QUANTITY, MAX_OPS_PER_REQUEST, LocalCartStore, RedisCartStore, order_items, parse_ops
+)
+
+CATALOG = {
+    1: {'id': 1, 'name': 'A4 Copier Paper', 'pricePerUnit': 2.5, 'imageUrl': '/a4.jpg'},
+    2: {'id': 2, 'name': 'A3 Art Card', 'pricePerUnit': 12.0, 'imageUrl': '/a3.jpg'},
+}
+
+def resolve_products(product_ids):
+    return {pid: CATALOG[pid] for pid in product_ids if pid in CATALOG}
+
+def ops(*raw):
+    return parse_ops(list(raw), resolve_products)
+
+@pytest.fixture(params=['local', 'redis'])
+def store(request):
+    if request.param == 'local':
+        store = LocalCartStore()
+    else:
+        store = RedisCartStore(request.getfixturevalue('redis_client'))
+    store.create('c1')
+    return store
+
+def test_parse_ops_prices_catalog_products_from_the_catalog():
+    [(op, lid, quantity, line)] = ops({'op': 'add', 'productId': 1, 'variant': '80gsm', 'quantity': 4, 'unitPrice': 0.01})
+    assert (op, lid, quantity) == ('add', '1-80gsm', 4)
+    assert line['pricePaise'] == 250 and line['name'] == 'A4 Copier Paper'
+
+def test_parse_ops_keeps_the_client_price_outside_the_catalog():
+    [(_, _, _, line)] = ops({'op': 'add', 'productId': 'custom-1', 'unitPrice': '3.10', 'name': 'Custom'})
+    assert line['pricePaise'] == 310
+    with pytest.raises(ValueError):
+        ops({'op': 'add', 'productId': 'custom-2'})
+
+@pytest.mark.parametrize('raw, message', [
+    ([], 'non-empty'),
+    ([{'op': 'replace', 'lineId': '1-'}], 'op = add'),
+    ([{'op': 'set', 'lineId': '1-', 'quantity': 'many'}], 'integer'),
+    ([{'op': 'set', 'lineId': '1-', 'quantity': MAX_LINE_QUANTITY + 1}], 'too large'),
+    ([{'op': 'remove'}], 'needs lineId'),
+    ([{'op': 'set', 'lineId': '_count', 'quantity': 1}], 'Invalid lineId'),
+    ([{'op': 'add', 'productId': '_subtotal', 'unitPrice': 1}], 'Invalid productId'),
+    ([{'op': 'remove', 'lineId': '1-'}] * (MAX_OPS_PER_REQUEST + 1), 'operations per request'),
+])
+def test_parse_ops_rejects(raw, message):
+    with pytest.raises(ValueError, match=message):
+        parse_ops(raw, resolve_products)
+
+def test_apply_keeps_running_totals(store):
+    result = store.apply('c1', ops(
+        {'op': 'add', 'productId': 1, 'quantity': 4},
+        {'op': 'add', 'productId': 2, 'quantity': 1},
+        {'op': 'add', 'productId': 1, 'quantity': 2},
+    ))
+    assert (result['count'], result['subtotal']) == (7, 27.0)
+    assert result['lines']['1-']['quantity'] == 6
+
+    result = store.apply('c1', ops({'op': 'set', 'lineId': '1-', 'quantity': 1}, {'op': 'remove', 'lineId': '2-'}))
+    assert (result['count'], result['subtotal']) == (1, 2.5)
+    assert result['lines']['1-']['quantity'] == 1 and result['lines']['2-'] is None
+
+    cart = store.get('c1')
+    assert (cart['count'], cart['subtotal']) == (1, 2.5)
+    assert order_items(cart) == [
+        {'productId': 1, 'name': 'A4 Copier Paper', 'image': '/a4.jpg', 'variant': '', 'unitPrice': 2.5, 'quantity': 1}
+    ]
+
+def test_set_to_zero_removes_the_line(store):
+    store.apply('c1', ops({'op': 'add', 'productId': 1, 'quantity': 2}))
+    result = store.apply('c1', ops({'op': 'set', 'lineId': '1-', 'quantity': 0}))
+    assert result['lines'] == {'1-': None}
+    assert store.get('c1')['items'] == []
+
+def test_missing_cart(store):
+    assert store.apply('nope', ops({'op': 'add', 'productId': 1})) is None
+    assert store.get('nope') is None
+    store.delete('c1')
+    assert store.get('c1') is None
+
+def test_cart_line_cap(store):
+    adds = [{'op': 'add', 'productId': f'p{i}', 'unitPrice': 1} for i in range(MAX_CART_LINES)]
+    assert store.apply('c1', ops(*adds))['count'] == MAX_CART_LINES
+    # Existing lines can still change, but no new line fits
+    assert store.apply('c1', ops({'op': 'add', 'productId': 'p0', 'unitPrice': 1}))['count'] == MAX_CART_LINES + 1
+    with pytest.raises(ValueError, match='at most'):
+        store.apply('c1', ops({'op': 'add', 'productId': 'extra', 'unitPrice': 1}))
+    assert store.get('c1')['count'] == MAX_CART_LINES + 1
@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import redis
+import notifications
+from notifications import (
+    MESSAGE_TTL, NOTIFICATION_METRICS, LocalSmsQueue, RedisSmsQueue, ResilientSmsQueue, SmsSendError,
+    dispatch_batch, enqueue_otp, normalize_phone
+)
+from resilience import CircuitBreaker
+
+class RecordingSender:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.sent = []
+
+    def send(self, route, text, numbers):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((route, text, numbers))
+
+class DownQueue:
+    def append(self, message):
+        raise redis.ConnectionError('Connection refused')
+
+    def read(self, count, block_ms):
+        raise redis.ConnectionError('Connection refused')
+
+    def backlog(self):
+        raise redis.ConnectionError('Connection refused')
+
+def message(number, text, age=0):
+    return {'number': number, 'route': 'otp', 'text': text, 'enqueuedAt': time.time() - age}
+
+def dispatch(sender, batch):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        dispatch_batch(sender, batch, threading.Event(), executor)
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(notifications, 'BACKOFF_SECONDS', 0)
+
+@pytest.mark.parametrize('phone, number', [
+    ('+91 98765-43210', '9876543210'),
+    ('09876543210', '9876543210'),
+    ('12345', None),
+    (None, None),
+])
+def test_normalize_phone(phone, number):
+    assert normalize_phone(phone) == number
+
+def test_enqueue_skips_unusable_numbers():
+    queue = LocalSmsQueue()
+    assert enqueue_otp(queue, '+91 98765 43210', '123456')
+    assert not enqueue_otp(queue, 'n/a', '123456')
+    [queued] = queue.read(10, 0)
+    assert (queued['number'], queued['route'], queued['text']) == ('9876543210', 'otp', '123456')
+
+def test_identical_texts_share_one_request():
+    sender = RecordingSender()
+    dispatch(sender, [message('9000000001', 'Sale'), message('9000000002', 'Sale'), message('9000000003', 'Hi')])
+    assert sorted(sender.sent) == [('otp', 'Hi', ['9000000003']), ('otp', 'Sale', ['9000000001', '9000000002'])]
+
+def test_expired_messages_are_dropped():
+    sender = RecordingSender()
+    expired = NOTIFICATION_METRICS['expired']
+    dispatch(sender, [message('9000000001', '111111', age=MESSAGE_TTL + 1), message('9000000002', '222222')])
+    assert sender.sent == [('otp', '222222', ['9000000002'])]
+    assert NOTIFICATION_METRICS['expired'] == expired + 1
+
+def test_retryable_failures_are_retried():
+    sender = RecordingSender([SmsSendError('HTTP 503'), SmsSendError('HTTP 429')])
+    dispatch(sender, [message('9000000001', '123456')])
+    assert sender.sent == [('otp', '123456', ['9000000001'])]
+
+def test_permanent_failures_are_not_retried():
+    sender = RecordingSender([SmsSendError('Invalid number', retryable=False)])
+    failed = NOTIFICATION_METRICS['failed']
+    dispatch(sender, [message('9000000001', '123456')])
+    assert sender.sent == []
+    assert NOTIFICATION_METRICS['failed'] == failed + 1
+
+def test_redis_queue_polls_without_blocking(redis_client):
+    queue = RedisSmsQueue(redis_client)
+    started = time.monotonic()
+    assert queue.read(10, 50) == []
+    assert time.monotonic() - started < 1
+    for i in range(3):
+        queue.append(message(f'900000000{i}', 'Hi'))
+    assert [m['number'] for m in queue.read(2, 50)] == ['9000000000', '9000000001']
+    assert queue.backlog() == 1
+
+def test_idle_redis_queue_keeps_the_breaker_closed(redis_client):
+    breaker = CircuitBreaker('redis', failure_threshold=1)
+    queue = ResilientSmsQueue(RedisSmsQueue(redis_client), breaker)
+    assert queue.read(10, 10) == []
+    assert breaker.state == 'closed'
+
+def test_falls_back_to_process_memory_while_redis_fails():
+    breaker = CircuitBreaker('redis', failure_threshold=1, reset_timeout=60)
+    queue = ResilientSmsQueue(DownQueue(), breaker)
+    enqueue_otp(queue, '9876543210', '123456')
+    assert breaker.state == 'open'
+    assert queue.backlog() == 1
+    [queued] = queue.read(10, 0)
+    assert queued['text'] == '123456'
@@ -0,0 +1,136 @@
+import psycopg2
+import pytest
+import order_queue
+from order_queue import LocalLogOrderQueue, RedisOrderQueue, enqueue_order, new_provisional_id, persist_batch
+from stock import LocalStockStore
+
+ADDRESS = {
+    'fullName': 'Test Buyer', 'phone': '9876543210', 'house': '12 Mill Road', 'landmark': '',
+    'street': 'MG Road', 'city': 'Pune', 'state': 'MH', 'pincode': '411001'
+}
+
+def entry(user_id=1, **fields):
+    return dict({
+        'provisionalId': new_provisional_id(),
+        'userId': user_id,
+        'items': [{'productId': 1, 'name': 'A4 Copier Paper', 'unitPrice': 2.5, 'quantity': 4}],
+        'address': ADDRESS,
+        'paymentMethod': 'cod',
+        'totalAmount': 10.0,
+        'stockQuantities': {'1': 4},
+    }, **fields)
+
+@pytest.fixture(params=['local', 'redis'])
+def queue(request, tmp_path):
+    if request.param == 'local':
+        return LocalLogOrderQueue(str(tmp_path / 'orders.log'))
+    return RedisOrderQueue(request.getfixturevalue('redis_client'))
+
+def test_queue_round_trip(queue):
+    first, second = entry(), entry()
+    enqueue_order(queue, first)
+    enqueue_order(queue, second)
+    assert queue.get_status(first['provisionalId']) == {'status': 'QUEUED'}
+    assert queue.backlog() == 2
+
+    batch = queue.read('worker-1', 10, 0)
+    assert [e['provisionalId'] for _, e in batch] == [first['provisionalId'], second['provisionalId']]
+    queue.ack([msg_id for msg_id, _ in batch])
+    queue.set_status(first['provisionalId'], {'status': 'CONFIRMED', 'orderId': 7})
+    assert queue.get_status(first['provisionalId']) == {'status': 'CONFIRMED', 'orderId': 7}
+    assert queue.backlog() == 0
+
+def test_local_requeue_keeps_order(tmp_path):
+    queue = LocalLogOrderQueue(str(tmp_path / 'orders.log'))
+    entries = [entry() for _ in range(3)]
+    for e in entries:
+        enqueue_order(queue, e)
+    batch = queue.read('worker-1', 2, 0)
+    queue.requeue(batch)
+    assert [e['provisionalId'] for _, e in queue.read('worker-1', 10, 0)] == [e['provisionalId'] for e in entries]
+
+def test_local_log_replays_unacknowledged_orders(tmp_path):
+    path = str(tmp_path / 'orders.log')
+    queue = LocalLogOrderQueue(path)
+    persisted, pending = entry(), entry()
+    enqueue_order(queue, persisted)
+    enqueue_order(queue, pending)
+    batch = queue.read('worker-1', 1, 0)
+    queue.ack([msg_id for msg_id, _ in batch])
+
+    restarted = LocalLogOrderQueue(path)
+    assert [e['provisionalId'] for _, e in restarted.read('worker-1', 10, 0)] == [pending['provisionalId']]
+    assert restarted.get_status(pending['provisionalId']) == {'status': 'QUEUED'}
+
+class _Connection:
+    def close(self):
+        pass
+
+def _process(queue, stock_store, get_db_connection=_Connection):
+    order_queue._process_batch(queue, get_db_connection, stock_store, 'worker-1', 10, 0)
+
+@pytest.fixture
+def local_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_queue.time, 'sleep', lambda seconds: None)
+    return LocalLogOrderQueue(str(tmp_path / 'orders.log'))
+
+def test_batch_is_requeued_without_a_connection(local_queue):
+    stock_store = LocalStockStore()
+    queued = entry()
+    enqueue_order(local_queue, queued)
+    _process(local_queue, stock_store, get_db_connection=lambda: None)
+    assert local_queue.backlog() == 1
+    assert local_queue.get_status(queued['provisionalId']) == {'status': 'QUEUED'}
+
+def test_connection_errors_leave_orders_queued(local_queue, monkeypatch):
+    def persist(conn, entries):
+        raise psycopg2.OperationalError('server closed the connection unexpectedly')
+    monkeypatch.setattr(order_queue, 'persist_batch', persist)
+    stock_store = LocalStockStore()
+    queued = entry()
+    enqueue_order(local_queue, queued)
+
+    _process(local_queue, stock_store)
+    assert local_queue.backlog() == 1
+    assert local_queue.get_status(queued['provisionalId']) == {'status': 'QUEUED'}
+    assert stock_store.availability([1]) == {1: 0}
+
+def test_rejected_orders_fail_and_are_restocked(local_queue, monkeypatch):
+    good, bad = entry(), entry()
+    def persist(conn, entries):
+        if any(e is bad for e in entries):
+            raise psycopg2.IntegrityError('violates foreign key constraint')
+        return {e['provisionalId']: {'status': 'CONFIRMED', 'orderId': 1} for e in entries}
+    monkeypatch.setattr(order_queue, 'persist_batch', persist)
+    stock_store = LocalStockStore()
+    enqueue_order(local_queue, good)
+    enqueue_order(local_queue, bad)
+
+    _process(local_queue, stock_store)
+    assert local_queue.backlog() == 0
+    assert local_queue.get_status(good['provisionalId']) == {'status': 'CONFIRMED', 'orderId': 1}
+    assert local_queue.get_status(bad['provisionalId'])['status'] == 'FAILED'
+    assert stock_store.availability([1]) == {1: 4}
+
+def test_persist_batch(db, user_id):
+    first, second = entry(user_id), entry(user_id, paymentMethod='upi')
+    statuses = persist_batch(db, [first, second])
+    assert {s['status'] for s in statuses.values()} == {'CONFIRMED'}
+
+    cur = db.cursor()
+    cur.execute('SELECT COUNT(DISTINCT address_id) AS addresses, COUNT(*) AS orders FROM orders')
+    assert cur.fetchone() == {'addresses': 1, 'orders': 2}
+    cur.execute('SELECT SUM(quantity) AS units FROM order_items')
+    assert cur.fetchone()['units'] == 8
+
+def test_persist_batch_is_idempotent_on_redelivery(db, user_id):
+    queued = entry(user_id)
+    order_id = persist_batch(db, [queued])[queued['provisionalId']]['orderId']
+    assert persist_batch(db, [queued]) == {queued['provisionalId']: {'status': 'CONFIRMED', 'orderId': order_id}}
+    cur = db.cursor()
+    cur.execute('SELECT COUNT(*) AS orders FROM orders')
+    assert cur.fetchone()['orders'] == 1
+
+def test_persist_batch_rejects_unknown_addresses(db, user_id):
+    queued = entry(user_id, addressId=12345, address=None)
+    assert persist_batch(db, [queued])[queued['provisionalId']] == {'status': 'FAILED', 'error': 'Address not found'}
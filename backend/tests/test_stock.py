@@ -0,0 +1,76 @@
+import pytest
+from stock import LocalStockStore, RedisStockStore, cart_quantities
+
+@pytest.fixture(params=['local', 'redis'])
+def store(request):
+    if request.param == 'local':
+        store = LocalStockStore()
+    else:
+        store = RedisStockStore(request.getfixturevalue('redis_client'))
+    store.seed({1: 10, 2: 5})
+    return store
+
+def test_seed_leaves_live_counters_alone(store):
+    store.reserve({1: 4})
+    store.seed({1: 10, 3: 7})
+    assert store.availability([1, 3]) == {1: 6, 3: 7}
+
+def test_reserve_takes_every_line(store):
+    reservation_id, short = store.reserve({1: 3, 2: 5})
+    assert reservation_id and short is None
+    assert store.availability([1, 2]) == {1: 7, 2: 0}
+
+def test_reserve_is_all_or_nothing(store):
+    reservation_id, short = store.reserve({1: 3, 2: 6})
+    assert reservation_id is None and short == 2
+    assert store.availability([1, 2]) == {1: 10, 2: 5}
+
+def test_unknown_products_have_no_stock(store):
+    assert store.reserve({99: 1}) == (None, 99)
+    assert store.availability([99]) == {99: 0}
+
+def test_release_returns_the_reservation(store):
+    reservation_id, _ = store.reserve({1: 3, 2: 2})
+    store.release(reservation_id)
+    store.release(reservation_id)
+    assert store.availability([1, 2]) == {1: 10, 2: 5}
+
+def test_release_expired(store):
+    store.reserve({1: 3}, ttl=-1)
+    kept, _ = store.reserve({2: 1})
+    assert store.release_expired() == 1
+    assert store.availability([1, 2]) == {1: 10, 2: 4}
+    store.release(kept)
+    assert store.availability([2]) == {2: 5}
+
+def test_commit_records_deltas_until_acknowledged(store):
+    reservation_id, _ = store.reserve({1: 3, 2: 1})
+    store.commit(reservation_id)
+    assert store.take_committed() == {1: 3, 2: 1}
+
+    # Commits made while a batch is unreconciled wait for the next take
+    second, _ = store.reserve({1: 2})
+    store.commit(second)
+    assert store.take_committed() == {1: 3, 2: 1}
+    store.ack_committed()
+    assert store.take_committed() == {1: 2}
+    store.ack_committed()
+    assert store.take_committed() == {}
+    assert store.availability([1, 2]) == {1: 5, 2: 4}
+
+def test_restock_undoes_a_commit(store):
+    reservation_id, _ = store.reserve({1: 3})
+    store.commit(reservation_id)
+    store.restock({1: 3})
+    assert store.availability([1]) == {1: 10}
+    assert store.take_committed() == {1: 0}
+
+def test_cart_quantities():
+    items = [
+        {'productId': 1, 'quantity': 2},
+        {'productId': '1', 'quantity': 3},
+        {'productId': 2, 'quantity': 0},
+        {'productId': None, 'quantity': 4},
+        {'name': 'custom', 'quantity': 1},
+    ]
+    assert cart_quantities(items) == {1: 5}
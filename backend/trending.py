@@ -0,0 +1,160 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import psycopg2
+from resilience import CircuitOpenError
+
+ROLLUP_NAME = 'product_sales'
+
+# Ranking window -> (rollup table, span)
+TRENDING_WINDOWS = {
+    'day': ('product_sales_hourly', timedelta(hours=24)),
+    'week': ('product_sales_daily', timedelta(days=7)),
+    'month': ('product_sales_daily', timedelta(days=30)),
+}
+HOURLY_RETENTION = timedelta(days=7)
+MAX_RANKED = 50
+
+# order_items newer than this are left for the next run: a lower id from a
+# transaction that has not committed yet would otherwise be skipped for good
+SETTLE_SECONDS = 10
+
+_BUCKET_UPSERT = '''
+    INSERT INTO {table} (bucket, product_id, quantity, revenue, orders)
+    SELECT date_trunc('{unit}', o.created_at), oi.product_id, SUM(oi.quantity),
+           SUM(oi.unit_price * oi.quantity), COUNT(DISTINCT o.id)
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id AND o.created_at = oi.created_at
+    WHERE oi.id > %(last_id)s AND oi.id <= %(high_id)s AND oi.product_id IS NOT NULL
+      AND oi.created_at >= %(since)s AND o.created_at >= %(since)s
+    GROUP BY 1, 2
+    ON CONFLICT (bucket, product_id) DO UPDATE SET
+        quantity = {table}.quantity + EXCLUDED.quantity,
+        revenue = {table}.revenue + EXCLUDED.revenue,
+        orders = {table}.orders + EXCLUDED.orders
+'''
+
+def roll_up_sales(conn):
+    """Fold order_items added since the high-water mark into the hourly and daily buckets.
+
+    Returns the number of order_items consumed; 0 when another worker holds the rollup.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute('''
+            INSERT INTO rollup_state (name, last_id) VALUES (%s, 0) ON CONFLICT (name) DO NOTHING
+        ''', (ROLLUP_NAME,))
+        cur.execute('''
+            SELECT last_id FROM rollup_state WHERE name = %s FOR UPDATE SKIP LOCKED
+        ''', (ROLLUP_NAME,))
+        state = cur.fetchone()
+        if state is None:
+            conn.rollback()
+            return 0
+        last_id = state['last_id']
+        # Prune to the months holding rows above the mark. Lines loaded with back-dated
+        # created_at (a replayed backlog, synthetic data) can sit in any month.
+        cur.execute('SELECT MIN(created_at) AS since FROM order_items WHERE id > %s', (last_id,))
+        since = cur.fetchone()['since']
+        if since is None:
+            conn.rollback()
+            return 0
+        cur.execute('''
+            SELECT MAX(id) AS high_id, COUNT(*) AS items
+            FROM order_items
+            WHERE id > %s AND created_at >= %s AND created_at < NOW() - make_interval(secs => %s)
+        ''', (last_id, since, SETTLE_SECONDS))
+        delta = cur.fetchone()
+        if not delta['high_id']:
+            conn.rollback()
+            return 0
+
+        params = {'last_id': last_id, 'high_id': delta['high_id'], 'since': since}
+        cur.execute(_BUCKET_UPSERT.format(table='product_sales_hourly', unit='hour'), params)
+        cur.execute(_BUCKET_UPSERT.format(table='product_sales_daily', unit='day'), params)
+        cur.execute('DELETE FROM product_sales_hourly WHERE bucket < %s', (datetime.now() - HOURLY_RETENTION,))
+        cur.execute('''
+            UPDATE rollup_state SET last_id = %s, updated_at = NOW() WHERE name = %s
+        ''', (delta['high_id'], ROLLUP_NAME))
+        conn.commit()
+        return delta['items']
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+class TrendingRanking:
+    """Top sellers per window and category, recomputed from the rollups and swapped in whole"""
+
+    def __init__(self):
+        self.rankings = {}
+        self.refreshed_at = None
+
+    def refresh(self, conn, resolve_products):
+        """Rank products by units sold per window; resolve_products maps ids to catalog products"""
+        rankings = {}
+        cur = conn.cursor()
+        try:
+            for window, (table, span) in TRENDING_WINDOWS.items():
+                cur.execute(f'''
+                    SELECT product_id, SUM(quantity) AS quantity
+                    FROM {table}
+                    WHERE bucket >= %s
+                    GROUP BY product_id
+                    ORDER BY quantity DESC, product_id
+                ''', (datetime.now() - span,))
+                rows = [(r['product_id'], int(r['quantity'])) for r in cur.fetchall()]
+                products = resolve_products([pid for pid, _ in rows])
+                overall = rankings[(window, None)] = []
+                for pid, quantity in rows:
+                    # Products no longer in the catalog drop out of the rankings
+                    if pid not in products:
+                        continue
+                    if len(overall) < MAX_RANKED:
+                        overall.append((pid, quantity))
+                    by_category = rankings.setdefault((window, products[pid]['categorySlug']), [])
+                    if len(by_category) < MAX_RANKED:
+                        by_category.append((pid, quantity))
+        finally:
+            cur.close()
+        self.rankings = rankings
+        self.refreshed_at = time.time()
+
+    def top(self, window, category=None, limit=10):
+        """[(product id, units sold)] best first; empty until the first refresh"""
+        return self.rankings.get((window, category), [])[:limit]
+
+    def snapshot(self):
+        return {
+            'refreshedAt': self.refreshed_at,
+            'rankedProducts': len(self.rankings.get(('month', None), []))
+        }
+
+def _trending_loop(ranking, get_db_connection, resolve_products, interval, stop_event):
+    while True:
+        try:
+            conn = get_db_connection()
+        except CircuitOpenError:
+            conn = None
+        if conn:
+            try:
+                roll_up_sales(conn)
+                ranking.refresh(conn, resolve_products)
+            except Exception as e:
+                print(f"Trending rollup error: {e}")
+            finally:
+                conn.close()
+        if stop_event.wait(interval):
+            return
+
+def start_trending_rollups(ranking, get_db_connection, resolve_products, interval=60):
+    """Roll up new sales and re-rank in the background"""
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=_trending_loop,
+        args=(ranking, get_db_connection, resolve_products, interval, stop_event),
+        daemon=True
+    )
+    thread.start()
+    return stop_event
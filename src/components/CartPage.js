@@ -4,7 +4,7 @@ import { useCart } from '../context/CartContext';
 import './CategoryPage.css';
 
 export default function CartPage() {
-  const { cart, removeFromCart, updateQuantity, getCartSubtotal } = useCart();
+  const { cart, removeFromCart, updateQuantity, getCartSubtotal, getCartId } = useCart();
   const [coupon, setCoupon] = useState('');
   const [couponFeedback, setCouponFeedback] = useState(null);
   const [discount, setDiscount] = useState(0);
@@ -19,7 +19,7 @@ export default function CartPage() {
       const res = await fetch('http://localhost:5000/api/validate-coupon', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ coupon_code: coupon, cart_value: subtotal })
+        body: JSON.stringify({ coupon_code: coupon, cart_value: subtotal, ...(getCartId() ? { cart_id: getCartId() } : {}) })
       });
       const data = await res.json();
       if (res.ok && data.valid) {
@@ -40,7 +40,7 @@ export default function CartPage() {
       navigate('/cart?login=1&redirect=/checkout');
       return;
     }
-    navigate('/checkout', { state: { from: 'cart' } });
+    navigate('/checkout', { state: { from: 'cart', couponCode: discount > 0 ? coupon.trim().toUpperCase() : undefined } });
   };
 
   return (
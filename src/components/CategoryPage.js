@@ -1,6 +1,7 @@
 import React, { useEffect, useMemo, useState } from 'react';
 import { Link, useNavigate, useParams, useSearchParams } from 'react-router-dom';
 import { useCart } from '../context/CartContext';
+import ResponsiveImage from './ResponsiveImage';
 import './CategoryPage.css';
 
 const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:5000';
@@ -41,7 +42,7 @@ export default function CategoryPage() {
       setLoading(true);
       setError('');
       try {
-        const query = new URLSearchParams();
+        const query = new URLSearchParams({ fields: 'id,name,brand,imageUrl,imageSet,gsmOptions,pricePerUnit,inStock' });
         const res = await fetch(`${API_BASE}/api/categories/${slug}/products?${query.toString()}`);
         if (!res.ok) {
           if (res.status === 404) {
@@ -168,9 +169,11 @@ export default function CategoryPage() {
             {filteredItems.map(p => (
               <div key={p.id} className="card product-card">
                 <Link to={`/product/${p.id}`} className="product-image" aria-label={`View ${p.brand} ${p.name}`}>
-                  <img 
+                  <ResponsiveImage
+                    imageSet={p.imageSet}
                     src={p.imageUrl || 'https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a4-bundle.jpg'} 
                     alt={`${p.brand} ${categoryName}`} 
+                    sizes="(max-width: 600px) 50vw, 300px"
                     loading="lazy"
                     onError={(e) => {
                       e.target.src = 'https://raw.githubusercontent.com/reaisol/ecom_stationery/master/public/images/a4-bundle.jpg';
@@ -1,10 +1,10 @@
 import React, { useEffect, useMemo, useState } from 'react';
-import { useNavigate } from 'react-router-dom';
+import { useLocation, useNavigate } from 'react-router-dom';
 import { useCart } from '../context/CartContext';
 import './ProductDetail.css';
 
 export default function CheckoutPage() {
-  const { cart, getCartSubtotal, clearCart } = useCart();
+  const { cart, getCartSubtotal, clearCart, getCartId } = useCart();
   const subtotal = useMemo(() => getCartSubtotal(), [cart, getCartSubtotal]);
   const [address, setAddress] = useState({
     fullName: '',
@@ -16,9 +16,13 @@ export default function CheckoutPage() {
     pincode: '',
     phone: ''
   });
+  const [savedAddresses, setSavedAddresses] = useState([]);
+  const [addressId, setAddressId] = useState('');
   const [paymentMethod, setPaymentMethod] = useState('cod');
   const [placing, setPlacing] = useState(false);
   const navigate = useNavigate();
+  const location = useLocation();
+  const couponCode = location.state && location.state.couponCode;
 
   useEffect(() => {
     const token = localStorage.getItem('session_token');
@@ -26,7 +30,12 @@ export default function CheckoutPage() {
       // Redirect to login modal entry via homepage path as a simple fallback
       navigate('/', { replace: true });
       alert('Please login to proceed to checkout.');
+      return;
     }
+    fetch('http://localhost:5000/api/addresses', { headers: { 'X-Session-Token': token } })
+      .then(res => (res.ok ? res.json() : { addresses: [] }))
+      .then(data => setSavedAddresses(data.addresses || []))
+      .catch(() => setSavedAddresses([]));
   }, [navigate]);
 
   const placeOrder = async () => {
@@ -45,22 +54,28 @@ export default function CheckoutPage() {
           'X-Session-Token': token
         },
         body: JSON.stringify({
-          items: cart.items.map(i => ({
-            productId: i.productId,
-            name: i.name,
-            image: i.image,
-            variant: i.variant,
-            unitPrice: i.price,
-            quantity: i.quantity
-          })),
-          address,
+          // The server cart is authoritative when there is one
+          ...(getCartId() ? { cartId: getCartId() } : {
+            items: cart.items.map(i => ({
+              productId: i.productId,
+              name: i.name,
+              image: i.image,
+              variant: i.variant,
+              unitPrice: i.price,
+              quantity: i.quantity
+            }))
+          }),
+          ...(addressId ? { addressId: Number(addressId) } : { address }),
+          ...(couponCode ? { couponCode } : {}),
           paymentMethod
         })
       });
       const data = await res.json();
       if (res.ok) {
         clearCart();
-        alert('Order placed successfully. Order ID: ' + data.orderId);
+        alert(data.orderId
+          ? 'Order placed successfully. Order ID: ' + data.orderId
+          : 'Order received. Reference: ' + data.provisionalId);
         navigate('/');
       } else {
         alert(data.error || 'Failed to place order');
@@ -76,6 +91,15 @@ export default function CheckoutPage() {
       <div style={{ display: 'grid', gridTemplateColumns: '1fr 360px', gap: 24 }}>
         <div className="card" style={{ padding: 16 }}>
           <h2>Delivery Address</h2>
+          {savedAddresses.length > 0 && (
+            <select value={addressId} onChange={(e)=> setAddressId(e.target.value)} style={{ width: '100%', marginBottom: 12 }}>
+              <option value="">Enter a new address</option>
+              {savedAddresses.map(a => (
+                <option key={a.id} value={a.id}>{a.fullName}, {a.house}{a.street ? `, ${a.street}` : ''}, {a.city} {a.pincode}</option>
+              ))}
+            </select>
+          )}
+          {!addressId && (
           <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr', gap: 12 }}>
             <input placeholder="Full Name" value={address.fullName} onChange={(e)=> setAddress({ ...address, fullName: e.target.value })} />
             <input placeholder="Phone Number" value={address.phone} onChange={(e)=> setAddress({ ...address, phone: e.target.value })} />
@@ -86,6 +110,7 @@ export default function CheckoutPage() {
             <input placeholder="State" value={address.state} onChange={(e)=> setAddress({ ...address, state: e.target.value })} />
             <input placeholder="Pincode" value={address.pincode} onChange={(e)=> setAddress({ ...address, pincode: e.target.value })} />
           </div>
+          )}
         </div>
 
         <div className="card" style={{ padding: 16 }}>
@@ -6,6 +6,8 @@ import LoginModal from './LoginModal';
 import SignupModal from './SignupModal';
 import './Header.css';
 
+const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:5000';
+
 const Header = () => {
   const [isLoginModalOpen, setIsLoginModalOpen] = useState(false);
   const [isSignupModalOpen, setIsSignupModalOpen] = useState(false);
@@ -13,6 +15,44 @@ const Header = () => {
   const { getCartCount } = useCart();
   const navigate = useNavigate();
   const location = useLocation();
+  const [searchText, setSearchText] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
+
+  // Typeahead: debounce keystrokes and drop responses for stale prefixes
+  useEffect(() => {
+    const q = searchText.trim();
+    if (!q) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(`${API_BASE}/api/search/suggest?${new URLSearchParams({ q })}`);
+        const data = await res.json();
+        if (!cancelled) setSuggestions(data.suggestions || []);
+      } catch (e) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 120);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchText]);
+
+  const handleSuggestion = (suggestion) => {
+    setSuggestions([]);
+    if (suggestion.type === 'sku') {
+      setSearchText('');
+      navigate(`/product/${suggestion.productId}`);
+    } else if (suggestion.type === 'category') {
+      setSearchText('');
+      navigate(`/category/${suggestion.text.toLowerCase().replace(/\s+/g, '-')}`);
+    } else {
+      setSearchText(suggestion.text);
+    }
+  };
 
   const handleLogin = (userData) => {
     setUser(userData);
@@ -70,10 +110,23 @@ const Header = () => {
                 type="text" 
                 placeholder="Search for products..." 
                 className="search-input"
+                value={searchText}
+                onChange={(e) => setSearchText(e.target.value)}
+                onBlur={() => setTimeout(() => setSuggestions([]), 150)}
               />
               <button className="search-btn">
                 <SearchIcon size={24} />
               </button>
+              {suggestions.length > 0 && (
+                <ul className="search-suggestions">
+                  {suggestions.map((s) => (
+                    <li key={`${s.type}:${s.text}`} onMouseDown={() => handleSuggestion(s)}>
+                      <span>{s.text}</span>
+                      <span className="suggestion-type">{s.type === 'sku' ? 'SKU' : `${s.count} products`}</span>
+                    </li>
+                  ))}
+                </ul>
+              )}
             </div>
             
             <div className="header-actions">
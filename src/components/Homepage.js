@@ -1,7 +1,10 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
+import ResponsiveImage from './ResponsiveImage';
 import './Homepage.css';
 
+const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:5000';
+
 const categories = [
   {
     key: 'a1',
@@ -46,6 +49,18 @@ const categories = [
 ];
 
 const Homepage = () => {
+  const [trending, setTrending] = useState([]);
+
+  useEffect(() => {
+    let cancelled = false;
+    const query = new URLSearchParams({ window: 'week', limit: '8', fields: 'id,name,brand,imageUrl,imageSet,pricePerUnit' });
+    fetch(`${API_BASE}/api/products/trending?${query}`)
+      .then((res) => res.json())
+      .then((data) => { if (!cancelled) setTrending(data.items || []); })
+      .catch(() => {});
+    return () => { cancelled = true; };
+  }, []);
+
   return (
     <div className="homepage">
       {/* Hero Section */}
@@ -77,6 +92,25 @@ const Homepage = () => {
         </div>
       </section>
 
+      {/* Trending Section */}
+      {trending.length > 0 && (
+        <section className="trending-section">
+          <div className="container">
+            <h2 className="section-title">Trending This Week</h2>
+            <div className="trending-carousel">
+              {trending.map(product => (
+                <Link key={product.id} to={`/product/${product.id}`} className="trending-card card">
+                  <ResponsiveImage imageSet={product.imageSet} src={product.imageUrl} alt={product.name} sizes="200px" className="trending-image" loading="lazy" decoding="async" />
+                  <div className="trending-name">{product.name}</div>
+                  <div className="trending-brand">{product.brand}</div>
+                  <div className="trending-price">₹{product.pricePerUnit}/unit</div>
+                </Link>
+              ))}
+            </div>
+          </div>
+        </section>
+      )}
+
       {/* Categories Section */}
       <section className="categories-section" id="categories">
         <div className="container">
@@ -1,6 +1,7 @@
 import React, { useEffect, useMemo, useState } from 'react';
 import { Link, useParams } from 'react-router-dom';
 import { useCart } from '../context/CartContext';
+import ResponsiveImage from './ResponsiveImage';
 import './ProductDetail.css';
 
 const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:5000';
@@ -28,17 +29,16 @@ export default function ProductDetail() {
       setLoading(true);
       setError('');
       try {
-        const res = await fetch(`${API_BASE}/api/products/${id}`);
+        // Related products come embedded in the same response
+        const query = new URLSearchParams({ include: 'related', relatedFields: 'id,categorySlug,brand,name,imageUrl,imageSet,gsmOptions,pricePerUnit' });
+        const res = await fetch(`${API_BASE}/api/products/${id}?${query}`);
         if (!res.ok) throw new Error(`${res.status}`);
         const data = await res.json();
         if (!isCancelled) {
           setProduct(data);
           setActiveImage(data.imageUrl);
           setSelectedGsm('');
-          // fetch related
-          const r = await fetch(`${API_BASE}/api/categories/${data.categorySlug}/products?pageSize=4`);
-          const rj = await r.json();
-          setRelated((rj.items || []).filter(p => p.id !== data.id).slice(0, 4));
+          setRelated(data.related || []);
         }
       } catch (e) {
         if (!isCancelled) setError('Product not found.');
@@ -94,7 +94,12 @@ export default function ProductDetail() {
         <div className="detail-grid">
           <div className="gallery">
             <div className="hero">
-              <img src={activeImage} alt={product.name} />
+              <ResponsiveImage
+                imageSet={activeImage === product.imageUrl ? product.imageSet : null}
+                src={activeImage}
+                alt={product.name}
+                sizes="(max-width: 900px) 100vw, 600px"
+              />
             </div>
             <div className="thumbs">
               {[product.imageUrl, ...(product.gallery || [])].slice(0,4).map((src, i) => (
@@ -154,7 +159,7 @@ export default function ProductDetail() {
             <div className="related-grid">
               {related.map(r => (
                 <Link key={r.id} to={`/product/${r.id}`} className="card related-card">
-                  <div className="img"><img src={r.imageUrl} alt={`${r.brand} ${r.name}`} /></div>
+                  <div className="img"><ResponsiveImage imageSet={r.imageSet} src={r.imageUrl} alt={`${r.brand} ${r.name}`} sizes="240px" loading="lazy" /></div>
                   <div className="info">
                     <div className="name">Premium {prettifySlug(r.categorySlug).split(' ')[0]} Bundle</div>
                     <div className="price">₹{r.pricePerUnit.toFixed(2)}</div>
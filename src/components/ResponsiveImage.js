@@ -0,0 +1,19 @@
+import React from 'react';
+
+// Renders the API's imageSet ({ src, width, height, sources }) as a <picture> so the
+// browser picks AVIF/WebP at the width it needs; falls back to a plain <img>.
+const ResponsiveImage = ({ imageSet, src, alt, sizes = '100vw', ...imgProps }) => {
+  if (!imageSet) {
+    return <img src={src} alt={alt} {...imgProps} />;
+  }
+  return (
+    <picture>
+      {imageSet.sources.map(source => (
+        <source key={source.type} type={source.type} srcSet={source.srcset} sizes={sizes} />
+      ))}
+      <img src={imageSet.src} alt={alt} {...imgProps} />
+    </picture>
+  );
+};
+
+export default ResponsiveImage;
@@ -1,4 +1,6 @@
-import React, { createContext, useContext, useReducer, useEffect } from 'react';
+import React, { createContext, useContext, useReducer, useEffect, useRef } from 'react';
+
+const CART_API = 'http://localhost:5000/api/cart';
 
 const CartContext = createContext();
 
@@ -8,9 +10,23 @@ const CART_ACTIONS = {
   REMOVE_ITEM: 'REMOVE_ITEM',
   UPDATE_QUANTITY: 'UPDATE_QUANTITY',
   CLEAR_CART: 'CLEAR_CART',
-  LOAD_CART: 'LOAD_CART'
+  LOAD_CART: 'LOAD_CART',
+  SYNC_LINES: 'SYNC_LINES'
 };
 
+// Server cart line -> cart item
+const fromServerLine = (line) => ({
+  id: line.id,
+  productId: line.productId,
+  name: line.name,
+  price: line.unitPrice,
+  originalPrice: line.originalPrice,
+  image: line.image,
+  variant: line.variant,
+  quantity: line.quantity,
+  category: line.category
+});
+
 // Cart reducer
 const cartReducer = (state, action) => {
   switch (action.type) {
@@ -86,6 +102,20 @@ const cartReducer = (state, action) => {
         ...state,
         items: action.payload.items || []
       };
+
+    // Reconcile with the lines the server reports as changed (null = removed)
+    case CART_ACTIONS.SYNC_LINES: {
+      const { lines } = action.payload;
+      const items = state.items
+        .filter(item => lines[item.id] !== null)
+        .map(item => (lines[item.id] ? fromServerLine(lines[item.id]) : item));
+      Object.keys(lines).forEach(id => {
+        if (lines[id] && !items.some(item => item.id === id)) {
+          items.push(fromServerLine(lines[id]));
+        }
+      });
+      return { ...state, items };
+    }
     
     default:
       return state;
@@ -99,8 +129,9 @@ const initialState = {
 
 export const CartProvider = ({ children }) => {
   const [cartState, dispatch] = useReducer(cartReducer, initialState);
+  const cartIdRef = useRef(localStorage.getItem('papercart_cart_id'));
 
-  // Load cart from localStorage on mount
+  // Load cart from localStorage on mount, then from the server cart if there is one
   useEffect(() => {
     const savedCart = localStorage.getItem('papercart_cart');
     if (savedCart) {
@@ -114,8 +145,59 @@ export const CartProvider = ({ children }) => {
         console.error('Error loading cart from localStorage:', error);
       }
     }
+    if (cartIdRef.current) {
+      fetch(`${CART_API}/${cartIdRef.current}`)
+        .then(res => {
+          if (res.status === 404) {
+            // Expired; the next change starts a new server cart
+            cartIdRef.current = null;
+            localStorage.removeItem('papercart_cart_id');
+            return null;
+          }
+          return res.ok ? res.json() : null;
+        })
+        .then(data => {
+          if (data) {
+            dispatch({ type: CART_ACTIONS.LOAD_CART, payload: { items: data.items.map(fromServerLine) } });
+          }
+        })
+        .catch(() => {});
+    }
   }, []);
 
+  const ensureCartId = async () => {
+    if (cartIdRef.current) return cartIdRef.current;
+    const res = await fetch(CART_API, { method: 'POST' });
+    if (!res.ok) throw new Error('Could not create cart');
+    const data = await res.json();
+    cartIdRef.current = data.cartId;
+    localStorage.setItem('papercart_cart_id', data.cartId);
+    return data.cartId;
+  };
+
+  // Send one delta to the server cart; the local state already shows it
+  const syncOps = async (ops) => {
+    try {
+      const cartId = await ensureCartId();
+      const res = await fetch(`${CART_API}/${cartId}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ops })
+      });
+      if (res.status === 404) {
+        cartIdRef.current = null;
+        localStorage.removeItem('papercart_cart_id');
+        return;
+      }
+      if (res.ok) {
+        const data = await res.json();
+        dispatch({ type: CART_ACTIONS.SYNC_LINES, payload: { lines: data.lines } });
+      }
+    } catch (error) {
+      console.error('Error syncing cart:', error);
+    }
+  };
+
   // Save cart to localStorage whenever it changes
   useEffect(() => {
     localStorage.setItem('papercart_cart', JSON.stringify(cartState));
@@ -127,6 +209,17 @@ export const CartProvider = ({ children }) => {
       type: CART_ACTIONS.ADD_ITEM,
       payload: { product, variant, quantity }
     });
+    syncOps([{
+      op: 'add',
+      productId: product.id,
+      variant: variant.weight,
+      quantity,
+      unitPrice: variant.price,
+      name: product.name,
+      image: product.image,
+      category: product.category,
+      originalPrice: product.original_price
+    }]);
   };
 
   const removeFromCart = (itemId) => {
@@ -134,6 +227,7 @@ export const CartProvider = ({ children }) => {
       type: CART_ACTIONS.REMOVE_ITEM,
       payload: { itemId }
     });
+    syncOps([{ op: 'remove', lineId: itemId }]);
   };
 
   const updateQuantity = (itemId, quantity) => {
@@ -141,12 +235,21 @@ export const CartProvider = ({ children }) => {
       type: CART_ACTIONS.UPDATE_QUANTITY,
       payload: { itemId, quantity }
     });
+    syncOps([{ op: 'set', lineId: itemId, quantity }]);
   };
 
+  // The server deletes the cart itself when it turns into an order
   const clearCart = () => {
     dispatch({ type: CART_ACTIONS.CLEAR_CART });
+    if (cartIdRef.current) {
+      fetch(`${CART_API}/${cartIdRef.current}`, { method: 'DELETE' }).catch(() => {});
+      cartIdRef.current = null;
+      localStorage.removeItem('papercart_cart_id');
+    }
   };
 
+  const getCartId = () => cartIdRef.current;
+
   // Cart calculations
   const getCartCount = () => {
     return cartState.items.reduce((total, item) => total + item.quantity, 0);
@@ -166,6 +269,7 @@ export const CartProvider = ({ children }) => {
     removeFromCart,
     updateQuantity,
     clearCart,
+    getCartId,
     getCartCount,
     getCartTotal,
     getCartSubtotal